@@ -0,0 +1,270 @@
+'''
+This script benchmarks the pipeline stages end to end on a synthetic corpus, fully offline.
+Ollama and the similarity API are replaced by the local stubs of stub_servers.py (fixed latency),
+And embeddings come from a deterministic hashing embedder unless a local model is configured.
+Every stage records wall time, CPU time, throughput and peak traced memory,
+And the run is compared to the saved baseline (benchmarks/baseline.json).
+=> (python benchmarks/run_benchmarks.py --n 5000, add --save-baseline to make this run the new baseline.)
+=> (works in a temporary folder, so no cache or store of a real run is touched.)
+'''
+
+
+
+
+import argparse
+import gc
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import zlib
+from contextlib import contextmanager
+
+import numpy as np
+
+bench_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.join(bench_dir, "..")
+sys.path[:0] = [bench_dir, root_dir, os.path.join(root_dir, "use_case_1"), os.path.join(root_dir, "use_case_2")]
+
+from synthetic_corpus import make_corpus
+from stub_servers import start_ollama_stub, start_similarity_stub
+
+
+
+
+#####################
+n_ideas = 2000
+k_range = range(2, 15)
+ollama_latency = 0.2  # seconds per stub Ollama request
+similarity_latency = 0.05  # seconds per stub API request
+api_sample = 300  # ideas sent through the API linking stage
+clicks = 50  # node clicks replayed on the Dash callback
+local_min_score = 0.3  # hashing embeddings score lower than MiniLM ones
+embed_model_name = None  # e.g. "sentence-transformers/all-MiniLM-L6-v2" if it is available offline; None = hashing embedder
+t5_model_path = None  # local T5-small folder; None = summarize through Ollama only
+trace_memory = True  # per-stage peak memory via tracemalloc (adds some overhead to Python-heavy stages)
+regression_tolerance = 0.15  # slower than baseline by more than this => flagged
+baseline_file = os.path.join(bench_dir, "baseline.json")
+results_dir = os.path.join(bench_dir, "results")
+#####################
+
+
+
+
+class HashingEmbedder:
+    # Signed feature hashing of word tokens, L2-normalized: deterministic and needs no model download
+    def __init__(self, dim=384):
+        self.dim = dim
+
+    def encode(self, texts, batch_size=64, convert_to_numpy=True, show_progress_bar=False):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in re.findall(r"\w+", text.lower()):
+                h = zlib.crc32(token.encode("utf-8"))
+                vectors[row, h % self.dim] += 1.0 if (h >> 16) & 1 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+class Bench:
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.stages = {}
+        if trace_memory:
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name, items=None):
+        record = {"items": items}
+        gc.collect()
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        wall, cpu = time.perf_counter(), time.process_time()
+        yield record
+        record["seconds"] = time.perf_counter() - wall
+        record["cpu_seconds"] = time.process_time() - cpu
+        if record["items"]:
+            record["per_second"] = record["items"] / max(record["seconds"], 1e-9)
+        if self.trace_memory:
+            record["peak_mb"] = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        self.stages[name] = record
+        print(f"⏱️ {name:<16} {record['seconds']:8.3f}s"
+              + (f"  {record['per_second']:10.1f}/s" if "per_second" in record else "")
+              + (f"  peak {record['peak_mb']:.1f} MB" if "peak_mb" in record else ""))
+
+
+def run(n, bench):
+    import networkx as nx
+    import ideas_store
+    import ideas_pipeline_one as pipeline_one
+    from embedding_cache import encode_with_cache
+    from k_selection import select_k
+    from keywords import keyword_table
+    from ollama_scheduler import OllamaScheduler
+    from similarity_engine import find_similar
+    from similarity_client import SimilarityClient
+    from graph_layout import full_layout
+
+    with bench.stage("corpus", n):
+        df = make_corpus(n).drop(columns=["topic"])
+        df["Ideas"] = df["Idea Name"].astype(str) + ": " + df["Description"].astype(str)
+    with bench.stage("dedup", n):
+        df = pipeline_one.collapse_near_duplicates(df, tag="[bench] ")
+    texts = df["Ideas"].tolist()
+    ids = df["ID"].to_numpy()
+
+    ollama_stub = start_ollama_stub(latency=ollama_latency)
+    similarity_stub = start_similarity_stub(ids, latency=similarity_latency)
+    scheduler = OllamaScheduler(model="stub", host=ollama_stub.url, max_in_flight=pipeline_one.ollama_max_in_flight)
+
+    # === Clustering pipeline (use_case_1) ===
+    embedder = HashingEmbedder() if embed_model_name is None else None
+    model_name = embed_model_name or "hashing-384"
+    with bench.stage("embed", n):
+        embeddings = encode_with_cache(texts, model_name, cache_dir="embedding_cache", embedder=embedder)
+    with bench.stage("embed_cached", n):
+        encode_with_cache(texts, model_name, cache_dir="embedding_cache", embedder=embedder)
+
+    with bench.stage("k_sweep", n):
+        selection = select_k(embeddings, k_range=k_range, method=pipeline_one.k_method,
+                             sample_size=pipeline_one.k_sweep_sample_size, minibatch=pipeline_one.k_sweep_minibatch)
+    n_clusters = selection.k
+    df["theme_cluster"] = selection.labels
+
+    with bench.stage("keywords", n):
+        keywords = keyword_table(df["Ideas"], df["theme_cluster"], n_clusters,
+                                 top_k=pipeline_one.keyword_top_k, method=pipeline_one.keyword_method)
+
+    with bench.stage("naming", n_clusters):
+        theme_names = pipeline_one.name_themes(keywords, n_clusters, scheduler, tag="[bench] ")
+    df["theme"] = df["theme_cluster"].map(dict(enumerate(theme_names)))
+    grouped = pipeline_one.group_by_theme(df)
+
+    idea_lists = grouped["Ideas"].tolist()
+    with bench.stage("summarization", len(idea_lists)) as stage:
+        if t5_model_path:
+            t5_summarizer = pipeline_one.load_t5_summarizer(t5_model_path)
+            pipeline_one.adaptive_summaries(idea_lists, t5_summarizer, scheduler, tag="[bench] ")
+        else:
+            # No local T5: the ideas of every group go straight into the (stub) Ollama summary tree
+            _, trees = pipeline_one.reduce_to_summaries(idea_lists, scheduler, tag="[bench] ")
+            stage["max_depth"] = max((tree["depth"] for tree in trees), default=0)
+
+    # === Linking (use_case_2) ===
+    with bench.stage("link_local", n):
+        neighbours, scores = find_similar(embeddings, k=5, min_score=local_min_score, with_scores=True)
+    edges = ideas_store.edges_from_lists(ids, [ids[rows].tolist() for rows in neighbours], scores, kind="local")
+
+    sample = df.head(api_sample)
+    items = list(zip(sample["ID"], "find ideas similar to " + sample["Idea Name"].astype(str)))
+    client = SimilarityClient(similarity_stub.url, rate_per_second=1000, burst=50, workers=8, backoff=0.01)
+    with bench.stage("link_api", len(items)):
+        client.fetch_many(items, lambda idea_id, content: None, retry_rounds=0)
+    client.close()
+
+    # === Network (use_case_2) ===
+    with bench.stage("graph_build", len(edges)):
+        G = nx.Graph()
+        G.add_nodes_from(ids)
+        G.add_edges_from(zip(edges["source"], edges["target"]))
+    with bench.stage("layout", G.number_of_nodes()):
+        full_layout(G, method="fast" if G.number_of_nodes() > 3000 else "spring")
+
+    # The Dash app reads the columnar tables of this folder, as after AI_parser.py
+    ideas_store.write_table(df.drop(columns=["Ideas", "theme_cluster", "theme"]), "linked_ideas")
+    ideas_store.write_table(edges, "similarity_edges")
+    import network_viz
+    with bench.stage("viz_startup", n):
+        network = network_viz.build_network()
+        network_viz.build_app(network)
+    clicked = [str(node) for node in df["ID"].sample(min(clicks, len(df)), random_state=42)]
+    with bench.stage("click_callback", len(clicked)):
+        previous = []
+        for idea_id in clicked:
+            if network.large_mode:
+                network.render_view(network.full_range[0], network.full_range[1], [], idea_id)
+            else:
+                _, _, previous = network.click_patch(idea_id, previous)
+
+    scheduler.close()
+    ollama_stub.stop()
+    similarity_stub.stop()
+
+
+def compare(stages, baseline, tolerance):
+    print(f"\n{'stage':<16} {'now':>9} {'baseline':>9} {'ratio':>7}")
+    regressions = []
+    for name, record in stages.items():
+        base = baseline.get("stages", {}).get(name)
+        if not base or not base.get("seconds"):
+            print(f"{name:<16} {record['seconds']:8.3f}s {'-':>9} {'-':>7}")
+            continue
+        ratio = record["seconds"] / base["seconds"]
+        mark = "⚠️ slower" if ratio > 1 + tolerance else ("✅ faster" if ratio < 1 - tolerance else "")
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+        print(f"{name:<16} {record['seconds']:8.3f}s {base['seconds']:8.3f}s {ratio:6.2f}x {mark}")
+    return regressions
+
+
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmark of the ideas pipeline stages.")
+    parser.add_argument("--n", type=int, default=n_ideas, help="number of synthetic ideas")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc (less overhead)")
+    parser.add_argument("--keep-workdir", action="store_true", help="keep the temporary folder for inspection")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="ideas_bench_")
+    start_dir = os.getcwd()
+    os.chdir(workdir)
+    bench = Bench(trace_memory=trace_memory and not args.no_memory)
+    try:
+        run(args.n, bench)
+    finally:
+        os.chdir(start_dir)
+        if not args.keep_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    results = {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "config": {"n": args.n, "ollama_latency": ollama_latency, "similarity_latency": similarity_latency,
+                   "embedder": embed_model_name or "hashing", "t5": bool(t5_model_path)},
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": bench.stages,
+    }
+    os.makedirs(results_dir, exist_ok=True)
+    results_path = os.path.join(results_dir, f"bench_{args.n}_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(results_path, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"💾 Results saved to '{results_path}' (peak RSS {results['peak_rss_mb'] or 0:.0f} MB).")
+
+    if os.path.exists(baseline_file):
+        with open(baseline_file, "r") as f:
+            baseline = json.load(f)
+        if baseline.get("config") != results["config"]:
+            print(f"⚠️ Baseline was run with {baseline.get('config')}, numbers are not directly comparable.")
+        regressions = compare(bench.stages, baseline, regression_tolerance)
+        if regressions:
+            print(f"❌ Slower than baseline by more than {regression_tolerance:.0%}: {', '.join(regressions)}")
+    else:
+        print("⚠️ No baseline yet, run with --save-baseline to create one.")
+
+    if args.save_baseline:
+        shutil.copyfile(results_path, baseline_file)
+        print(f"✅ Saved as the new baseline '{baseline_file}'.")
@@ -0,0 +1,170 @@
+'''
+This module runs deterministic local stand-ins for Ollama and the AI similarity endpoint,
+So the pipeline and the benchmarks run offline, with a configurable latency per request.
+Answers only depend on the request text, so two runs see exactly the same responses.
+=> (python benchmarks/stub_servers.py serves both until Ctrl+C; point ollama_host / url at them.)
+'''
+
+
+
+
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+
+
+#####################
+ollama_port = 11435
+similarity_port = 8765
+#####################
+
+
+
+
+WORDS = (
+    "process automation quality tooling safety training cost energy supplier workflow "
+    "dashboard onboarding maintenance yield inventory reporting sustainability customer "
+    "review approval security testing scheduling communication efficiency"
+).split()
+
+
+def digest(text):
+    return hashlib.sha1(text.encode("utf-8")).digest()
+
+
+def stub_answer(prompt, n_words=40):
+    rng = random.Random(digest(prompt))
+    words = [rng.choice(WORDS) for _ in range(n_words)]
+    return " ".join(words).capitalize() + "."
+
+
+class StubServer:
+    def __init__(self, handler, port=0, **settings):
+        handler_class = type(handler.__name__, (handler,), settings)
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), handler_class)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name=handler.__name__, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, payload, status=200, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class OllamaHandler(QuietHandler):
+    # POST /api/chat, non-streaming, as sent by ollama.AsyncClient.chat
+    latency = 0.2  # seconds per request
+    seconds_per_token = 0.0  # extra time per generated word
+    answer_words = 40
+    fail_first = 0  # the first n requests of every prompt get a 500, so each prompt needs exactly n retries
+    fail_marker = None  # prompts containing this text always get a 500
+    _attempts = {}  # prompt -> requests seen
+    _count_lock = threading.Lock()
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if urlparse(self.path).path != "/api/chat":
+            self.send_json({"error": "not found"}, status=404)
+            return
+        prompt = "\n".join(message.get("content", "") for message in request.get("messages", []))
+        with self._count_lock:
+            attempt = self._attempts.get(prompt, 0)
+            self._attempts[prompt] = attempt + 1
+        answer = stub_answer(prompt, self.answer_words)
+        duration = self.latency + self.seconds_per_token * self.answer_words
+        time.sleep(duration)
+        if attempt < self.fail_first or (self.fail_marker and self.fail_marker in prompt):
+            self.send_json({"error": "stub failure"}, status=500)
+            return
+        self.send_json({
+            "model": request.get("model", "stub"),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "message": {"role": "assistant", "content": answer},
+            "done": True,
+            "done_reason": "stop",
+            "total_duration": int(duration * 1e9),
+            "prompt_eval_count": len(prompt.split()),
+            "eval_count": len(answer.split()),
+            "eval_duration": int(duration * 1e9),
+        })
+
+
+class SimilarityHandler(QuietHandler):
+    # GET ?q=..., answers in the free text format AI_parser.extract_similar_ids parses
+    latency = 0.1
+    idea_ids = ()  # IDs the answers may point at
+    matches = 3
+    throttle_every = 0  # > 0: every n-th request gets a 429 with Retry-After: 0
+    _count = 0
+    _count_lock = threading.Lock()
+
+    def do_GET(self):
+        with self._count_lock:
+            type(self)._count += 1
+            count = self._count
+        time.sleep(self.latency)
+        if self.throttle_every and count % self.throttle_every == 0:
+            self.send_json({"error": "rate limited"}, status=429, headers={"Retry-After": "0"})
+            return
+
+        query = parse_qs(urlparse(self.path).query).get("q", [""])[0]
+        rng = random.Random(digest(query))
+        similar = rng.sample(list(self.idea_ids), min(self.matches, len(self.idea_ids)))
+        content = "These ideas look related: " + ", ".join(f"Idea {idea_id}" for idea_id in similar)
+        self.send_json({"content": content})
+
+
+def start_ollama_stub(port=0, latency=0.2, seconds_per_token=0.0, answer_words=40, fail_first=0, fail_marker=None):
+    return StubServer(OllamaHandler, port, latency=latency, seconds_per_token=seconds_per_token,
+                      answer_words=answer_words, fail_first=fail_first, fail_marker=fail_marker,
+                      _attempts={}, _count_lock=threading.Lock()).start()
+
+
+def start_similarity_stub(idea_ids, port=0, latency=0.1, matches=3, throttle_every=0):
+    return StubServer(SimilarityHandler, port, latency=latency, idea_ids=tuple(idea_ids), matches=matches,
+                      throttle_every=throttle_every, _count=0, _count_lock=threading.Lock()).start()
+
+
+
+
+if __name__ == "__main__":
+    ollama_stub = start_ollama_stub(ollama_port)
+    similarity_stub = start_similarity_stub([str(i) for i in range(10000, 10500)], similarity_port)
+    print(f"✅ Stub Ollama at {ollama_stub.url} (ollama_host), stub similarity API at {similarity_stub.url} (url).")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        ollama_stub.stop()
+        similarity_stub.stop()
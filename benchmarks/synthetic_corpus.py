@@ -0,0 +1,104 @@
+'''
+This module generates a synthetic ideas corpus with the columns of the ideasPBI.csv export,
+Ideas are drawn from latent topics, so clustering, keywords and linking have structure to find.
+Same settings and seed => same corpus.
+=> (python benchmarks/synthetic_corpus.py writes synthetic_ideas.csv.)
+'''
+
+
+
+
+import numpy as np
+import pandas as pd
+
+
+
+
+#####################
+n_ideas = 5000
+segment_mix = {"Products": 0.4, "Corporate": 0.3, "Foundry": 0.2, None: 0.1}
+n_topics = 12
+name_words = (3, 8)  # min, max words in an idea name
+description_words = (20, 120)  # min, max words in a description
+output_file = "synthetic_ideas.csv"
+#####################
+
+
+
+
+COMMON = (
+    "we should improve the process for our team and make it easier to track results across sites "
+    "using a simple tool so that people spend less time on manual steps and more on real work"
+).split()
+
+TOPIC_SEEDS = [
+    "automation script workflow manual handoff ticket queue approval",
+    "energy power cooling lights waste recycling carbon emissions",
+    "training onboarding mentor course learning skills certification",
+    "dashboard report metrics kpi visibility data chart trend",
+    "safety hazard ppe incident ergonomic injury inspection",
+    "supplier vendor contract purchase order cost negotiation",
+    "meeting calendar schedule room booking agenda time",
+    "laptop software license install update helpdesk password",
+    "yield defect wafer tool recipe chamber maintenance",
+    "cafeteria food coffee parking shuttle commute wellness",
+    "customer feedback survey support escalation response",
+    "security access badge phishing compliance audit policy",
+    "inventory spare parts stock warehouse logistics shipping",
+    "documentation wiki search knowledge template review",
+    "recognition award celebration team morale volunteer",
+    "travel expense reimbursement booking policy approval",
+]
+
+
+def topic_vocabulary(n_topics):
+    topics = []
+    for t in range(n_topics):
+        seed_words = TOPIC_SEEDS[t % len(TOPIC_SEEDS)].split()
+        # Topics beyond the seed list get their own suffixed words, so they stay separable
+        suffix = "" if t < len(TOPIC_SEEDS) else f"{t // len(TOPIC_SEEDS)}"
+        topics.append([word + suffix for word in seed_words] + [f"{seed_words[0]}{suffix}x{i}" for i in range(20)])
+    return topics
+
+
+def random_text(rng, topic_words, n_words, topic_share=0.6):
+    from_topic = rng.random(n_words) < topic_share
+    words = np.where(from_topic, rng.choice(topic_words, n_words), rng.choice(COMMON, n_words))
+    return " ".join(words)
+
+
+def make_corpus(n=n_ideas, segments=segment_mix, topics=n_topics, name_range=name_words,
+                description_range=description_words, seed=42):
+    rng = np.random.default_rng(seed)
+    vocabulary = topic_vocabulary(topics)
+
+    segment_values = list(segments)
+    weights = np.array([segments[s] for s in segment_values], dtype=float)
+    segment_of = rng.choice(len(segment_values), size=n, p=weights / weights.sum())
+    topic_of = rng.integers(0, topics, size=n)
+
+    names, descriptions = [], []
+    for i in range(n):
+        words = vocabulary[topic_of[i]]
+        names.append(random_text(rng, words, int(rng.integers(*name_range, endpoint=True)), topic_share=0.8).capitalize())
+        descriptions.append(random_text(rng, words, int(rng.integers(*description_range, endpoint=True))).capitalize() + ".")
+
+    created = pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365 * 24, size=n), unit="h")
+    return pd.DataFrame({
+        "ID": [str(10000 + i) for i in range(n)],  # 5 digits up to 90000 ideas, like the IDs AI_parser extracts
+        "Idea Name": names,
+        "Description": descriptions,
+        "Segment": [segment_values[s] for s in segment_of],
+        "Votes": rng.poisson(3, size=n),
+        "Idea Comments": rng.poisson(1, size=n),
+        "Created": created.strftime("%Y-%m-%d %H:%M"),
+        "topic": topic_of,  # ground truth, not in the real export
+    })
+
+
+
+
+if __name__ == "__main__":
+    corpus = make_corpus()
+    corpus.drop(columns=["topic"]).to_csv(output_file, index=False)
+    print(f"✅ Wrote {len(corpus)} synthetic ideas to '{output_file}'.")
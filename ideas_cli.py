@@ -0,0 +1,185 @@
+'''
+This script is the single entry point for the pipeline stages,
+scrape (ideas_web_scraper.py), cluster (use_case_1), link (AI_parser.py) and serve (network_viz.py).
+Settings come from flags or a JSON config file instead of editing the constants in each script.
+Heavy libraries and models are only imported by the stage that runs, so --help starts instantly.
+=> (config file: one section per subcommand, keys are the script constants,
+    e.g. {"cluster": {"input_file": "ideasPBI.csv", "ollama_model": "mistral"}}; flags win over the file.)
+=> (python ideas_cli.py cluster --segment Corporate:IC, or --all for every group in one process.)
+'''
+
+
+
+
+import argparse
+import json
+import os
+import sys
+
+
+
+
+root_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+
+
+def load_config(path, section):
+    if not path:
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    return dict(config.get(section, {}))
+
+
+def parse_segment(text):
+    # "Corporate:IC" => ("Corporate", "IC"); "None:NA" or ":NA" => ideas with no Segment
+    value, sep, code = text.rpartition(":")
+    if not sep or not code:
+        raise argparse.ArgumentTypeError(f"expected VALUE:CODE, got {text!r}")
+    return (None if value in ("", "None") else value, code)
+
+
+def configure(modules, settings):
+    # Every key must be a constant of one of the modules; it is set on each module that has it
+    for key, value in settings.items():
+        targets = [module for module in modules
+                   if hasattr(module, key) and not key.startswith("_") and not callable(getattr(module, key))]
+        if not targets:
+            names = ", ".join(module.__name__ for module in modules)
+            raise SystemExit(f"❌ Unknown setting {key!r} (not a constant of {names}).")
+        for module in targets:
+            setattr(module, key, value)
+
+
+def import_from(folder, name):
+    # The use_case scripts import their sibling modules by name
+    path = os.path.join(root_dir, folder) if folder else root_dir
+    if path not in sys.path:
+        sys.path.insert(0, path)
+    return __import__(name)
+
+
+def flag_settings(args, names):
+    return {setting: getattr(args, flag) for flag, setting in names.items() if getattr(args, flag) is not None}
+
+
+# --- Subcommands ---
+def scrape(args):
+    settings = load_config(args.config, "scrape")
+    settings.update(flag_settings(args, {"link": "link", "output": "f", "mode": "scrape_mode",
+                                         "workers": "detail_workers", "incremental": "incremental",
+                                         "resume": "resume"}))
+    scraper = import_from("", "ideas_web_scraper")
+    configure([scraper], settings)
+    scraper.main()
+
+
+def cluster(args):
+    settings = load_config(args.config, "cluster")
+    settings.update(flag_settings(args, {"input": "input_file", "segment": "segment", "t5_model": "t5_model_path",
+                                         "ollama_model": "ollama_model", "ollama_host": "ollama_host",
+                                         "cluster_mode": "cluster_mode", "metrics_dir": "metrics_dir",
+                                         "profile_stage": "profile_stage"}))
+    if "segment" in settings:
+        settings["segment"] = tuple(settings["segment"])
+    if "segments" in settings:
+        settings["segments"] = [tuple(segment) for segment in settings["segments"]]
+
+    pipeline_one = import_from("use_case_1", "ideas_pipeline_one")
+    if args.all:
+        if args.output is not None:
+            settings["merged_output"] = args.output
+        pipeline_all = import_from("use_case_1", "ideas_pipeline_all")
+        configure([pipeline_one, pipeline_all], settings)
+        pipeline_all.main()
+    else:
+        configure([pipeline_one], settings)
+        path = pipeline_one.main()
+        if args.output is not None and args.output != path:
+            os.replace(path, args.output)
+            print(f"✅ Moved to '{args.output}'.")
+
+
+def link(args):
+    settings = load_config(args.config, "link")
+    settings.update(flag_settings(args, {"input": "input_file", "mode": "mode", "url": "url", "output": "output_file",
+                                         "workers": "api_workers", "rate": "api_rate_per_second"}))
+    parser = import_from("use_case_2", "AI_parser")
+    configure([parser], settings)
+    parser.main()
+
+
+def serve(args):
+    settings = load_config(args.config, "serve")
+    settings.update(flag_settings(args, {"data_file": "data_file", "large_mode": "large_graph_mode"}))
+    # Flag, then config file, then the default
+    run = {"host": "127.0.0.1", "port": 8050, "debug": False}
+    for key in run:
+        value = getattr(args, key)
+        run[key] = value if value is not None else settings.pop(key, run[key])
+        settings.pop(key, None)
+    network_viz = import_from("use_case_2", "network_viz")
+    configure([network_viz], settings)
+    network_viz.build_app().run(**run)
+
+
+def large_mode(text):
+    return "auto" if text == "auto" else text.lower() in ("1", "true", "yes", "on")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Ideas intelligence pipeline: scrape, cluster, link and serve ideas.")
+    parser.add_argument("--config", help="JSON file with a section per subcommand (keys = script constants)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("scrape", help="scrape ideas from the ideas site into a csv")
+    p.add_argument("--link", help="URL of the ideas table")
+    p.add_argument("--output", help="csv file the ideas are appended to")
+    p.add_argument("--mode", choices=["parallel", "click"], help="parallel detail workers or click through rows")
+    p.add_argument("--workers", type=int, help="browser workers fetching descriptions")
+    p.add_argument("--incremental", action="store_const", const=True, help="stop at ideas already in the csv")
+    p.add_argument("--no-resume", dest="resume", action="store_const", const=False, help="ignore the page checkpoint")
+    p.set_defaults(handler=scrape)
+
+    p = commands.add_parser("cluster", help="cluster, name and summarize themes (use_case_1)")
+    p.add_argument("--input", help="csv export or .parquet table of ideas")
+    p.add_argument("--segment", type=parse_segment, help="group to process as VALUE:CODE, e.g. Corporate:IC or None:NA")
+    p.add_argument("--all", action="store_true", help="run every group in one process (ideas_pipeline_all)")
+    p.add_argument("--t5-model", help="local T5-small folder")
+    p.add_argument("--ollama-model", help="Ollama model name")
+    p.add_argument("--ollama-host", help="Ollama server, e.g. http://127.0.0.1:11434")
+    p.add_argument("--cluster-mode", choices=["full", "incremental"], help="re-fit or assign to the saved themes")
+    p.add_argument("--output", help="report file (the merged file with --all)")
+    p.add_argument("--metrics-dir", help="folder for the per-run metrics")
+    p.add_argument("--profile-stage", help="stage to cProfile, e.g. k_sweep")
+    p.set_defaults(handler=cluster)
+
+    p = commands.add_parser("link", help="find similar ideas through the AI API or locally (use_case_2)")
+    p.add_argument("--input", help="csv or .parquet table of ideas")
+    p.add_argument("--mode", choices=["api", "local"], help="AI endpoint or local embeddings")
+    p.add_argument("--url", help="AI similarity endpoint")
+    p.add_argument("--output", help="Excel export of the linked ideas")
+    p.add_argument("--workers", type=int, help="concurrent API requests")
+    p.add_argument("--rate", type=float, help="API requests per second")
+    p.set_defaults(handler=link)
+
+    p = commands.add_parser("serve", help="serve the idea network Dash app (use_case_2)")
+    p.add_argument("--data-file", help="Excel fallback when ideas_store has no linked tables")
+    p.add_argument("--host", help="address to listen on (default 127.0.0.1)")
+    p.add_argument("--port", type=int, help="port to listen on (default 8050)")
+    p.add_argument("--debug", action="store_const", const=True, help="Dash debug mode")
+    p.add_argument("--large-mode", type=large_mode, help="auto, true or false")
+    p.set_defaults(handler=serve)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.handler(args)
+
+
+
+
+if __name__ == "__main__":
+    main()
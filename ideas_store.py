@@ -0,0 +1,72 @@
+'''
+This module is the shared columnar data layer of the pipeline,
+Ideas, cluster assignments and similarity edges are kept as typed Parquet tables,
+So later stages load them near-instantly, memory-mapped, without re-parsing CSV/Excel.
+=> (Excel stays only as the final export for people; scripts read from here.)
+=> (embeddings live in the memory-mapped embedding cache of use_case_1, keyed by idea ID, not here.)
+'''
+
+
+
+
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+
+
+
+store_dir = "ideas_store"
+
+
+
+
+# --- Generic tables (Parquet) ---
+def table_path(name, directory=store_dir, extension=".parquet"):
+    return os.path.join(directory, name + extension)
+
+
+def has_table(name, directory=store_dir, extension=".parquet"):
+    return os.path.exists(table_path(name, directory, extension))
+
+
+def write_table(df, name, directory=store_dir):
+    os.makedirs(directory, exist_ok=True)
+    path = table_path(name, directory)
+    df.to_parquet(path + ".tmp", engine="pyarrow", index=False)
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def read_table(name, columns=None, directory=store_dir):
+    return pd.read_parquet(table_path(name, directory), engine="pyarrow", columns=columns, memory_map=True)
+
+
+# --- Idea identity: the ID column when there is one, else a hash of the idea text ---
+def idea_ids(df, text_column="Ideas"):
+    if "ID" in df.columns:
+        return df["ID"].astype(str)
+    return df[text_column].astype(str).map(lambda text: hashlib.sha1(text.encode("utf-8")).hexdigest())
+
+
+# --- Similarity edges: one typed row per link instead of comma-joined strings ---
+def edges_from_lists(ids, neighbour_lists, scores=None, kind="similar"):
+    sources, targets, weights = [], [], []
+    for row, (source, targets_of_row) in enumerate(zip(ids, neighbour_lists)):
+        sources.extend([source] * len(targets_of_row))
+        targets.extend(targets_of_row)
+        weights.extend(scores[row] if scores is not None else [np.nan] * len(targets_of_row))
+    return pd.DataFrame({
+        "source": pd.Series(sources, dtype="string"),
+        "target": pd.Series(targets, dtype="string"),
+        "score": pd.Series(weights, dtype="float32"),
+        "kind": pd.Series([kind] * len(sources), dtype="string"),
+    })
+
+
+def similar_strings(ids, edges):
+    # Back to the "Similar Idea IDs" export column, only for Excel and hover text
+    joined = edges.groupby("source", sort=False)["target"].agg(", ".join)
+    return pd.Series(ids).map(joined).fillna("").tolist()
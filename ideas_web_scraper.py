@@ -4,6 +4,9 @@ This script uses web-scraping libraries,
 from the given intel URL, into a csv.
 It implements microsoft SSO login in auto-pilot,
 to get access to the internal site data.
+=> (scrape_mode = "parallel" reads the table first, then fetches descriptions with N browser workers.)
+=> (every step waits on a page condition instead of sleeping, and is timed for the end-of-run report.)
+=> (rows are appended to the csv page by page, with a page checkpoint to resume from after a crash.)
 '''
 
 
@@ -14,6 +17,13 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 # import getpass
 import time
+import os
+import json
+import queue
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 from ftfy import fix_text
 from urllib.parse import urlparse
@@ -28,6 +38,17 @@ ps = "" #add the password to the given email
 link = "" #add the URL the comments are to be scraped from
 f = "" #add the csv file name (x.csv) or path with name, you want the comments and replies to be stored in
 
+scrape_mode = "parallel" # "parallel" = table pass + N detail workers, "click" = open each row in the one browser
+detail_workers = 4 # browser workers sharing the logged-in session cookies
+detail_url_template = "https://ideas.xyz.com/idea/{key}" # used when a row has no link, {key} = the row's data-row-key
+detail_retries = 2 # extra attempts for a detail page that did not render; rows still failing are left for a later run
+
+wait_timeout = 30 # seconds to wait for the table, a detail page or a page change
+login_timeout = 180 # seconds to wait for the first table render (covers the SSO login)
+
+resume = True # continue after the last finished page of an interrupted run (f + ".checkpoint.json")
+incremental = False # daily runs: stop paging at the first page holding ideas already in f (key = Idea + Created)
+
 
 ########################
 
@@ -97,9 +118,200 @@ def login_microsoft_sso(target_url):
 
 
 
-# fetch decription too
-def extract_ideas_votes(driver):
+row_selector = "tbody.ant-table-tbody > tr.ant-table-row"
+markdown_selector = "div._markdown_11j0i_1"
+
+
+
+
+# --- Per-step latency, printed as a summary at the end of the run ---
+class StepTimer:
+    def __init__(self):
+        self.durations = defaultdict(list)
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def step(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.durations[name].append(time.perf_counter() - start)
+
+    def report(self):
+        print("⏱️ Step timings (seconds):")
+        print(f"{'step':<18}{'count':>7}{'total':>10}{'mean':>8}{'p95':>8}{'max':>8}")
+        for name, values in self.durations.items():
+            ordered = sorted(values)
+            p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+            print(f"{name:<18}{len(values):>7}{sum(values):>10.1f}{sum(values) / len(values):>8.2f}{p95:>8.2f}{ordered[-1]:>8.2f}")
+
+timer = StepTimer()
+
+def wait_for_rows(driver, min_rows=1, timeout=None):
+    # timeout=None reads wait_timeout when called, so a value set by ideas_cli.py is used
+    WebDriverWait(driver, wait_timeout if timeout is None else timeout).until(lambda d: len(d.find_elements(By.CSS_SELECTOR, row_selector)) >= min_rows)
+
+def cell_text(row, selector, default=""):
+    try:
+        return row.find_element(By.CSS_SELECTOR, selector).text.strip()
+    except:
+        return default
+
+def go_to_next_page(driver):
+    # Go to next page, and wait for the old rows to be replaced
+    # False only on the last page; a timeout or a missing button raises, so the checkpoint is kept
+    next_button = driver.find_element(By.CSS_SELECTOR, "li.ant-pagination-next")
+    if next_button.get_attribute("aria-disabled") == "true":
+        return False  # No more pages
+    first_row = driver.find_element(By.CSS_SELECTOR, row_selector)
+    with timer.step("page load"):
+        driver.execute_script("arguments[0].click();", next_button)
+        WebDriverWait(driver, wait_timeout).until(EC.staleness_of(first_row))
+        wait_for_rows(driver)
+    return True
+
+
+
+
+# --- Streaming output: the csv is the store, rows are appended as pages finish ---
+def idea_key(idea, created):
+    return (fix_text(str(idea)).strip(), str(created).strip())
+
+def load_known_keys(filename):
+    if not os.path.exists(filename) or os.path.getsize(filename) == 0:
+        return set()
+    existing = pd.read_csv(filename, dtype=str, keep_default_na=False, usecols=["Idea", "Created"])
+    return {idea_key(idea, created) for idea, created in zip(existing["Idea"], existing["Created"])}
+
+def append_rows(rows, filename):
+    if not rows:
+        return
+    df = pd.DataFrame(rows, columns=["Idea", "Segment", "Votes", "Created", "Description"])
+    df['Idea'] = df['Idea'].astype(str).apply(fix_text)
+    write_header = not os.path.exists(filename) or os.path.getsize(filename) == 0
+    df.to_csv(filename, mode="a", header=write_header, index=False)
+
+def checkpoint_path(filename):
+    return filename + ".checkpoint.json"
+
+def load_checkpoint(filename):
+    path = checkpoint_path(filename)
+    if not os.path.exists(path):
+        return 0
+    with open(path, "r") as cp:
+        return json.load(cp)["pages_done"]
+
+def save_checkpoint(filename, pages_done):
+    path = checkpoint_path(filename)
+    with open(path + ".tmp", "w") as cp:
+        json.dump({"pages_done": pages_done}, cp)
+    os.replace(path + ".tmp", path)
+
+def scrape_pages(driver, page_rows, filename=f, resume=resume, incremental=incremental):
+    # page_rows(driver, known_keys) scrapes the current page, skipping rows whose key is already known;
+    # it returns (new rows, rows skipped as known, rows that failed)
+    known_keys = load_known_keys(filename)
+    pages_done = load_checkpoint(filename) if resume else 0
+    wait_for_rows(driver)
+
+    if pages_done:
+        print(f"🔁 Resuming after page {pages_done}.")
+        for page in range(pages_done):
+            if not go_to_next_page(driver):
+                pages_done = page  # fewer pages than last time: continue from the last one there is
+                break
+
+    written = 0
+    while True:
+        rows, skipped, failed = page_rows(driver, known_keys)
+        append_rows(rows, filename)
+        known_keys.update(idea_key(row["Idea"], row["Created"]) for row in rows)
+        written += len(rows)
+        pages_done += 1
+        save_checkpoint(filename, pages_done)
+        print(f"💾 Page {pages_done}: {len(rows)} new ideas written ({written} this run).")
+        if failed:
+            print(f"⚠️ Page {pages_done}: {failed} rows failed and were not written; a later run picks them up.")
+
+        if incremental and skipped:
+            print("✅ Reached ideas already in the store, stopping.")
+            break
+        if not go_to_next_page(driver):
+            break
+
+    os.remove(checkpoint_path(filename))  # finished: the next run starts from page 1
+    return written
+
+
+
+
+# --- Click mode: open each row's detail page in the one browser ---
+def click_page_rows(driver, known_keys):
     data = []
+    skipped = failed = 0
+    rows = driver.find_elements(By.CSS_SELECTOR, row_selector)
+
+    for row_index in range(len(rows)):
+        # Re-fetch rows each time, because DOM is refreshed after back()
+        rows = driver.find_elements(By.CSS_SELECTOR, row_selector)
+        row = rows[row_index]
+
+        # Segment, votes, created are visible on the main table only, so grab them before navigating
+        segment = cell_text(row, "td:nth-child(2)")
+        votes = cell_text(row, "td:nth-child(3)", "0")
+        created = cell_text(row, "td:nth-child(5)")
+
+        try:
+            idea_element = row.find_element(By.CSS_SELECTOR, "td:nth-child(1) div.ant-typography")
+            idea = idea_element.text.strip()
+        except:
+            failed += 1
+            continue  # skip this row if it can't be read
+        if idea_key(idea, created) in known_keys:
+            skipped += 1
+            continue  # already in the store, no need to open it
+        try:
+            with timer.step("row click"):
+                driver.execute_script("arguments[0].click();", idea_element)
+        except:
+            failed += 1
+            continue  # skip this row if it can't be clicked
+
+        # Extract description from detail page, as soon as it has rendered
+        description_elem = None
+        with timer.step("detail render"):
+            try:
+                description_elem = WebDriverWait(driver, wait_timeout).until(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, markdown_selector))
+                )
+                description = description_elem.text.strip()
+            except:
+                description = None
+
+        with timer.step("back navigation"):
+            driver.back()
+            # wait for table page to reload
+            if description_elem is not None:
+                WebDriverWait(driver, wait_timeout).until(EC.staleness_of(description_elem))
+            wait_for_rows(driver, min_rows=row_index + 1)
+        if description is None:
+            failed += 1
+            continue  # not written, so a later run opens it again
+
+        data.append({
+            "Idea": idea,
+            "Segment": segment,
+            "Votes": votes,
+            "Created": created,
+            "Description": description
+        })
+
+    return data, skipped, failed
+
+# fetch decription too
+def extract_ideas_votes(driver, filename=f, resume=resume, incremental=incremental):
 
 # Set items per page to 100
     # try:
@@ -119,103 +331,140 @@ def extract_ideas_votes(driver):
     # except Exception as e:
     #     print(f"⚠️ Could not set items per page to 100: {e}")
 
+    return scrape_pages(driver, click_page_rows, filename, resume, incremental)
 
-    while True:
-        time.sleep(2)  # let table load
-
-        rows = driver.find_elements(By.CSS_SELECTOR, "tbody.ant-table-tbody > tr.ant-table-row")
-
-        for row_index in range(len(rows)):
-            # Re-fetch rows each time, because DOM is refreshed after back()
-            rows = driver.find_elements(By.CSS_SELECTOR, "tbody.ant-table-tbody > tr.ant-table-row")
-            row = rows[row_index]
-
-            try:
-                idea_element = row.find_element(By.CSS_SELECTOR, "td:nth-child(1) div.ant-typography")
-                idea = idea_element.text.strip()
-                driver.execute_script("arguments[0].click();", idea_element)
-            except:
-                idea = ""
-                continue  # skip this row if it can't be clicked
-
-            time.sleep(2)  # wait for new page to load
-
-            # Extract description from detail page
-            try:
-                description_elem = driver.find_element(By.CSS_SELECTOR, "div._markdown_11j0i_1")
-                description = description_elem.text.strip()
-            except:
-                description = ""
 
-            # Extract segment, votes, created – assuming these are visible on main table only
-            # so you’ll need to store them before navigating if not available on detail page
-            # Otherwise, re-grab them on the previous page (next step)
 
-            driver.back()
-            time.sleep(2)  # wait for table page to reload
 
-            # Re-fetch the row to get other fields
-            rows = driver.find_elements(By.CSS_SELECTOR, "tbody.ant-table-tbody > tr.ant-table-row")
-            row = rows[row_index]
+# --- Parallel mode: table rows (and detail URLs) from the main browser, descriptions from N workers ---
+def detail_url(row):
+    try:
+        return row.find_element(By.CSS_SELECTOR, "td:nth-child(1) a[href]").get_attribute("href")
+    except:
+        key = row.get_attribute("data-row-key")
+        return detail_url_template.format(key=key) if key else ""
 
+def table_page_rows(driver, known_keys):
+    data = []
+    skipped = 0
+    for row in driver.find_elements(By.CSS_SELECTOR, row_selector):
+        idea = cell_text(row, "td:nth-child(1) div.ant-typography")
+        created = cell_text(row, "td:nth-child(5)")
+        if idea_key(idea, created) in known_keys:
+            skipped += 1
+            continue
+        data.append({
+            "Idea": idea,
+            "Segment": cell_text(row, "td:nth-child(2)"),
+            "Votes": cell_text(row, "td:nth-child(3)", "0"),
+            "Created": created,
+            "URL": detail_url(row),
+        })
+    return data, skipped
+
+def new_worker_driver():
+    edge_options = webdriver.EdgeOptions()
+    edge_options.add_argument("--headless=new")
+    edge_options.add_argument("--disable-gpu")
+    return webdriver.Edge(options=edge_options)
+
+def share_session(worker, base_url, cookies):
+    # Cookies can only be set for the domain currently loaded
+    worker.get(base_url)
+    skipped = []
+    for cookie in cookies:
+        cookie = {key: cookie[key] for key in ("name", "value", "path", "domain", "secure", "httpOnly", "expiry") if key in cookie}
+        try:
+            worker.add_cookie(cookie)
+        except:
+            skipped.append(cookie.get("name", "?"))  # e.g. SSO cookies of another domain
+    # A worker without a valid session is sent to the SSO login domain when it reloads the table
+    worker.get(base_url)
+    if urlparse(worker.current_url).netloc != urlparse(base_url).netloc:
+        raise RuntimeError(f"❌ Detail worker is not logged in (redirected to {worker.current_url}), "
+                           f"cookies not shared: {', '.join(skipped) or 'none'}.")
+    if skipped:
+        print(f"⚠️ {len(skipped)} cookies of other domains not shared with the worker: {', '.join(skipped)}.")
+
+class DetailPool:
+    # N logged-in browsers, kept open for the whole run
+    def __init__(self, cookies, base_url, workers=detail_workers, make_driver=new_worker_driver):
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.drivers = list(self.executor.map(lambda _: make_driver(), range(workers)))
+        list(self.executor.map(lambda worker: share_session(worker, base_url, cookies), self.drivers))
+        self.free = queue.Queue()
+        for worker in self.drivers:
+            self.free.put(worker)
+
+    def fetch_one(self, url):
+        # None when the page did not render in 1 + detail_retries attempts, so the row is not written
+        if not url:
+            return None
+        for attempt in range(detail_retries + 1):
+            worker = self.free.get()
             try:
-                segment = row.find_element(By.CSS_SELECTOR, "td:nth-child(2)").text.strip()
+                with timer.step("detail render"):
+                    worker.get(url)
+                    element = WebDriverWait(worker, wait_timeout).until(EC.presence_of_element_located((By.CSS_SELECTOR, markdown_selector)))
+                    return element.text.strip()
             except:
-                segment = ""
+                continue
+            finally:
+                self.free.put(worker)
+        print(f"⚠️ No description after {detail_retries + 1} attempts: {url}")
+        return None
+
+    def fetch(self, urls):
+        return list(self.executor.map(self.fetch_one, urls))
+
+    def close(self):
+        for worker in self.drivers:
+            worker.quit()
+        self.executor.shutdown()
+
+def extract_ideas_parallel(driver, filename=f, workers=detail_workers, make_driver=new_worker_driver,
+                           resume=resume, incremental=incremental):
+    wait_for_rows(driver)
+    pool = DetailPool(driver.get_cookies(), driver.current_url, workers=workers, make_driver=make_driver)
+
+    def page_rows(driver, known_keys):
+        rows, skipped = table_page_rows(driver, known_keys)
+        for row, description in zip(rows, pool.fetch([row.pop("URL") for row in rows])):
+            row["Description"] = description
+        # Rows without a description stay out of the csv (and of known_keys), so the next run fetches them again
+        fetched = [row for row in rows if row["Description"] is not None]
+        return fetched, skipped, len(rows) - len(fetched)
 
-            try:
-                votes = row.find_element(By.CSS_SELECTOR, "td:nth-child(3)").text.strip()
-            except:
-                votes = "0"
+    try:
+        return scrape_pages(driver, page_rows, filename, resume, incremental)
+    finally:
+        pool.close()
 
-            try:
-                created = row.find_element(By.CSS_SELECTOR, "td:nth-child(5)").text.strip()
-            except:
-                created = ""
 
-            data.append({
-                "Idea": idea,
-                "Segment": segment,
-                "Votes": votes,
-                "Created": created,
-                "Description": description
-            })
 
-        # Try to go to next page
-        try:
-            next_button = driver.find_element(By.CSS_SELECTOR, "li.ant-pagination-next")
-            aria_disabled = next_button.get_attribute("aria-disabled")
-            if aria_disabled == "true":
-                break  # No more pages
-            else:
-                driver.execute_script("arguments[0].click();", next_button)
-                time.sleep(2)
-        except:
-            break
 
-    return data
 
 
 
+def main():
+    # Settings are read when main runs, so ideas_cli.py can set them from flags or a config file
+    driver = webdriver.Edge()
+    with timer.step("initial load"):
+        driver.get(link)  # Replace with your actual target page
+        wait_for_rows(driver, timeout=login_timeout)  # Adjust login_timeout depending on how long the login takes
 
+    if scrape_mode == "parallel":
+        written = extract_ideas_parallel(driver, f, workers=detail_workers, resume=resume, incremental=incremental)
+    else:
+        written = extract_ideas_votes(driver, f, resume=resume, incremental=incremental)
+    print(f"✅ Extracted {written} new ideas. Saved to '{f}'.")
 
+    driver.quit()
+    timer.report()
+    return written
 
 
-def save_to_csv(data, filename=f):
-    df = pd.DataFrame(data)
-    df['Idea'] = df['Idea'].astype(str).apply(fix_text)
-    df.to_csv(filename, index=False)
-    print(f"✅ Extracted {len(df)} ideas. Saved to '{filename}'.")
 
 
 if __name__ == "__main__":
-    driver = webdriver.Edge()
-    driver.get(link)  # Replace with your actual target page
-    time.sleep(5)  # Adjust depending on how long it takes to load/login
-
-    ideas_votes = extract_ideas_votes(driver)
-    save_to_csv(ideas_votes)
-
-    driver.quit()
-    
-
+    main()
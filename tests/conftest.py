@@ -0,0 +1,8 @@
+import os
+import sys
+
+root_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+for folder in ("", "use_case_1", "use_case_2", "benchmarks"):
+    path = os.path.abspath(os.path.join(root_dir, folder))
+    if path not in sys.path:
+        sys.path.insert(0, path)
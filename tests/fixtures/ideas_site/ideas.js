@@ -0,0 +1,13 @@
+// Ideas shown by the fixture site: 23 ideas, so 3 pages of 10
+var IDEAS = [];
+for (var i = 1; i <= 23; i++) {
+    IDEAS.push({
+        key: "idea-" + i,
+        idea: "Idea number " + i,
+        segment: i % 2 ? "Corporate" : "Plant",
+        votes: String(i * 3),
+        created: "2024-01-" + (i < 10 ? "0" : "") + i,
+        description: "Description of idea " + i
+    });
+}
+IDEAS[6].description = null; // idea-7: its detail page never renders the markdown, like a failing page
@@ -0,0 +1,55 @@
+import pickle
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from checkpoint_store import CheckpointStore
+
+
+def ideas():
+    df = pd.DataFrame({"ID": ["1", "2", "3"], "Idea Name": ["a", "b", "c"]})
+    df["Similar Idea IDs"] = ""
+    return df
+
+
+def test_apply_joins_recorded_results_and_keeps_the_rest(tmp_path):
+    store = CheckpointStore(str(tmp_path / "checkpoint.sqlite"))
+    store.record("1", ["2", "3"])
+    store.record(3, [])
+    store.record("99", ["1"])  # an idea that is no longer in the input
+    df = store.apply(ideas())
+    assert df["Similar Idea IDs"].tolist() == ["2, 3", "", ""]
+    assert store.processed_ids() == {"1", "3", "99"}
+    store.close()
+
+
+def test_apply_on_an_empty_store_changes_nothing(tmp_path):
+    store = CheckpointStore(str(tmp_path / "checkpoint.sqlite"))
+    df = ideas()
+    assert store.apply(df) is df
+    assert df["Similar Idea IDs"].tolist() == ["", "", ""]
+    store.close()
+
+
+def test_later_record_replaces_the_earlier_one_and_survives_reopening(tmp_path):
+    path = str(tmp_path / "checkpoint.sqlite")
+    store = CheckpointStore(path)
+    store.record("2", ["1"])
+    store.record("2", ["1", "3"])
+    store.close()
+
+    reopened = CheckpointStore(path)
+    assert len(reopened) == 1
+    assert reopened.apply(ideas())["Similar Idea IDs"].tolist() == ["", "1, 3", ""]
+    reopened.close()
+
+
+def test_legacy_pickle_is_imported_once(tmp_path):
+    legacy = tmp_path / "results_checkpoint.pkl"
+    legacy.write_bytes(pickle.dumps({"1": ["2"], 2: ["1", "3"]}))
+    store = CheckpointStore(str(tmp_path / "checkpoint.sqlite"))
+    assert store.import_legacy(str(legacy)) == 2
+    assert store.import_legacy(str(legacy)) == 0  # the journal already has results
+    assert store.apply(ideas())["Similar Idea IDs"].tolist() == ["2", "1, 3", ""]
+    store.close()
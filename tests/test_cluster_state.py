@@ -0,0 +1,38 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("scipy")
+
+from cluster_state import load_state, match_clusters, save_state, stable_ids
+
+old_centroids = np.array([[0.0, 0.0], [10.0, 0.0], [0.0, 10.0]], dtype=np.float32)
+old_stats = {"sizes": [5, 5, 5], "mean_distance": [1.0, 1.0, 1.0], "p95_distance": [2.0, 2.0, 2.0]}
+
+
+def test_reordered_clusters_are_matched_to_their_old_index():
+    new_centroids = old_centroids[[2, 0, 1]] + 0.1
+    assert match_clusters(old_centroids, old_stats, new_centroids) == {0: 2, 1: 0, 2: 1}
+
+
+def test_clusters_beyond_the_radius_are_not_matched():
+    new_centroids = np.array([[0.2, 0.0], [10.0, 5.0], [0.0, 10.3]], dtype=np.float32)
+    assert match_clusters(old_centroids, old_stats, new_centroids) == {0: 0, 2: 2}
+
+
+def test_stable_ids_keep_matched_ids_and_fill_the_rest():
+    # New cluster 0 was old 2, new 2 was old 0; the others take the free IDs in order
+    assert stable_ids({0: 2, 2: 0}, 4) == {0: 2, 2: 0, 1: 1, 3: 3}
+
+
+def test_stable_ids_drop_old_ids_out_of_range_when_k_shrinks():
+    mapping = stable_ids({0: 3, 1: 0}, 2)
+    assert mapping == {1: 0, 0: 1}
+    assert sorted(mapping.values()) == [0, 1]
+
+
+def test_state_round_trip(tmp_path):
+    save_state("IC", old_centroids, ["A", "B", "C"], old_stats, ["11", "12"], directory=str(tmp_path))
+    centroids, state = load_state("IC", directory=str(tmp_path))
+    np.testing.assert_array_equal(centroids, old_centroids)
+    assert state["theme_names"] == ["A", "B", "C"]
+    assert state["ids"] == ["11", "12"]
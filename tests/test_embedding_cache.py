@@ -0,0 +1,54 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from embedding_cache import EmbeddingCache, encode_with_cache
+
+
+def vectors(n, dim=8, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+
+
+def test_two_writers_keep_keys_and_rows_in_step(tmp_path):
+    # Both caches are opened before either writes, like two worker processes
+    first = EmbeddingCache(str(tmp_path), "model")
+    second = EmbeddingCache(str(tmp_path), "model")
+    a, b = vectors(3, seed=1), vectors(2, seed=2)
+    first.add(["a0", "a1", "a2"], a)
+    second.add(["b0", "b1"], b)
+
+    np.testing.assert_allclose(second.get(["b0", "b1"]), b)
+    reopened = EmbeddingCache(str(tmp_path), "model")
+    assert reopened.n_rows == 5
+    np.testing.assert_allclose(reopened.get(["a0", "a1", "a2"]), a)
+    np.testing.assert_allclose(reopened.get(["b0", "b1"]), b)
+
+
+def test_key_stored_by_another_writer_is_not_appended_twice(tmp_path):
+    first = EmbeddingCache(str(tmp_path), "model")
+    second = EmbeddingCache(str(tmp_path), "model")
+    v = vectors(1)
+    first.add(["same"], v)
+    second.add(["same"], v)
+    assert EmbeddingCache(str(tmp_path), "model").n_rows == 1
+
+
+@pytest.mark.parametrize("storage, tolerance", [("float32", 1e-6), ("float16", 1e-2), ("int8", 5e-2)])
+def test_storage_modes_round_trip(tmp_path, storage, tolerance):
+    v = vectors(4)
+    cache = EmbeddingCache(str(tmp_path), "model", storage=storage)
+    cache.add(list("wxyz"), v)
+    np.testing.assert_allclose(EmbeddingCache(str(tmp_path), "model", storage=storage).get(list("zyxw")),
+                               v[::-1], atol=tolerance)
+
+
+def test_matrix_reads_rows_by_id(tmp_path):
+    class Embedder:
+        def encode(self, texts, **kwargs):
+            return np.array([[len(t), 1.0] for t in texts], dtype=np.float32)
+
+    matrix = encode_with_cache(["a", "bb", "ccc"], "model", cache_dir=str(tmp_path), embedder=Embedder(),
+                               as_matrix=True, ids=["1", "2", "3"])
+    assert matrix.shape == (3, 2)
+    np.testing.assert_allclose(matrix.get_ids(["3", "1"]), [[3, 1], [1, 1]])
+    np.testing.assert_allclose(matrix.subset([1, 2])[0], [2, 1])
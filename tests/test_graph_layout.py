@@ -0,0 +1,34 @@
+import pytest
+
+nx = pytest.importorskip("networkx")
+pytest.importorskip("numpy")
+
+from graph_layout import place_new_nodes
+
+
+def saved_graph():
+    G = nx.path_graph(["a", "b", "c", "d"])
+    saved = {"a": (0.0, 0.0), "b": (1.0, 0.0), "c": (1.0, 1.0), "d": (0.0, 1.0)}
+    return G, saved
+
+
+def test_saved_nodes_stay_pinned_and_anchored_nodes_are_placed():
+    G, saved = saved_graph()
+    G.add_edge("e", "b")
+    pos, n_new = place_new_nodes(G, saved)
+    assert n_new == 1
+    assert all(pos[node] == xy for node, xy in saved.items())
+    assert set(pos) == set(G)
+
+
+def test_new_group_without_placed_neighbours_goes_below_the_picture():
+    G, saved = saved_graph()
+    G.add_edges_from([("x", "y"), ("y", "z")])
+    G.add_node("lonely")
+    pos, n_new = place_new_nodes(G, saved)
+    assert n_new == 4
+    assert all(pos[node] == xy for node, xy in saved.items())
+    # Not on top of the existing picture around (0, 0), and kept apart from each other
+    assert all(pos[node][1] < 0 for node in ("x", "y", "z"))
+    assert len({pos[node] for node in ("x", "y", "z")}) == 3
+    assert pos["lonely"][1] < min(pos[node][1] for node in ("x", "y", "z"))
@@ -0,0 +1,41 @@
+import json
+import types
+
+import pytest
+
+import ideas_cli
+
+
+@pytest.fixture
+def fake_viz(monkeypatch):
+    # Stands in for network_viz: records the settings it was given and the arguments of app.run
+    viz = types.ModuleType("network_viz")
+    viz.data_file = "ideas.xlsx"
+    viz.runs = []
+    viz.build_app = lambda: types.SimpleNamespace(run=lambda **kwargs: viz.runs.append(kwargs))
+    monkeypatch.setattr(ideas_cli, "import_from", lambda folder, name: viz)
+    return viz
+
+
+def write_config(tmp_path, serve):
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps({"serve": serve}))
+    return str(path)
+
+
+def test_serve_defaults(fake_viz):
+    ideas_cli.main(["serve"])
+    assert fake_viz.runs == [{"host": "127.0.0.1", "port": 8050, "debug": False}]
+
+
+def test_serve_config_fills_in_missing_flags(fake_viz, tmp_path):
+    config = write_config(tmp_path, {"host": "0.0.0.0", "port": 9000, "debug": True, "data_file": "other.xlsx"})
+    ideas_cli.main(["--config", config, "serve"])
+    assert fake_viz.runs == [{"host": "0.0.0.0", "port": 9000, "debug": True}]
+    assert fake_viz.data_file == "other.xlsx"
+
+
+def test_serve_flags_win_over_config(fake_viz, tmp_path):
+    config = write_config(tmp_path, {"host": "0.0.0.0", "port": 9000, "debug": False})
+    ideas_cli.main(["--config", config, "serve", "--host", "127.0.0.2", "--port", "8100", "--debug"])
+    assert fake_viz.runs == [{"host": "127.0.0.2", "port": 8100, "debug": True}]
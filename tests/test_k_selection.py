@@ -0,0 +1,32 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("sklearn")
+pytest.importorskip("kneed")
+
+from sklearn.cluster import KMeans
+
+from k_selection import select_k
+
+
+def blobs(n_per_blob=60, centers=((0, 0), (8, 0), (0, 8), (8, 8)), seed=0):
+    rng = np.random.default_rng(seed)
+    return np.vstack([rng.normal(loc=center, scale=0.5, size=(n_per_blob, 2)) for center in centers]).astype(np.float32)
+
+
+@pytest.mark.parametrize("sample_size", [None, 120])
+def test_minibatch_sweep_is_refined_by_a_full_kmeans(sample_size):
+    data = blobs()
+    selection = select_k(data, k_range=range(2, 8), method="silhouette", n_jobs=1, minibatch=True, sample_size=sample_size)
+    assert selection.k == 4
+    assert isinstance(selection.model, KMeans)
+    np.testing.assert_array_equal(selection.labels, selection.model.labels_)
+    assert len(selection.labels) == len(data)
+
+
+def test_full_sweep_keeps_the_winning_model():
+    data = blobs()
+    selection = select_k(data, k_range=range(2, 8), method="silhouette", n_jobs=1)
+    assert selection.k == 4
+    assert selection.model.n_clusters == 4
+    np.testing.assert_array_equal(selection.labels, selection.model.labels_)
@@ -0,0 +1,65 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from near_duplicates import minhash_signatures, near_duplicate_groups, similarity
+
+base = "Automate the monthly supplier invoice reconciliation with a shared dashboard and alerts for every mismatch"
+texts = [
+    base,
+    "Start a mentoring programme pairing new engineers with senior staff during their first quarter",
+    base + "!",
+    base.replace("monthly", "Monthly  "),  # case and spacing are normalized away
+    "Replace the paper safety checklists on the shop floor with a tablet form that syncs to the quality system",
+    base[:40] + " of the warehouse forklifts, and retire the old pallet scanners",  # shares a prefix only
+]
+
+
+def test_resubmissions_join_the_group_of_the_first_idea():
+    groups, scores = near_duplicate_groups(texts, threshold=0.8)
+    assert groups.tolist() == [0, 1, 0, 0, 4, 5]
+    assert scores[[0, 1, 4, 5]].tolist() == [1.0, 1.0, 1.0, 1.0]
+    assert scores[3] == 1.0 and scores[2] >= 0.8
+
+
+def test_precomputed_signatures_give_the_same_groups():
+    signatures = minhash_signatures(texts, num_perm=64)
+    expected = near_duplicate_groups(texts, num_perm=64)
+    groups, scores = near_duplicate_groups(None, signatures=signatures)
+    np.testing.assert_array_equal(groups, expected[0])
+    np.testing.assert_array_equal(scores, expected[1])
+    np.testing.assert_array_equal(scores, similarity(signatures, np.arange(len(texts)), groups))
+
+
+def test_empty_input():
+    groups, scores = near_duplicate_groups([])
+    assert len(groups) == len(scores) == 0
+
+
+def test_collapse_sums_numeric_counts_and_scores_against_the_representative(tmp_path, monkeypatch):
+    pd = pytest.importorskip("pandas")
+    for module in ("pyarrow", "sklearn", "kneed", "joblib", "ollama"):
+        pytest.importorskip(module)
+    import ideas_pipeline_one as pipeline_one
+
+    monkeypatch.chdir(tmp_path)  # duplicate_edges goes to ./ideas_store
+    df = pd.DataFrame({
+        "ID": ["11", "12", "13", "14", "15", "16"],
+        "Segment": ["Corporate"] * 6,
+        "Ideas": texts,
+        "Votes": ["3", "7", "n/a", "10", "1", "2"],
+        "Idea Comments": [1, 0, 2, "", 5, 0],
+    })
+    collapsed = pipeline_one.collapse_near_duplicates(df, threshold=0.8, num_perm=128)
+
+    # 14 has the most votes of the 11/13/14 group, so it represents it; "n/a" and "" count as 0
+    assert collapsed["ID"].tolist() == ["12", "14", "15", "16"]
+    assert collapsed["Votes"].tolist() == [7, 13, 1, 2]
+    assert collapsed["Idea Comments"].tolist() == [0, 3, 5, 0]
+
+    import ideas_store
+    edges = ideas_store.read_table("duplicate_edges").sort_values("target")
+    assert edges["source"].tolist() == ["14", "14"]
+    assert edges["target"].tolist() == ["11", "13"]
+    signatures = minhash_signatures(texts, num_perm=128)
+    np.testing.assert_allclose(edges["score"].to_numpy(), similarity(signatures, [0, 2], [3, 3]))
@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("ollama")
+
+from llm_cache import LLMCache
+from ollama_scheduler import OllamaScheduler
+from stub_servers import start_ollama_stub, stub_answer
+
+
+@pytest.fixture
+def stub(request):
+    server = start_ollama_stub(**getattr(request, "param", {}))
+    yield server
+    server.stop()
+
+
+def scheduler_for(stub, **settings):
+    settings = {"model": "stub", "max_in_flight": 4, "timeout": 5, "retries": 2, "retry_delay": 0.0, **settings}
+    return OllamaScheduler(host=stub.url, **settings)
+
+
+@pytest.mark.parametrize("stub", [{"latency": 0.02}], indirect=True)
+def test_answers_come_back_in_prompt_order(stub):
+    scheduler = scheduler_for(stub)
+    prompts = [f"prompt {i}" for i in range(12)] + ["prompt 3"]
+    try:
+        assert scheduler.chat_many(prompts) == [stub_answer(prompt) for prompt in prompts]
+        assert scheduler.calls == 12  # the repeated prompt is generated once
+    finally:
+        scheduler.close()
+
+
+@pytest.mark.parametrize("stub", [{"latency": 0.01, "fail_first": 2}], indirect=True)
+def test_failed_requests_are_retried(stub):
+    scheduler = scheduler_for(stub)
+    prompts = [f"prompt {i}" for i in range(6)]
+    try:
+        assert scheduler.chat_many(prompts) == [stub_answer(prompt) for prompt in prompts]
+        assert scheduler.retried == 2 * len(prompts)  # every prompt failed twice, then succeeded
+        assert scheduler.calls == len(prompts)
+    finally:
+        scheduler.close()
+
+
+@pytest.mark.parametrize("stub", [{"latency": 0.5}], indirect=True)
+def test_timeout_raises_after_the_retries(stub):
+    scheduler = scheduler_for(stub, timeout=0.05, retries=1)
+    try:
+        with pytest.raises((asyncio.TimeoutError, TimeoutError)):
+            scheduler.chat("slow prompt")
+        assert scheduler.retried == 1
+    finally:
+        scheduler.close()
+
+
+@pytest.mark.parametrize("stub", [{"latency": 0.01, "fail_marker": "BROKEN"}], indirect=True)
+def test_answers_before_a_failure_stay_cached(stub, tmp_path):
+    cache = LLMCache(str(tmp_path / "llm_cache.sqlite"))
+    scheduler = scheduler_for(stub, retries=1, cache=cache)
+    try:
+        with pytest.raises(Exception):
+            scheduler.chat_many(["first", "second", "BROKEN third"], template_version="v1")
+        calls = scheduler.calls
+        assert scheduler.chat_many(["first", "second"], template_version="v1") == [stub_answer("first"), stub_answer("second")]
+        assert scheduler.calls == calls  # both answered from the cache
+    finally:
+        scheduler.close()
+        cache.close()
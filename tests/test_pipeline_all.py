@@ -0,0 +1,35 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+for module in ("pyarrow", "sklearn", "kneed", "joblib", "ollama"):
+    pytest.importorskip(module)
+
+import ideas_pipeline_all as pipeline_all
+
+
+# 3 segments: at most 3 run at once, whatever the worker count
+@pytest.mark.parametrize("workers, cores, expected", [(4, 16, 5), (4, 2, 1), (1, 8, 8), (2, 12, 6)])
+def test_segments_share_the_cores_of_the_k_sweep(monkeypatch, workers, cores, expected):
+    calls = []
+    monkeypatch.setattr(pipeline_all.os, "cpu_count", lambda: cores)
+    monkeypatch.setattr(pipeline_all.pipeline_one, "run_segment",
+                        lambda df, embeddings, t5, scheduler, code, k_jobs: calls.append(k_jobs) or code)
+    df = pd.DataFrame({"Segment": ["Products", "Corporate", "Foundry"], "Ideas": ["a", "b", "c"]})
+    embeddings = np.zeros((3, 4), dtype=np.float32)
+    segments = [("Products", "IP"), ("Corporate", "IC"), ("Foundry", "IF")]
+
+    results = pipeline_all.run_all_segments(df, embeddings, None, None, segments=segments, workers=workers)
+    assert results == {"IP": "IP", "IC": "IC", "IF": "IF"}
+    assert calls == [expected] * 3
+
+
+def test_explicit_k_sweep_jobs_is_kept(monkeypatch):
+    calls = []
+    monkeypatch.setattr(pipeline_all.pipeline_one, "k_sweep_jobs", 2)
+    monkeypatch.setattr(pipeline_all.pipeline_one, "run_segment",
+                        lambda df, embeddings, t5, scheduler, code, k_jobs: calls.append(k_jobs))
+    df = pd.DataFrame({"Segment": ["Products"], "Ideas": ["a"]})
+    pipeline_all.run_all_segments(df, np.zeros((1, 4), dtype=np.float32), None, None,
+                                  segments=[("Products", "IP")], workers=4)
+    assert calls == [2]
@@ -0,0 +1,109 @@
+import threading
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+pytest.importorskip("requests")
+
+from similarity_client import SimilarityClient
+from stub_servers import QuietHandler, StubServer
+
+
+class FlakyBodyHandler(QuietHandler):
+    # "list ..." queries get a JSON list, "null ..." a null content; others a list body on their first request only
+    seen = set()
+    lock = threading.Lock()
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query).get("q", [""])[0]
+        with self.lock:
+            first = query not in self.seen
+            self.seen.add(query)
+        if query.startswith("list") or first:
+            self.send_json(["not", "a", "dict"])
+        elif query.startswith("null"):
+            self.send_json({"content": None})
+        else:
+            self.send_json({"content": f"Idea {query}"})
+
+
+@pytest.fixture
+def server():
+    stub = StubServer(FlakyBodyHandler, seen=set(), lock=threading.Lock()).start()
+    yield stub
+    stub.stop()
+
+
+def client_for(server, **settings):
+    return SimilarityClient(server.url, rate_per_second=1000, burst=10, workers=4, backoff=0.0, **settings)
+
+
+@pytest.mark.parametrize("max_retries", [0, 1, 3])
+def test_bad_bodies_are_queued_for_retry_instead_of_stopping_the_run(server, max_retries):
+    client = client_for(server, max_retries=max_retries)
+    results = {}
+    items = [("1", "1001"), ("2", "list 1002"), ("3", "null 1003"), ("4", "1004")]
+    failed = client.fetch_many(items, lambda idea_id, content: results.update({idea_id: content}),
+                               retry_rounds=1, round_cooldown=0)
+    client.close()
+    assert sorted(failed) == ["2", "3"]
+    assert results == {"1": "Idea 1001", "4": "Idea 1004"}
+
+
+def test_errors_in_on_result_queue_the_id(server):
+    client = client_for(server, max_retries=2)
+    calls = []
+
+    def on_result(idea_id, content):
+        calls.append(idea_id)
+        if len(calls) == 1:
+            raise KeyError("handler failed once")
+
+    # Round 0: a bad body, round 1: on_result fails, round 2: handled
+    failed = client.fetch_many([("1", "1001")], on_result, retry_rounds=2, round_cooldown=0)
+    client.close()
+    assert failed == [] and calls == ["1", "1"]
+
+
+class StatusHandler(QuietHandler):
+    # "<status> <n>" queries get that status on their first n requests, then an answer; requests are counted per query
+    counts = {}
+    lock = threading.Lock()
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query).get("q", [""])[0]
+        with self.lock:
+            self.counts[query] = self.counts.get(query, 0) + 1
+            count = self.counts[query]
+        status, failures = (int(part) for part in query.split())
+        if count <= failures:
+            self.send_json({"error": "stub"}, status=status, headers={"Retry-After": "0"})
+        else:
+            self.send_json({"content": "Idea 1001"})
+
+
+@pytest.fixture
+def status_server():
+    stub = StubServer(StatusHandler, counts={}, lock=threading.Lock()).start()
+    yield stub
+    stub.stop()
+
+
+def test_max_retries_counts_retries_after_the_first_attempt(status_server):
+    client = client_for(status_server, max_retries=2)
+    results = {}
+    failed = client.fetch_many([("1", "503 2"), ("2", "429 2"), ("3", "500 3")],
+                               lambda idea_id, content: results.update({idea_id: content}), retry_rounds=0)
+    client.close()
+    assert results == {"1": "Idea 1001", "2": "Idea 1001"}
+    assert failed == ["3"]
+    assert status_server.server.RequestHandlerClass.counts == {"503 2": 3, "429 2": 3, "500 3": 3}
+
+
+def test_client_errors_are_not_retried(status_server):
+    client = client_for(status_server, max_retries=3)
+    failed = client.fetch_many([("1", "404 1"), ("2", "400 1"), ("3", "401 1")], lambda idea_id, content: None,
+                               retry_rounds=2, round_cooldown=0)
+    client.close()
+    assert sorted(failed) == ["1", "2", "3"]
+    assert status_server.server.RequestHandlerClass.counts == {"404 1": 1, "400 1": 1, "401 1": 1}
@@ -0,0 +1,36 @@
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from similarity_engine import brute_force_neighbors, find_similar
+
+
+def vectors(n=40, dim=8, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+
+
+def test_auto_falls_back_to_brute_force_without_hnswlib(monkeypatch, capsys):
+    monkeypatch.setitem(sys.modules, "hnswlib", None)  # import hnswlib now raises ImportError
+    data = vectors()
+    neighbours, scores = find_similar(data, k=3, min_score=-1.0, approx_threshold=10, with_scores=True)
+    indices, expected = brute_force_neighbors(data, k=3)
+    assert neighbours == indices.tolist()
+    np.testing.assert_allclose(scores, expected)
+    assert "hnswlib is not installed" in capsys.readouterr().out
+
+
+def test_explicit_approx_still_needs_hnswlib(monkeypatch):
+    monkeypatch.setitem(sys.modules, "hnswlib", None)
+    with pytest.raises(ImportError, match="hnswlib"):
+        find_similar(vectors(), k=3, method="approx")
+
+
+def test_brute_force_never_returns_the_idea_itself():
+    data = vectors(n=30)
+    data[1] = data[0]  # an exact duplicate is the best match of both
+    indices, scores = brute_force_neighbors(data, k=2, block_size=7)
+    assert indices[0, 0] == 1 and indices[1, 0] == 0
+    assert not (indices == np.arange(30)[:, None]).any()
+    assert (np.diff(scores, axis=1) <= 0).all()
@@ -0,0 +1,102 @@
+import pytest
+
+from summary_store import SummaryStore, fingerprint
+
+
+def stored(tmp_path, themes, version="v1"):
+    # A store file written by an earlier run, with the given {theme: (ids, updates)}
+    path = str(tmp_path / "summary_store" / "IC.json")
+    store = SummaryStore(path)
+    for theme, (ids, updates) in themes.items():
+        store.put(theme, ids, f"summary of {theme}", version, updates=updates)
+    store.save()
+    return SummaryStore(path)
+
+
+def test_unchanged_members_reuse_the_summary(tmp_path):
+    store = stored(tmp_path, {"Tooling": (["1", "2", "3"], 0)})
+    action, entry, new_ids = store.plan("Tooling", [3, 1, 2], "v1")
+    assert (action, entry["summary"], new_ids) == ("reuse", "summary of Tooling", [])
+
+
+def test_renamed_theme_is_found_by_its_members(tmp_path):
+    store = stored(tmp_path, {"Tooling": (["1", "2", "3"], 0)})
+    action, entry, _ = store.plan("Tools and equipment", ["1", "2", "3"], "v1")
+    assert (action, entry["summary"]) == ("reuse", "summary of Tooling")
+
+
+def test_a_few_additions_get_an_update_pass(tmp_path):
+    store = stored(tmp_path, {"Tooling": (["1", "2", "3", "4"], 0)})
+    action, entry, new_ids = store.plan("Tooling", ["1", "2", "3", "4", "5", "6"], "v1")
+    assert (action, entry["summary"], new_ids) == ("update", "summary of Tooling", ["5", "6"])
+
+
+def test_full_pass_cases(tmp_path):
+    store = stored(tmp_path, {"Tooling": (["1", "2", "3", "4"], 0), "Safety": (["7", "8"], 5)})
+    assert store.plan("Tooling", ["1", "2", "3"], "v1")[0] == "full"  # an idea was removed
+    assert store.plan("Tooling", ["1", "2", "3", "4", "5", "6", "9"], "v1")[0] == "full"  # too many new ideas
+    assert store.plan("Tooling", ["1", "2", "3", "4"], "v2")[0] == "full"  # prompt version changed
+    assert store.plan("Safety", ["7", "8", "9"], "v1")[0] == "full"  # already updated max_updates times
+    assert store.plan("Quality", ["10"], "v1") == ("full", None, [])  # never seen
+
+
+def test_save_keeps_only_the_themes_of_this_run(tmp_path):
+    store = stored(tmp_path, {"Tooling": (["1", "2"], 0), "Safety": (["3"], 0)})
+    store.put("Tooling", ["1", "2", "4"], "new summary", "v1", updates=1)
+    store.save()
+    reopened = SummaryStore(store.path)
+    assert list(reopened.entries) == ["Tooling"]
+    assert reopened.entries["Tooling"]["fingerprint"] == fingerprint(["4", "2", "1"])
+    assert reopened.entries["Tooling"]["updates"] == 1
+
+
+class RecordingScheduler:
+    def __init__(self):
+        self.prompts = []
+
+    def chat_many(self, prompts, template_version=""):
+        self.prompts.extend(prompts)
+        return [f"summary {len(self.prompts) - len(prompts) + i}" for i in range(len(prompts))]
+
+
+def pipeline(tmp_path, monkeypatch):
+    for module in ("numpy", "pandas", "pyarrow", "sklearn", "kneed", "joblib", "ollama"):
+        pytest.importorskip(module)
+    import ideas_pipeline_one as pipeline_one
+    monkeypatch.setattr(pipeline_one, "summary_store_dir", str(tmp_path / "summary_store"))
+    return pipeline_one
+
+
+def summarize(pipeline_one, ids, texts_by_id):
+    scheduler = RecordingScheduler()
+    summaries, _ = pipeline_one.change_aware_summaries(["Tooling"], [ids], [[texts_by_id[i] for i in ids]],
+                                                       texts_by_id, None, scheduler, code="IC")
+    return summaries[0], scheduler.prompts
+
+
+def test_long_additions_are_summarized_from_scratch(tmp_path, monkeypatch):
+    pipeline_one = pipeline(tmp_path, monkeypatch)
+    texts_by_id = {str(i): f"short idea {i}" for i in range(1, 5)}
+    summarize(pipeline_one, ["1", "2", "3", "4"], texts_by_id)
+
+    # One added idea fits an update prompt; one far over the context budget does not
+    texts_by_id["5"] = "another short idea"
+    _, prompts = summarize(pipeline_one, ["1", "2", "3", "4", "5"], texts_by_id)
+    assert len(prompts) == 1 and "Existing summary:" in prompts[0]
+
+    texts_by_id["6"] = "word " * (pipeline_one.ollama_context_tokens * pipeline_one.ollama_chars_per_token)
+    _, prompts = summarize(pipeline_one, ["1", "2", "3", "4", "5", "6"], texts_by_id)
+    assert prompts and not any("Existing summary:" in prompt for prompt in prompts)
+    budget = pipeline_one.ollama_context_tokens - pipeline_one.summary_answer_tokens
+    assert all(pipeline_one.estimate_tokens(prompt, pipeline_one.ollama_chars_per_token) <= budget for prompt in prompts)
+
+
+def test_changed_merge_or_update_template_invalidates_saved_summaries(tmp_path, monkeypatch):
+    pipeline_one = pipeline(tmp_path, monkeypatch)
+    texts_by_id = {str(i): f"short idea {i}" for i in range(1, 4)}
+    summarize(pipeline_one, ["1", "2", "3"], texts_by_id)
+    assert summarize(pipeline_one, ["1", "2", "3"], texts_by_id)[1] == []  # reused
+
+    for setting in ("merge_prompt_version", "summary_update_prompt_version"):
+        monkeypatch.setattr(pipeline_one, setting, "changed")
+        assert len(summarize(pipeline_one, ["1", "2", "3"], texts_by_id)[1]) == 1
@@ -0,0 +1,55 @@
+from summary_tree import estimate_tokens, fits, pack, reduce_summaries, split_to_budget
+
+
+class RecordingScheduler:
+    # Answers every prompt with a short fixed text and keeps what was sent
+    def __init__(self, answer="partial summary"):
+        self.answer = answer
+        self.prompts = []
+
+    def chat_many(self, prompts, template_version=""):
+        self.prompts.extend(prompts)
+        return [self.answer for _ in prompts]
+
+
+def identity(text):
+    return text
+
+
+def test_split_pieces_fit_the_budget():
+    text = " ".join(["word"] * 500)
+    pieces = split_to_budget(text, budget=50)
+    assert len(pieces) > 1
+    assert all(estimate_tokens(piece) <= 50 for piece in pieces)
+
+
+def test_pack_never_pairs_parts_over_the_budget():
+    parts = ["x" * 150] * 5  # each part is about 38 tokens, two do not fit in 50
+    packs = pack(parts, budget=50)
+    assert [len(p) for p in packs] == [1] * 5
+    assert all(fits(p, 50) for p in packs)
+
+
+def test_pack_combines_small_parts_in_order():
+    parts = [f"part {i}" for i in range(20)]
+    packs = pack(parts, budget=20)
+    assert [part for p in packs for part in p] == parts
+    assert len(packs) < len(parts)
+    assert all(fits(p, 20) for p in packs)
+
+
+def test_small_group_is_one_prompt():
+    scheduler = RecordingScheduler()
+    summaries, trees = reduce_summaries([["a", "b"]], scheduler, identity, identity, budget=100)
+    assert summaries == ["partial summary"]
+    assert trees == [{"depth": 1, "fan_out": 2, "calls": 1}]
+
+
+def test_every_prompt_stays_within_the_budget():
+    budget = 40
+    scheduler = RecordingScheduler()
+    groups = [[" ".join(["idea"] * 60)] * 3, ["y" * 100] * 7, ["short"]]
+    summaries, trees = reduce_summaries(groups, scheduler, identity, identity, budget=budget)
+    assert all(summary == "partial summary" for summary in summaries)
+    assert all(estimate_tokens(prompt) <= budget for prompt in scheduler.prompts)
+    assert trees[0]["depth"] > 1 and trees[2]["depth"] == 1
@@ -0,0 +1,101 @@
+import functools
+import os
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("selenium")
+pd = pytest.importorskip("pandas")
+pytest.importorskip("ftfy")
+
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+
+import ideas_web_scraper as scraper
+
+site_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "ideas_site")
+expected = {f"Idea number {i}" for i in range(1, 24)} - {"Idea number 7"}  # idea 7's detail page never renders
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def site():
+    handler = functools.partial(QuietHandler, directory=site_dir)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/index.html"
+    server.shutdown()
+    server.server_close()
+
+
+def headless_driver():
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless=new")
+    options.add_argument("--no-sandbox")
+    try:
+        return webdriver.Chrome(options=options)
+    except WebDriverException:
+        pytest.skip("no headless Chrome available")
+
+
+@pytest.fixture
+def driver(site, monkeypatch):
+    monkeypatch.setattr(scraper, "wait_timeout", 2)
+    driver = headless_driver()
+    driver.get(site)
+    yield driver
+    driver.quit()
+
+
+def read_ideas(path):
+    return pd.read_csv(path, dtype=str, keep_default_na=False)
+
+
+def test_parallel_mode_writes_every_page_except_failed_rows(driver, tmp_path):
+    path = str(tmp_path / "ideas.csv")
+    written = scraper.extract_ideas_parallel(driver, path, workers=2, make_driver=headless_driver,
+                                             resume=False, incremental=False)
+    ideas = read_ideas(path)
+    assert written == len(ideas) == len(expected)
+    assert set(ideas["Idea"]) == expected
+    assert (ideas["Description"] == ideas["Idea"].str.replace("Idea number", "Description of idea")).all()
+    assert not os.path.exists(scraper.checkpoint_path(path))
+
+
+def test_click_mode_then_incremental_run_writes_nothing_new(driver, site, tmp_path):
+    path = str(tmp_path / "ideas.csv")
+    assert scraper.extract_ideas_votes(driver, path, resume=False, incremental=False) == len(expected)
+    assert set(read_ideas(path)["Idea"]) == expected
+
+    driver.get(site)
+    assert scraper.extract_ideas_votes(driver, path, resume=False, incremental=True) == 0
+    assert len(read_ideas(path)) == len(expected)
+
+
+def test_resume_skips_finished_pages(driver, tmp_path):
+    path = str(tmp_path / "ideas.csv")
+    scraper.save_checkpoint(path, 2)
+    written = scraper.extract_ideas_votes(driver, path, resume=True, incremental=False)
+    assert set(read_ideas(path)["Idea"]) == {f"Idea number {i}" for i in range(21, 24)}
+    assert written == 3
+
+
+class RedirectingWorker:
+    # Stands in for a worker browser whose session is rejected: every load ends on the SSO page
+    current_url = ""
+
+    def get(self, url):
+        self.current_url = "https://login.microsoftonline.com/common/oauth2/authorize"
+
+    def add_cookie(self, cookie):
+        pass
+
+
+def test_share_session_raises_when_worker_is_not_logged_in():
+    with pytest.raises(RuntimeError, match="not logged in"):
+        scraper.share_session(RedirectingWorker(), "https://ideas.xyz.com/table", [{"name": "session", "value": "x"}])
@@ -0,0 +1,146 @@
+'''
+This module keeps the fitted theme clusters of a group between runs,
+Centroids, theme names and per-cluster distance statistics are saved after every full fit,
+So daily runs only assign ideas to their nearest saved centroid (no k sweep, no theme naming).
+A full re-cluster is only asked for when drift thresholds are crossed,
+And its clusters are then matched to the old ones (Hungarian matching on centroid distance) to keep IDs and names.
+=> (one folder per group code: centroids.npy, state.json and ids.txt.)
+'''
+
+
+
+
+import json
+import os
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+
+
+
+def state_path(code, directory="cluster_state"):
+    return os.path.join(directory, code or "default")
+
+
+def has_state(code, directory="cluster_state"):
+    return os.path.exists(os.path.join(state_path(code, directory), "state.json"))
+
+
+def save_state(code, centroids, theme_names, stats, ids, directory="cluster_state"):
+    path = state_path(code, directory)
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, "centroids.npy"), np.asarray(centroids, dtype=np.float32))
+    with open(os.path.join(path, "ids.txt"), "w", encoding="utf-8") as f:
+        f.writelines(f"{idea_id}\n" for idea_id in ids)
+    # state.json is written last, so a half-written folder is never picked up as a state
+    with open(os.path.join(path, "state.json.tmp"), "w", encoding="utf-8") as f:
+        json.dump({"theme_names": list(theme_names), "stats": stats}, f, indent=2)
+    os.replace(os.path.join(path, "state.json.tmp"), os.path.join(path, "state.json"))
+
+
+def load_state(code, directory="cluster_state"):
+    path = state_path(code, directory)
+    with open(os.path.join(path, "state.json"), "r", encoding="utf-8") as f:
+        state = json.load(f)
+    with open(os.path.join(path, "ids.txt"), "r", encoding="utf-8") as f:
+        state["ids"] = f.read().splitlines()
+    return np.load(os.path.join(path, "centroids.npy")), state
+
+
+def nearest_centroids(embeddings, centroids, block_size=4096):
+    # Euclidean, like KMeans, so unchanged ideas land in the cluster the fit gave them
+    # (read in row blocks, so a memory-mapped EmbeddingMatrix is never loaded whole)
+    centroids = np.asarray(centroids, dtype=np.float32)
+    centroid_norms = (centroids ** 2).sum(axis=1)
+    labels = np.empty(len(embeddings), dtype=np.int64)
+    distances = np.empty(len(embeddings), dtype=np.float32)
+    for start in range(0, len(embeddings), block_size):
+        block = np.asarray(embeddings[start:start + block_size], dtype=np.float32)
+        squared = (block ** 2).sum(axis=1)[:, None] - 2 * block @ centroids.T + centroid_norms[None, :]
+        labels[start:start + len(block)] = squared.argmin(axis=1)
+        distances[start:start + len(block)] = np.sqrt(np.maximum(squared.min(axis=1), 0))
+    return labels, distances
+
+
+def cluster_means(embeddings, labels, n_clusters, block_size=4096):
+    sums = np.zeros((n_clusters, embeddings.shape[1]), dtype=np.float64)
+    for start in range(0, len(embeddings), block_size):
+        block = np.asarray(embeddings[start:start + block_size], dtype=np.float32)
+        np.add.at(sums, labels[start:start + len(block)], block)
+    sizes = np.bincount(labels, minlength=n_clusters)
+    return sums / np.maximum(sizes, 1)[:, None], sizes
+
+
+def centroid_distances(embeddings, centroids, labels, block_size=4096):
+    # Distance of every idea to the centroid of its own cluster
+    centroids = np.asarray(centroids, dtype=np.float32)
+    distances = np.empty(len(embeddings), dtype=np.float32)
+    for start in range(0, len(embeddings), block_size):
+        block = np.asarray(embeddings[start:start + block_size], dtype=np.float32)
+        distances[start:start + len(block)] = np.linalg.norm(block - centroids[labels[start:start + len(block)]], axis=1)
+    return distances
+
+
+def cluster_stats(distances, labels, n_clusters):
+    sizes, mean_distance, p95_distance = [], [], []
+    for i in range(n_clusters):
+        member_distances = distances[labels == i]
+        sizes.append(int(len(member_distances)))
+        mean_distance.append(float(member_distances.mean()) if len(member_distances) else 0.0)
+        p95_distance.append(float(np.percentile(member_distances, 95)) if len(member_distances) else 0.0)
+    return {"sizes": sizes, "mean_distance": mean_distance, "p95_distance": p95_distance}
+
+
+def drift(embeddings, labels, distances, is_new, centroids, stats):
+    '''
+    new_fraction: new ideas since the last full fit, relative to the ideas fitted then.
+    outlier_fraction: share of new ideas farther from their centroid than that cluster's p95 at fit time.
+    centroid_shift: largest move of a cluster's current member mean, in units of its mean distance at fit time.
+    '''
+    n_fitted = max(sum(stats["sizes"]), 1)
+    n_new = int(is_new.sum())
+
+    p95 = np.asarray(stats["p95_distance"], dtype=np.float32)
+    outliers = distances[is_new] > p95[labels[is_new]]
+
+    means, sizes = cluster_means(embeddings, labels, len(centroids))
+    radius = np.maximum(np.asarray(stats["mean_distance"], dtype=np.float64), 1e-6)
+    shifts = np.linalg.norm(means - centroids, axis=1) / radius
+    shifts[sizes == 0] = 0.0
+
+    return {
+        "new_ideas": n_new,
+        "new_fraction": n_new / n_fitted,
+        "outlier_fraction": float(outliers.mean()) if n_new else 0.0,
+        "centroid_shift": float(shifts.max()) if len(shifts) else 0.0,
+    }
+
+
+def needs_recluster(report, max_new_fraction=0.25, max_outlier_fraction=0.3, max_centroid_shift=0.5):
+    reasons = []
+    if report["new_fraction"] > max_new_fraction:
+        reasons.append(f"new ideas {report['new_fraction']:.0%} > {max_new_fraction:.0%}")
+    if report["outlier_fraction"] > max_outlier_fraction:
+        reasons.append(f"outliers {report['outlier_fraction']:.0%} > {max_outlier_fraction:.0%}")
+    if report["centroid_shift"] > max_centroid_shift:
+        reasons.append(f"centroid shift {report['centroid_shift']:.2f} > {max_centroid_shift:.2f}")
+    return reasons
+
+
+def match_clusters(old_centroids, old_stats, new_centroids, radius=1.0):
+    # Hungarian matching on centroid distance; a pair only counts within radius x the old cluster's mean distance
+    cost = np.linalg.norm(new_centroids[:, None, :] - old_centroids[None, :, :], axis=2)
+    rows, cols = linear_sum_assignment(cost)
+    limit = radius * np.asarray(old_stats["mean_distance"], dtype=np.float64)
+    return {int(r): int(c) for r, c in zip(rows, cols) if cost[r, c] <= limit[c]}
+
+
+def stable_ids(matches, n_clusters):
+    # New cluster index -> stable ID; matched clusters keep their old ID when it still fits in range(n_clusters)
+    mapping = {new: old for new, old in matches.items() if old < n_clusters}
+    free = iter(sorted(set(range(n_clusters)) - set(mapping.values())))
+    for new in range(n_clusters):
+        if new not in mapping:
+            mapping[new] = next(free)
+    return mapping
@@ -0,0 +1,288 @@
+'''
+This module keeps a disk-backed store of sentence embeddings,
+Keyed by a hash of the model name and the normalized idea text,
+So a rerun only encodes ideas that are new or were edited since the last run.
+=> (vectors are appended to one compact matrix per model: float32, or float16 / int8 to save disk and RAM.)
+=> (as_matrix=True returns a memory-mapped EmbeddingMatrix instead of an in-RAM copy;
+    rows are dequantized block by block as they are read, and processes share the same pages.)
+=> (appends take an exclusive lock on the cache folder, so several processes can fill the same cache.)
+'''
+
+
+
+
+import hashlib
+import json
+import os
+import re
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+
+
+def normalize_text(text):
+    return re.sub(r"\s+", " ", str(text)).strip()
+
+
+def content_key(text, model_name):
+    payload = f"{model_name}\x00{normalize_text(text)}".encode("utf-8")
+    return hashlib.sha1(payload).hexdigest()
+
+
+# Stored dtype and file name per storage mode; int8 rows also keep one float32 scale each
+STORAGE = {
+    "float32": (np.float32, "vectors.f32"),
+    "float16": (np.float16, "vectors.f16"),
+    "int8": (np.int8, "vectors.i8"),
+}
+
+
+def quantize(vectors, storage):
+    if storage == "int8":
+        # Symmetric per-row scale: the largest component maps to 127
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales.astype(np.float32)
+    return vectors.astype(STORAGE[storage][0]), None
+
+
+@contextmanager
+def file_lock(path):
+    # Exclusive lock held by one process at a time (other processes wait), released on exit
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def dequantize(codes, scales=None):
+    # Always a fresh, writable float32 array, never a view into the memory map
+    vectors = np.array(codes, dtype=np.float32)
+    if scales is not None:
+        vectors *= np.asarray(scales, dtype=np.float32)[..., None]
+    return vectors
+
+
+class EmbeddingCache:
+    '''
+    One directory per model (and storage mode other than float32) holding:
+    meta.json (model name, dimension, storage), keys.txt (one content key per row),
+    vectors.f32 / .f16 / .i8 (raw rows, appended in the same order as keys.txt)
+    and for int8 scales.f32 (one dequantization scale per row).
+    '''
+
+    def __init__(self, cache_dir, model_name, storage="float32"):
+        if storage not in STORAGE:
+            raise ValueError(f"Unknown embedding storage: {storage} (expected one of {', '.join(STORAGE)})")
+        self.model_name = model_name
+        self.storage = storage
+        self.dtype, vectors_name = STORAGE[storage]
+        folder = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name) + ("" if storage == "float32" else f"-{storage}")
+        self.path = os.path.join(cache_dir, folder)
+        self.meta_file = os.path.join(self.path, "meta.json")
+        self.keys_file = os.path.join(self.path, "keys.txt")
+        self.vectors_file = os.path.join(self.path, vectors_name)
+        self.scales_file = os.path.join(self.path, "scales.f32") if storage == "int8" else None
+        self.lock_file = os.path.join(self.path, ".lock")
+        self.dim = None
+        self.n_rows = 0
+        self.index = {}
+        os.makedirs(self.path, exist_ok=True)
+        with file_lock(self.lock_file):
+            self._load()
+
+    def _load(self):
+        # Call with the lock held: a writer of another process is then never half-way through an append
+        if not os.path.exists(self.meta_file):
+            return
+        with open(self.meta_file, "r") as f:
+            self.dim = json.load(f)["dim"]
+
+        keys = []
+        if os.path.exists(self.keys_file):
+            with open(self.keys_file, "r") as f:
+                keys = [line.strip() for line in f if line.strip()]
+        row_bytes = self.dim * np.dtype(self.dtype).itemsize
+        vectors_size = os.path.getsize(self.vectors_file) if os.path.exists(self.vectors_file) else 0
+        scales_size = None
+        if self.scales_file:
+            scales_size = os.path.getsize(self.scales_file) if os.path.exists(self.scales_file) else 0
+
+        # An interrupted append can leave keys, vectors and scales out of step; trim all to the shortest
+        n_rows = min(len(keys), vectors_size // row_bytes, len(keys) if scales_size is None else scales_size // 4)
+        if (n_rows != len(keys) or n_rows * row_bytes != vectors_size
+                or (scales_size is not None and n_rows * 4 != scales_size)):
+            keys = keys[:n_rows]
+            with open(self.keys_file, "w") as f:
+                f.writelines(f"{key}\n" for key in keys)
+            with open(self.vectors_file, "ab") as f:
+                f.truncate(n_rows * row_bytes)
+            if self.scales_file:
+                with open(self.scales_file, "ab") as f:
+                    f.truncate(n_rows * 4)
+            print(f"⚠️ Embedding cache trimmed to {n_rows} consistent rows.")
+
+        self.n_rows = n_rows
+        self.index = {key: row for row, key in enumerate(keys)}
+
+    def vectors(self):
+        # Raw stored rows (float32, float16 or int8 codes), memory-mapped read-only
+        if self.n_rows == 0:
+            return np.zeros((0, self.dim or 0), dtype=self.dtype)
+        return np.memmap(self.vectors_file, dtype=self.dtype, mode="r", shape=(self.n_rows, self.dim))
+
+    def scales(self):
+        if self.scales_file is None or self.n_rows == 0:
+            return None
+        return np.memmap(self.scales_file, dtype=np.float32, mode="r", shape=(self.n_rows,))
+
+    def add(self, keys, vectors):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if len(keys) == 0:
+            return
+
+        with file_lock(self.lock_file):
+            # Other processes may have appended since this cache was opened: row numbers come from the files
+            self._load()
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                with open(self.meta_file, "w") as f:
+                    json.dump({"model": self.model_name, "dim": self.dim, "storage": self.storage}, f)
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match cache dimension {self.dim}")
+
+            # Keys another process has stored meanwhile are kept as they are
+            new = [row for row, key in enumerate(keys) if key not in self.index]
+            if not new:
+                return
+            keys = [keys[row] for row in new]
+
+            # Vectors (and scales) first, then keys: a crash in between leaves extra rows, which _load trims
+            codes, scales = quantize(vectors[new], self.storage)
+            with open(self.vectors_file, "ab") as f:
+                f.write(codes.tobytes())
+            if scales is not None:
+                with open(self.scales_file, "ab") as f:
+                    f.write(scales.tobytes())
+            with open(self.keys_file, "a") as f:
+                f.writelines(f"{key}\n" for key in keys)
+
+            for offset, key in enumerate(keys):
+                self.index[key] = self.n_rows + offset
+            self.n_rows += len(keys)
+
+    def rows(self, keys):
+        return np.fromiter((self.index[key] for key in keys), dtype=np.int64, count=len(keys))
+
+    def read_rows(self, rows):
+        scales = self.scales()
+        return dequantize(self.vectors()[rows], None if scales is None else scales[rows])
+
+    def get(self, keys):
+        return self.read_rows(self.rows(keys))
+
+
+class EmbeddingMatrix:
+    '''
+    Read-only float32 view over rows of an EmbeddingCache, in the order of the texts asked for.
+    Indexing (m[i], m[a:b], m[mask], m[rows]) returns a dequantized float32 array of just those rows,
+    so code that walks the matrix in row blocks never holds more than one block in RAM.
+    ids (optional) index the rows by idea ID: m.get_ids(["123", ...]).
+    '''
+
+    def __init__(self, cache, rows, ids=None):
+        self.cache = cache
+        self.rows = np.asarray(rows, dtype=np.int64)
+        self.ids = None if ids is None else [str(i) for i in ids]
+        self.index = None if ids is None else {idea_id: position for position, idea_id in enumerate(self.ids)}
+        self.dtype = np.dtype(np.float32)
+
+    @property
+    def shape(self):
+        return (len(self.rows), self.cache.dim or 0)
+
+    @property
+    def ndim(self):
+        return 2
+
+    @property
+    def nbytes(self):
+        # Bytes of the stored rows (what the page cache holds), not of a dequantized copy
+        scale_bytes = 4 if self.cache.scales_file else 0
+        return len(self.rows) * ((self.cache.dim or 0) * np.dtype(self.cache.dtype).itemsize + scale_bytes)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, item):
+        return self.cache.read_rows(self.rows[item])
+
+    def __array__(self, dtype=None, copy=None):
+        # Full dequantized copy, for libraries that need one array (prefer blocks() or subset())
+        vectors = self.cache.read_rows(self.rows) if len(self.rows) else np.zeros(self.shape, dtype=np.float32)
+        return vectors if dtype is None else vectors.astype(dtype, copy=False)
+
+    def blocks(self, block_size=4096):
+        for start in range(0, len(self.rows), block_size):
+            yield start, self[start:start + block_size]
+
+    def subset(self, item):
+        # Another view over the same pages: nothing is read or copied
+        ids = None if self.ids is None else np.asarray(self.ids, dtype=object)[item].tolist()
+        return EmbeddingMatrix(self.cache, self.rows[item], ids)
+
+    def get_ids(self, ids):
+        if self.index is None:
+            raise ValueError("This embedding matrix was built without ids.")
+        return self[np.fromiter((self.index[str(i)] for i in ids), dtype=np.int64, count=len(ids))]
+
+
+def select_rows(embeddings, item):
+    # Rows of an in-RAM array, or a lazy view of an EmbeddingMatrix
+    return embeddings.subset(item) if isinstance(embeddings, EmbeddingMatrix) else embeddings[item]
+
+
+def encode_with_cache(texts, model_name, cache_dir="embedding_cache", embedder=None, batch_size=64,
+                      storage="float32", as_matrix=False, ids=None):
+    cache = EmbeddingCache(cache_dir, model_name, storage=storage)
+    keys = [content_key(text, model_name) for text in texts]
+
+    # Encode each missing text once, even if it appears several times in this run
+    missing = {}
+    for position, key in enumerate(keys):
+        if key not in cache.index and key not in missing:
+            missing[key] = position
+
+    if missing:
+        if embedder is None:
+            from sentence_transformers import SentenceTransformer
+            embedder = SentenceTransformer(model_name)
+        new_texts = [texts[position] for position in missing.values()]
+        new_vectors = embedder.encode(new_texts, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False)
+        cache.add(list(missing.keys()), new_vectors)
+
+    print(f"💾 Embedding cache: {len(texts) - len(missing)} reused, {len(missing)} newly encoded.")
+    if as_matrix:
+        return EmbeddingMatrix(cache, cache.rows(keys), ids)
+    if not keys:
+        return np.zeros((0, cache.dim or 0), dtype=np.float32)
+    return cache.get(keys)
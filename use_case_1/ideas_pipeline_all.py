@@ -0,0 +1,120 @@
+'''
+This script runs the thematic clustering pipeline for every group in one process.
+The ideas file, T5-small and the embedding model are loaded once,
+The whole corpus is embedded in a single batched pass,
+And the groups are then clustered, named and summarized in parallel.
+=> (writes the per-group files and the merged thematic_summary.xlsx.)
+'''
+
+
+
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+import ideas_pipeline_one as pipeline_one
+from embedding_cache import encode_with_cache, select_rows
+from ideas_pipeline_one import ideas_store
+
+
+
+
+#####################
+# (Segment value, code used for file and sheet names); None selects ideas with no Segment
+segments = [
+    ("Products", "IP"),
+    ("Corporate", "IC"),
+    ("Foundry", "IF"),
+    (None, "NA"),
+]
+segment_workers = 4
+merged_output = "thematic_summary.xlsx"
+#####################
+
+
+
+
+def run_all_segments(df, embeddings, t5_summarizer, scheduler, segments=segments, workers=segment_workers):
+    jobs = []
+    for segment_value, code in segments:
+        if segment_value is None:
+            mask = df["Segment"].isna().to_numpy()
+        else:
+            mask = (df["Segment"] == segment_value).to_numpy()
+        if not mask.any():
+            print(f"⚠️ [{code}] No ideas for segment {segment_value!r}, skipping.")
+            continue
+        segment_df = pipeline_one.filter_segment(df, segment_value)
+        jobs.append((code, segment_df, select_rows(embeddings, mask)))
+        print(f"[{code}] Step 1 done. Filtered {len(segment_df)} ideas.")
+
+    # The segments running at once share the cores, so their k sweeps do not start cores x segments workers
+    running = max(1, min(workers, len(jobs)))
+    k_jobs = pipeline_one.k_sweep_jobs
+    if k_jobs < 0:
+        k_jobs = max(1, (os.cpu_count() or 1) // running)
+    print(f"🧮 {running} segments at a time, {k_jobs} k sweep workers each.")
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            code: executor.submit(pipeline_one.run_segment, segment_df, segment_embeddings, t5_summarizer, scheduler,
+                                  code, k_jobs)
+            for code, segment_df, segment_embeddings in jobs
+        }
+        for code, future in futures.items():
+            results[code] = future.result()
+    return results
+
+
+def save_reports(results, merged_path=merged_output):
+    for code, (final_output, full_data, keywords) in results.items():
+        pipeline_one.save_segment_tables(full_data, code, keywords)
+        path = pipeline_one.save_segment_report(final_output, full_data, code, keywords)
+        print(f"💾 [{code}] Saved '{path}'.")
+
+    with pipeline_one.metrics.stage("excel_write", "merged"):
+        with pd.ExcelWriter(merged_path, engine="openpyxl") as writer:
+            for code, (final_output, full_data, keywords) in results.items():
+                pipeline_one.write_segment_sheets(writer, final_output, full_data, code, keywords)
+    print(f"✅ Merged thematic summary saved to '{merged_path}'.")
+
+
+
+
+def main():
+    # Settings (here and in ideas_pipeline_one) are read when main runs, so ideas_cli.py can set them
+    metrics = pipeline_one.metrics
+    metrics.metrics_dir, metrics.profile_stage = pipeline_one.metrics_dir, pipeline_one.profile_stage
+    with metrics.stage("load"):
+        df = pipeline_one.load_ideas(pipeline_one.input_file)
+        df["Ideas"] = df["Ideas"].fillna("").astype(str)
+    with metrics.stage("dedup", ideas=len(df)):
+        df = pipeline_one.collapse_near_duplicates(df)
+    t5_summarizer = pipeline_one.LazyT5Summarizer(pipeline_one.t5_model_path)
+
+    # One scheduler for all segments, so the in-flight limit applies to the whole run
+    scheduler = pipeline_one.make_scheduler()
+
+    # One batched embedding pass over the whole corpus; segments take their rows from it
+    with metrics.stage("embed", ideas=len(df)):
+        ids = ideas_store.idea_ids(df)
+        embeddings = encode_with_cache(df["Ideas"].tolist(), pipeline_one.embed_model_name,
+                                       cache_dir=pipeline_one.embedding_cache_dir, storage=pipeline_one.embedding_storage,
+                                       as_matrix=pipeline_one.embedding_memmap, ids=ids)
+    print(f"Step 2 done. Embedded {len(df)} ideas.")
+
+    results = run_all_segments(df, embeddings, t5_summarizer, scheduler, segments=segments, workers=segment_workers)
+    save_reports(results, merged_path=merged_output)
+    scheduler.cache.report()
+    metrics.report()
+    print(f"📈 Metrics saved to '{metrics.save()}'.")
+    return merged_output
+
+
+
+
+if __name__ == "__main__":
+    main()
@@ -3,118 +3,257 @@ This script reads the ideas data file, and processes it,
 Ideally for a group at a time (depending on the size of you data)
 To cluster them into themes, assign theme names,
 And summarise each cluster/ theme using llama and t5 small adaptively.
-=> (t5 small and ollama are loaded locally.) 
+=> (t5 small and ollama are loaded locally.)
+=> (the steps are also importable, ideas_pipeline_all.py runs every group in one go.)
+=> (time, memory and LLM usage of every stage are written to metrics/<run>.json.)
 '''
 
 
 
 
+import os
+import sys
+import threading
+
 import pandas as pd
-from sklearn.cluster import KMeans
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics import silhouette_score
 import numpy as np
-from openpyxl import Workbook
-from transformers import pipeline, AutoTokenizer, AutoModelForSeq2SeqLM
-import torch
-import ollama
-import json
-from tqdm import tqdm
-from kneed import KneeLocator
-import matplotlib.pyplot as plt
+from embedding_cache import encode_with_cache
+from k_selection import select_k
+from keywords import keyword_table, keywords_by_cluster
+from near_duplicates import minhash_signatures, near_duplicate_groups, similarity
+from cluster_state import (has_state, load_state, save_state, nearest_centroids, cluster_stats, centroid_distances,
+                           drift, needs_recluster, match_clusters, stable_ids)
+from ollama_scheduler import OllamaScheduler
+from llm_cache import LLMCache
+from summary_store import SummaryStore
+from stage_metrics import StageMetrics
+from summary_tree import reduce_summaries, estimate_tokens
+from t5_batching import input_budget, token_chunks, summarize_chunks
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import ideas_store
 
 
 
-#####################
-# Load data
-df = pd.read_csv("ideasPBI.csv")
 
-# Load T5-small once
-tokenizer = AutoTokenizer.from_pretrained("xyz/downloadedT5small")
-model = AutoModelForSeq2SeqLM.from_pretrained("xyz/downloadedT5small")
 #####################
-
-
-
-df["Ideas"] = df["Idea Name"].astype(str) + ": " + df["Description"].astype(str)
-df.to_csv("ideas.csv", index=False)
-df = pd.read_csv("ideas.csv")
-
-
-# Step 1: Filter and reset index
-# df = df[df["Segment"] == "Products"].copy().reset_index(drop=True)
-df = df[df["Segment"] == "Corporate"].copy().reset_index(drop=True)
-# df = df[df["Segment"] == "Foundry"].copy().reset_index(drop=True)
-# df = df[df["Segment"].isna()].copy().reset_index(drop=True)
-df["Ideas"] = df["Ideas"].fillna("").astype(str)
-texts = df["Ideas"].tolist()
-
-print("Step 1 done. Filtered.")
-
-
-
-# Step 2: Load embedding model
-embedder = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
-embeddings = embedder.encode(texts, convert_to_tensor=False)
-print("Step 2 done. Embedded sentence transformer.")
-
-
-
-# Step 3: Find optimal number of clusters 
-
-inertias = []
+input_file = "ideasPBI.csv"  # csv export, or a .parquet table
+t5_model_path = "xyz/downloadedT5small"
+t5_batch_size = 8  # token-packed chunks per T5 forward pass
+ollama_model = "mistral"
+
+# Ollama calls for a run are sent together; the host also needs OLLAMA_NUM_PARALLEL > 1 to overlap them
+ollama_host = None  # e.g. "http://127.0.0.1:11434"
+ollama_max_in_flight = 4
+ollama_timeout = 300  # seconds per request
+ollama_retries = 2
+
+# LLM responses are cached on disk; bump a template version whenever its prompt wording changes
+llm_cache_path = "llm_cache.sqlite"
+llm_cache_max_mb = 256
+llm_cache_bypass = False  # True = always ask the model (fresh answers still refresh the cache)
+theme_prompt_version = "theme-v1"
+summary_prompt_version = "summary-v1"
+merge_prompt_version = "merge-v1"
+
+# Context window: ideas of big groups are summarized in a map-reduce tree of prompts that each fit in it
+ollama_context_tokens = 4096  # sent as num_ctx, so long prompts are not cut silently
+ollama_chars_per_token = 4  # rough estimate, the model's own tokenizer is not loaded
+summary_answer_tokens = 600  # room left in the context for the generated summary
+
+# Near-identical resubmissions (MinHash/LSH): only the most voted idea of a group goes on, with the group's votes/comments
+dedup_threshold = 0.8  # estimated Jaccard similarity of character shingles; None = keep every idea
+dedup_num_perm = 128  # MinHash permutations (signature length)
+
+# Embeddings are cached on disk by content hash, so only new/edited ideas get encoded
+embed_model_name = "sentence-transformers/all-MiniLM-L6-v2"
+embedding_cache_dir = "embedding_cache"
+embedding_storage = "float32"  # "float16" halves the cache, "int8" quarters it (per-row scale, small accuracy loss)
+embedding_memmap = False  # True => clustering reads the memory-mapped cache in row blocks instead of one in-RAM matrix
+
+# k sweep: "inertia" (knee) or "silhouette"; subsample / mini-batch only the sweep on big segments
 k_range = range(1, 15)
+k_method = "inertia"
+k_sweep_sample_size = None  # e.g. 20000
+k_sweep_minibatch = False
+k_sweep_jobs = -1  # joblib workers fitting the candidates; -1 = every core (ideas_pipeline_all shares them between segments)
+
+# Theme keywords: "mean" TF-IDF per cluster (as before) or "ctfidf" (class-based TF-IDF)
+keyword_method = "mean"
+keyword_top_k = 30  # sent to the theme prompt
+report_keywords = 10  # shown next to each theme in the report
+
+# "full" re-clusters and renames every run; "incremental" assigns ideas to the saved centroids of the group
+# and only re-clusters when a drift threshold is crossed (the new clusters then keep matching old IDs and names)
+cluster_mode = "full"
+cluster_state_dir = "cluster_state"
+recluster_new_fraction = 0.25  # new ideas since the last full fit / ideas fitted then
+recluster_outlier_fraction = 0.3  # new ideas beyond their cluster's 95th percentile distance at fit time
+recluster_centroid_shift = 0.5  # member mean moved by more than this x the cluster's mean distance
+theme_match_radius = 1.0  # old/new centroids further apart than this x the old mean distance are not the same theme
+
+# Theme summaries are saved with a fingerprint of their member ideas: unchanged themes reuse theirs,
+# themes that only gained a few ideas get an "update this summary" pass instead of a full re-summary
+summary_store_dir = "summary_store"
+summary_update_max_fraction = 0.5  # added ideas / ideas already summarized
+summary_max_updates = 5  # update passes in a row before a theme is summarized from scratch again
+summary_update_prompt_version = "summary-update-v1"
+
+# Per-run metrics: wall/CPU time and peak RSS per stage, LLM calls, tokens and cache hits
+metrics_dir = "metrics"
+profile_stage = None  # e.g. "k_sweep" => also a cProfile dump of that stage in metrics_dir
+
+# Group to process in this run: (Segment value, code used for file and sheet names)
+# segment = ("Products", "IP")
+segment = ("Corporate", "IC")
+# segment = ("Foundry", "IF")
+# segment = (None, "NA")  # ideas with no Segment
+#####################
 
-for k in k_range:
-    kmeans = KMeans(n_clusters=k, random_state=42)
-    kmeans.fit(embeddings)
-    inertias.append(kmeans.inertia_)
 
-kneedle = KneeLocator(k_range, inertias, curve="convex", direction="decreasing")
-optimal_k = kneedle.knee
-print(f"Optimal number of clusters: {optimal_k}")
 
-# Optional: Plot the elbow curve
-# plt.plot(k_range, inertias, marker='o')
-# plt.axvline(optimal_k, color='r', linestyle='--', label=f'Optimal k = {optimal_k}')
-# plt.xlabel('Number of clusters (k)')
-# plt.ylabel('Inertia')
-# plt.title('Elbow Method using Inertia')
-# plt.legend()
-# plt.grid(True)
-# plt.show()
 
-n_clusters=optimal_k
-kmeans = KMeans(n_clusters=optimal_k, random_state=42)
-labels = kmeans.fit_predict(embeddings)
-df["theme_cluster"] = labels
-print("Step 3 done. Clustered.")
+# One recorder for the whole run, shared by all segments
+metrics = StageMetrics(metrics_dir, profile_stage=profile_stage)
+
+
+# --- Loading ---
+def load_ideas(path=input_file):
+    df = pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path)
+    df["Ideas"] = df["Idea Name"].astype(str) + ": " + df["Description"].astype(str)
+    ideas_store.write_table(df, "ideas")
+    return df
+
+
+def collapse_near_duplicates(df, threshold=None, num_perm=None, tag=""):
+    '''
+    Folds near-duplicate ideas of the same Segment into their most voted member, summing Votes and Idea Comments
+    (non-numeric counts count as 0). The folded IDs are listed in "Duplicate IDs" and saved as kind="duplicate" edges
+    (ideas_store duplicate_edges) scored by their similarity to the representative.
+    '''
+    threshold = dedup_threshold if threshold is None else threshold
+    num_perm = num_perm or dedup_num_perm
+    if threshold is None or df.empty:
+        return df
+
+    n = len(df)
+    ids = ideas_store.idea_ids(df).to_numpy()
+    groups = np.arange(n)
+    signatures = minhash_signatures(df["Ideas"].tolist(), num_perm)
+    segments = df["Segment"].fillna("") if "Segment" in df.columns else pd.Series("", index=df.index)
+    for rows in segments.reset_index(drop=True).groupby(segments.to_numpy(), sort=False).indices.values():
+        part_groups, _ = near_duplicate_groups(None, threshold=threshold, signatures=signatures[rows])
+        groups[rows] = rows[part_groups]
+
+    # Representative: most votes in the group, then the earliest row
+    counts = df[["Votes", "Idea Comments"]].apply(pd.to_numeric, errors="coerce").fillna(0)
+    votes = counts["Votes"].to_numpy()
+    order = np.lexsort((np.arange(n), -votes, groups))
+    first = order[np.r_[True, groups[order][1:] != groups[order][:-1]]]
+    representative_of = np.empty(n, dtype=np.int64)
+    representative_of[groups[first]] = first
+    representative = representative_of[groups]
+
+    is_duplicate = representative != np.arange(n)
+    scores = similarity(signatures, np.flatnonzero(is_duplicate), representative[is_duplicate])
+    edges = ideas_store.edges_from_lists(ids[representative[is_duplicate]], [[i] for i in ids[is_duplicate]],
+                                         [[s] for s in scores], kind="duplicate")
+    ideas_store.write_table(edges, "duplicate_edges")
+
+    # The same numeric counts that picked the representative are summed
+    totals = counts.groupby(representative).sum()
+    collapsed = df.iloc[totals.index].copy()
+    collapsed[["Votes", "Idea Comments"]] = totals.to_numpy().round().astype(np.int64)
+    collapsed["Duplicate IDs"] = ideas_store.similar_strings(ids[totals.index], edges)
+    print(f"{tag}🧹 Near-duplicates: {int(is_duplicate.sum())} ideas folded into "
+          f"{len(np.unique(representative[is_duplicate]))} representatives, {len(collapsed)} ideas left.")
+    return collapsed.reset_index(drop=True)
+
+
+def make_scheduler():
+    cache = LLMCache(llm_cache_path, max_bytes=llm_cache_max_mb * 1024 * 1024, bypass=llm_cache_bypass)
+    scheduler = OllamaScheduler(
+        model=ollama_model,
+        host=ollama_host,
+        max_in_flight=ollama_max_in_flight,
+        timeout=ollama_timeout,
+        retries=ollama_retries,
+        cache=cache,
+        options={"num_ctx": ollama_context_tokens},
+    )
+    metrics.attach(scheduler)
+    return scheduler
+
+
+def load_t5_summarizer(path=t5_model_path):
+    # torch / transformers are only imported when T5 is actually loaded
+    import torch
+    from transformers import pipeline, AutoTokenizer, AutoModelForSeq2SeqLM
+
+    tokenizer = AutoTokenizer.from_pretrained(path)
+    model = AutoModelForSeq2SeqLM.from_pretrained(path)
+    return pipeline("summarization", model=model, tokenizer=tokenizer, device=0 if torch.cuda.is_available() else -1)
+
+
+class LazyT5Summarizer:
+    # Stands in for the T5 pipeline and loads it on first use, so runs where no group needs T5 never load it
+    def __init__(self, path=t5_model_path):
+        self.path = path
+        self._summarizer = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        with self._lock:
+            if self._summarizer is None:
+                with metrics.stage("t5_load"):
+                    self._summarizer = load_t5_summarizer(self.path)
+        return self._summarizer
+
+    def __getattr__(self, name):
+        return getattr(self.load(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self.load()(*args, **kwargs)
 
 
+# Step 1: Filter and reset index
+def filter_segment(df, segment_value):
+    if segment_value is None:
+        df = df[df["Segment"].isna()].copy().reset_index(drop=True)
+    else:
+        df = df[df["Segment"] == segment_value].copy().reset_index(drop=True)
+    df["Ideas"] = df["Ideas"].fillna("").astype(str)
+    return df
+
+
+# Step 3: Find optimal number of clusters (candidates are fitted in parallel, the winner is reused)
+def cluster_ideas(embeddings, n_jobs=None):
+    selection = select_k(
+        embeddings,
+        k_range=k_range,
+        method=k_method,
+        n_jobs=k_sweep_jobs if n_jobs is None else n_jobs,
+        sample_size=k_sweep_sample_size,
+        minibatch=k_sweep_minibatch,
+    )
+
+    # Optional: Plot the elbow curve
+    # import matplotlib.pyplot as plt
+    # plt.plot(selection.k_values, selection.inertias, marker='o')
+    # plt.axvline(selection.k, color='r', linestyle='--', label=f'Optimal k = {selection.k}')
+    # plt.xlabel('Number of clusters (k)')
+    # plt.ylabel('Inertia')
+    # plt.title('Elbow Method using Inertia')
+    # plt.legend()
+    # plt.grid(True)
+    # plt.show()
+
+    return selection
 
 
 # Step 4: Generate theme names from top keywords
-
-vectorizer = TfidfVectorizer(stop_words="english", max_features=10000)
-X = vectorizer.fit_transform(df["Ideas"])
-terms = vectorizer.get_feature_names_out()
-
-theme_names = []
-
-for i in range(n_clusters):
-    # Get comments in this cluster
-    cluster_indices = df[df["theme_cluster"] == i].index
-    cluster_comments = X[cluster_indices]
-
-    # Compute mean TF-IDF scores
-    avg_tfidf = np.asarray(cluster_comments.mean(axis=0)).flatten()
-    top_indices = avg_tfidf.argsort()[-30:][::-1]
-    top_keywords = [terms[idx] for idx in top_indices]
-
-    # Use Ollama to generate a theme from keywords
-    prompt = f"""
+def theme_prompt(top_keywords):
+    return f"""
 You are a business analyst. Based on the following 30 keywords extracted from employee suggested ideas, generate one short, descriptive theme name (3-5 words max) that captures the central idea of the cluster.
 
 Keywords:
@@ -122,30 +261,105 @@ Keywords:
 
 Theme:
 """
-    response = ollama.chat(model="mistral", messages=[{"role": "user", "content": prompt}])
-    theme = response["message"]["content"].strip()
-    theme_names.append(theme)
-    print(f"Cluster {i}: {theme}")
-
-theme_map = {i: name for i, name in enumerate(theme_names)}
-df["theme"] = df["theme_cluster"].map(theme_map)
-
-print("Step 4 done. Themes generated.")
 
 
+def cluster_keywords(df, n_clusters):
+    # Keyword scores of every cluster come from one sparse product, see keywords.py
+    return keyword_table(df["Ideas"], df["theme_cluster"], n_clusters, top_k=keyword_top_k, method=keyword_method)
+
+
+def name_themes(keywords, n_clusters, scheduler, tag="", known=None):
+    # known: cluster -> theme name carried over from the previous fit, those are not asked again
+    known = known or {}
+    keyword_lists = keywords_by_cluster(keywords, n_clusters)
+    todo = [i for i in range(n_clusters) if i not in known]
+
+    # Use Ollama to generate a theme from keywords, all clusters at once
+    answers = scheduler.chat_many([theme_prompt(keyword_lists[i]) for i in todo], template_version=theme_prompt_version)
+    theme_names = [known.get(i) for i in range(n_clusters)]
+    for i, theme in zip(todo, answers):
+        theme_names[i] = theme
+    for i, theme in enumerate(theme_names):
+        print(f"{tag}Cluster {i}: {theme}")
+
+    return theme_names
+
+
+# Steps 3 and 4 with a saved cluster state: nearest saved centroid, unless the group drifted too far
+def assign_to_saved_themes(embeddings, ids, code="", tag=""):
+    centroids, state = load_state(code, cluster_state_dir)
+    labels, distances = nearest_centroids(embeddings, centroids)
+    known = set(state["ids"])
+    is_new = np.array([idea_id not in known for idea_id in ids], dtype=bool)
+
+    report = drift(embeddings, labels, distances, is_new, centroids, state["stats"])
+    reasons = needs_recluster(
+        report,
+        max_new_fraction=recluster_new_fraction,
+        max_outlier_fraction=recluster_outlier_fraction,
+        max_centroid_shift=recluster_centroid_shift,
+    )
+    if reasons:
+        print(f"{tag}🔁 Re-clustering: {'; '.join(reasons)}.")
+        return None, centroids, state
+    print(f"{tag}Assigned {report['new_ideas']} new ideas to {len(centroids)} saved themes "
+          f"(outliers {report['outlier_fraction']:.0%}, centroid shift {report['centroid_shift']:.2f}).")
+    return labels, centroids, state
+
+
+def theme_clusters(df, embeddings, scheduler, code="", tag="", k_jobs=None):
+    ids = ideas_store.idea_ids(df).tolist()
+    old_centroids, state = None, None
+    if cluster_mode == "incremental" and has_state(code, cluster_state_dir):
+        with metrics.stage("assign", code, ideas=len(ids)):
+            labels, old_centroids, state = assign_to_saved_themes(embeddings, ids, code=code, tag=tag)
+        if labels is not None:
+            n_clusters = len(old_centroids)
+            df["theme_cluster"] = labels
+            print(f"{tag}Step 3 done. Clustered.")
+            with metrics.stage("keywords", code, clusters=n_clusters):
+                keywords = cluster_keywords(df, n_clusters)
+            return n_clusters, state["theme_names"], keywords
+
+    with metrics.stage("k_sweep", code, ideas=len(ids)):
+        selection = cluster_ideas(embeddings, n_jobs=k_jobs)
+    n_clusters = selection.k
+    labels = selection.labels
+    centroids = selection.model.cluster_centers_
+    print(f"{tag}Optimal number of clusters: {n_clusters}")
+
+    known = {}
+    if state is not None:
+        # Renumber the new clusters so the ones matching a saved theme keep its ID and name
+        matches = match_clusters(old_centroids, state["stats"], centroids, radius=theme_match_radius)
+        mapping = stable_ids(matches, n_clusters)
+        order = np.array([mapping[i] for i in range(n_clusters)])
+        labels = order[labels]
+        centroids = centroids[np.argsort(order)]
+        known = {mapping[new]: state["theme_names"][old] for new, old in matches.items()}
+        print(f"{tag}Matched {len(known)} of {n_clusters} clusters to saved themes.")
+    df["theme_cluster"] = labels
+    print(f"{tag}Step 3 done. Clustered.")
+
+    with metrics.stage("keywords", code, clusters=n_clusters):
+        keywords = cluster_keywords(df, n_clusters)
+    with metrics.stage("naming", code, clusters=n_clusters, reused_names=len(known)):
+        theme_names = name_themes(keywords, n_clusters, scheduler, tag=tag, known=known)
+
+    # Saved on every full fit, so a later incremental run can start from it
+    distances = centroid_distances(embeddings, centroids, labels)
+    save_state(code, centroids, theme_names, cluster_stats(distances, labels, n_clusters), ids, cluster_state_dir)
+    return n_clusters, theme_names, keywords
 
 
 # Step 5: Group by theme and get frequencies
-
-grouped = df.groupby("theme").agg({
-    "Ideas": list,
-    "theme": "count",
-    "Votes": "sum",
-    "Idea Comments": "sum"
-}).rename(columns={"theme": "frequency", "Votes": "SumOfVotes", "Idea Comments": "SumOfComments"}).reset_index()
-
-
-print("Step 5 done. Grouped ideas by theme.")
+def group_by_theme(df):
+    return df.groupby("theme").agg({
+        "Ideas": list,
+        "theme": "count",
+        "Votes": "sum",
+        "Idea Comments": "sum"
+    }).rename(columns={"theme": "frequency", "Votes": "SumOfVotes", "Idea Comments": "SumOfComments"}).reset_index()
 
 
 
@@ -163,21 +377,17 @@ print("Step 5 done. Grouped ideas by theme.")
 # grouped["summary"] = grouped["Idea"].apply(summarize_comments)
 
 
+# One T5 pipeline is shared by all segments, so calls into it are serialized
+t5_lock = threading.Lock()
 
-
-
-t5_summarizer = pipeline("summarization", model=model, tokenizer=tokenizer, device=0 if torch.cuda.is_available() else -1)
-
-# --- Helper for T5 summarization ---
-def summarize_with_t5(text, max_length=120, min_length=30):
-    try:
-        return t5_summarizer(text, max_length=max_length, min_length=min_length, do_sample=False)[0]['summary_text']
-    except:
-        return text[:max_length]  # fallback
+# --- Helper for T5 summarization: token-packed chunks of all groups, in real batches ---
+def summarize_with_t5(t5_summarizer, chunks):
+    with t5_lock:
+        return summarize_chunks(t5_summarizer, chunks, batch_size=t5_batch_size)
 
 # --- Helper for Ollama summarization ---
-def summarize_with_ollama(text, model_name="mistral"):
-    prompt = f"""
+def summary_prompt(text):
+    return f"""
 You are a business analyst. Summarize the following employee suggested ideas into a detailed, formal summary. Identify key concerns, suggestions, and patterns. Be concise but informative.
 
 Ideas:
@@ -185,67 +395,258 @@ Ideas:
 
 Summary:
 """
-    response = ollama.chat(model=model_name, messages=[{"role": "user", "content": prompt}])
-    return response["message"]["content"].strip()
-
-# --- Final Adaptive Function ---
-def adaptive_summary(comment_list):
-    full_text = "\n".join(comment_list)
-    total_chars = len(full_text)
-
-    if len(comment_list) <= 10 or total_chars < 2500:
-        # Use Ollama directly
-        summary = summarize_with_ollama(full_text)
-        print(f"✔️ Ollama summarization done for group of {len(comment_list)} ideas.")
-        return summary
-    
-    # Use T5 for chunks
-    chunk_size = 4  # Adjust as needed
-    t5_summaries = []
-    for i in range(0, len(comment_list), chunk_size):
-        chunk = "\n".join(comment_list[i:i+chunk_size])
-        t5_summary = summarize_with_t5(chunk)
-        t5_summaries.append(t5_summary)
 
-    # Combine T5 summaries, summarize via Ollama
-    combined = "\n".join(t5_summaries)
-    summary = summarize_with_ollama(combined)
-    print(f"✔️ T5 + Ollama summarization done for group of {len(comment_list)} ideas.")
-    return summary
+def summarize_with_ollama(text, scheduler):
+    return scheduler.chat(summary_prompt(text), template_version=summary_prompt_version)
 
-# --- Apply to dataframe ---
-grouped["summary"] = grouped["Ideas"].apply(adaptive_summary)
+# --- Helper for merging partial summaries of one big group ---
+def merge_prompt(text):
+    return f"""
+You are a business analyst. The following are partial summaries of employee suggested ideas on one theme. Merge them into one detailed, formal summary. Identify key concerns, suggestions, and patterns across all of them, without repeating points. Be concise but informative.
 
+Partial summaries:
+{text}
 
-print("Step 6 done. Summarizing.")
-
-
-
-
-######################
-
-# Step 7: Sort by frequency and keep relevant columns
-final_output = grouped[["theme", "frequency", "SumOfVotes", "SumOfComments", "summary"]].sort_values(by="frequency", ascending=False)
-full_data = df.copy()  # add other columns if needed
-
-# Write both sheets to the same Excel file
+Summary:
+"""
 
-# with pd.ExcelWriter("thematic_summary_ideas_IP.xlsx", engine="openpyxl") as writer:
-#     final_output.to_excel(writer, sheet_name="IP Thematic Summary", index=False)
-#     full_data.to_excel(writer, sheet_name="IP Data", index=False)
+def summary_budget():
+    # Tokens a prompt's text may use: the context minus the longer template and the answer
+    template_tokens = max(estimate_tokens(summary_prompt(""), ollama_chars_per_token),
+                          estimate_tokens(merge_prompt(""), ollama_chars_per_token))
+    return ollama_context_tokens - template_tokens - summary_answer_tokens
+
+# --- Map-reduce over the parts of every group, each level in one parallel batch ---
+def reduce_to_summaries(part_lists, scheduler, tag=""):
+    return reduce_summaries(
+        part_lists, scheduler, summary_prompt, merge_prompt, summary_budget(),
+        summary_version=summary_prompt_version, merge_version=merge_prompt_version,
+        chars_per_token=ollama_chars_per_token, tag=tag,
+    )
+
+# --- Small groups go to Ollama directly, big ones are condensed by T5 first ---
+def needs_t5(comment_list):
+    return not (len(comment_list) <= 10 or len("\n".join(comment_list)) < 2500)
+
+# --- Adaptive inputs: the ideas themselves, or T5 chunk summaries for big groups (one list of parts per group) ---
+def adaptive_summary_inputs(idea_lists, t5_summarizer, tag=""):
+    inputs = [None] * len(idea_lists)
+    chunks, owners = [], []
+    budget = None  # asking for it loads T5, so only once a group needs it
+    code = tag.strip("[] ")
+
+    with metrics.stage("t5_chunking", code) as stage:
+        for g, comment_list in enumerate(idea_lists):
+            if needs_t5(comment_list):
+                budget = budget or input_budget(t5_summarizer)
+                group_chunks = token_chunks(comment_list, t5_summarizer.tokenizer, budget)
+                chunks.extend(group_chunks)
+                owners.extend([g] * len(group_chunks))
+            else:
+                # Use Ollama directly
+                inputs[g] = list(comment_list)
+        stage["chunks"] = len(chunks)
+
+    if chunks:
+        # Use T5 for the chunks of every big group in one batched pass
+        with metrics.stage("t5_summarize", code, chunks=len(chunks)):
+            t5_summaries = summarize_with_t5(t5_summarizer, chunks)
+        per_group = {}
+        for g, t5_summary in zip(owners, t5_summaries):
+            per_group.setdefault(g, []).append(t5_summary)
+
+        # T5 summaries become the parts Ollama summarizes
+        for g, group_summaries in per_group.items():
+            inputs[g] = group_summaries
+        print(f"{tag}✔️ T5 summarized {len(chunks)} token-packed chunks from {len(per_group)} groups.")
+
+    return inputs
+
+# --- Final Adaptive Functions: every group's Ollama summary tree is built together ---
+def adaptive_summaries(idea_lists, t5_summarizer, scheduler, tag=""):
+    inputs = adaptive_summary_inputs(idea_lists, t5_summarizer, tag=tag)
+    with metrics.stage("ollama_summaries", tag.strip("[] "), groups=len(inputs)) as stage:
+        summaries, trees = reduce_to_summaries(inputs, scheduler, tag=tag)
+        stage["max_depth"] = max((tree["depth"] for tree in trees), default=0)
+    print(f"{tag}✔️ Ollama summarization done for {len(summaries)} groups "
+          f"(deepest tree {max((tree['depth'] for tree in trees), default=0)} levels).")
+    return summaries, trees
+
+def adaptive_summary(comment_list, t5_summarizer, scheduler, tag=""):
+    summaries, _ = adaptive_summaries([comment_list], t5_summarizer, scheduler, tag=tag)
+    return summaries[0]
+
+# --- Helper for folding new ideas into a saved summary ---
+def update_prompt(summary, text):
+    return f"""
+You are a business analyst. Below is the existing summary of a theme of employee suggested ideas, followed by new ideas added to that theme. Update the summary so it also covers the new ideas. Keep its detailed, formal style and every point that still applies.
+
+Existing summary:
+{summary}
+
+New ideas:
+{text}
 
-with pd.ExcelWriter("thematic_summary_ideas_IC.xlsx", engine="openpyxl") as writer:
-    final_output.to_excel(writer, sheet_name="IC Thematic Summary", index=False)
-    full_data.to_excel(writer, sheet_name="IC Data", index=False)
+Updated summary:
+"""
 
-# with pd.ExcelWriter("thematic_summary_ideas_IF.xlsx", engine="openpyxl") as writer:
-#     final_output.to_excel(writer, sheet_name="IF Thematic Summary", index=False)
-#     full_data.to_excel(writer, sheet_name="IF Data", index=False)
+# --- Change-aware summaries: reuse unchanged themes, update small additions, summarize the rest ---
+def summary_versions():
+    # A saved summary is only reused while none of the templates that can write one changed
+    return f"{summary_prompt_version}+{merge_prompt_version}+{summary_update_prompt_version}"
+
+def change_aware_summaries(themes, member_ids, idea_lists, texts_by_id, t5_summarizer, scheduler, code="", tag=""):
+    store = SummaryStore(os.path.join(summary_store_dir, f"{code or 'default'}.json"))
+    summaries = [None] * len(themes)
+    trees = [None] * len(themes)
+    full, updates = [], []
+    version, budget = summary_versions(), summary_budget()
+
+    for g, (theme, ids) in enumerate(zip(themes, member_ids)):
+        action, entry, new_ids = store.plan(theme, ids, version,
+                                            max_update_fraction=summary_update_max_fraction,
+                                            max_updates=summary_max_updates)
+        new_ideas = [texts_by_id[i] for i in new_ids]
+        if action == "update":
+            prompt = update_prompt(entry["summary"], "\n".join(new_ideas))
+            # Too long for one call (Ollama would cut it): the summary tree keeps every prompt in budget
+            if needs_t5(new_ideas) or estimate_tokens(prompt, ollama_chars_per_token) > budget:
+                action = "full"
+        if action == "reuse":
+            summaries[g] = entry["summary"]
+            trees[g] = entry.get("tree")
+            store.put(theme, ids, entry["summary"], version, entry.get("updates", 0), trees[g])
+        elif action == "update":
+            updates.append((g, entry, new_ideas, prompt))
+        else:
+            full.append(g)
+
+    if full:
+        fresh, fresh_trees = adaptive_summaries([idea_lists[g] for g in full], t5_summarizer, scheduler, tag=tag)
+        for g, summary, tree in zip(full, fresh, fresh_trees):
+            summaries[g], trees[g] = summary, tree
+            store.put(themes[g], member_ids[g], summary, version, tree=tree)
+
+    if updates:
+        prompts = [prompt for _, _, _, prompt in updates]
+        with metrics.stage("summary_updates", code, themes=len(updates)):
+            answers = scheduler.chat_many(prompts, template_version=summary_update_prompt_version)
+        for (g, entry, new_ideas, _), summary in zip(updates, answers):
+            summaries[g], trees[g] = summary, {"depth": 1, "fan_out": len(new_ideas) + 1, "calls": 1}
+            store.put(themes[g], member_ids[g], summary, version, entry.get("updates", 0) + 1, trees[g])
+
+    store.save()
+    print(f"{tag}✔️ Summaries: {len(themes) - len(full) - len(updates)} reused, "
+          f"{len(updates)} updated with new ideas, {len(full)} summarized from scratch.")
+    return summaries, trees
+
+
+
+
+# --- Steps 3 to 7 for one filtered group ---
+def run_segment(df, embeddings, t5_summarizer, scheduler, code="", k_jobs=None):
+    tag = f"[{code}] " if code else ""
+
+    n_clusters, theme_names, keywords = theme_clusters(df, embeddings, scheduler, code=code, tag=tag, k_jobs=k_jobs)
+    theme_map = {i: name for i, name in enumerate(theme_names)}
+    df["theme"] = df["theme_cluster"].map(theme_map)
+    keywords.insert(1, "theme", keywords["cluster"].map(theme_map))
+    print(f"{tag}Step 4 done. Themes generated.")
+
+    with metrics.stage("grouping", code):
+        grouped = group_by_theme(df)
+    print(f"{tag}Step 5 done. Grouped ideas by theme.")
+
+    ids = ideas_store.idea_ids(df)
+    member_ids = grouped["theme"].map(ids.groupby(df["theme"]).agg(list)).tolist()
+    with metrics.stage("summarization", code, themes=len(grouped)):
+        grouped["summary"], trees = change_aware_summaries(
+            grouped["theme"].tolist(), member_ids, grouped["Ideas"].tolist(), dict(zip(ids, df["Ideas"])),
+            t5_summarizer, scheduler, code=code, tag=tag,
+        )
+    grouped["summary_depth"] = [(tree or {}).get("depth") for tree in trees]
+    grouped["summary_fan_out"] = [(tree or {}).get("fan_out") for tree in trees]
+    print(f"{tag}Step 6 done. Summarizing.")
+
+    # Top keywords per theme, from the same keyword table the names were generated from
+    top_keywords = keywords[keywords["rank"] < report_keywords].groupby("theme")["keyword"].agg(", ".join)
+    grouped["keywords"] = grouped["theme"].map(top_keywords).fillna("")
+
+    # Step 7: Sort by frequency and keep relevant columns
+    final_output = grouped[["theme", "frequency", "SumOfVotes", "SumOfComments", "keywords", "summary", "summary_depth", "summary_fan_out"]].sort_values(by="frequency", ascending=False)
+    full_data = df.copy()  # add other columns if needed
+    return final_output, full_data, keywords
+
+
+# Write all sheets to the same Excel file
+def write_segment_sheets(writer, final_output, full_data, code, keywords=None):
+    final_output.to_excel(writer, sheet_name=f"{code} Thematic Summary", index=False)
+    full_data.to_excel(writer, sheet_name=f"{code} Data", index=False)
+    if keywords is not None:
+        keywords.to_excel(writer, sheet_name=f"{code} Keywords", index=False)
+
+
+# Cluster assignments and keywords go to the columnar store, for the stages that come after
+def save_segment_tables(full_data, code, keywords=None):
+    with metrics.stage("store_write", code):
+        if keywords is not None:
+            ideas_store.write_table(keywords, f"keywords_{code}")
+        assignments = pd.DataFrame({
+            "id": ideas_store.idea_ids(full_data),
+            "theme_cluster": full_data["theme_cluster"].astype("int32"),
+            "theme": full_data["theme"].astype("string"),
+        })
+        return ideas_store.write_table(assignments, f"clusters_{code}")
+
+
+def save_segment_report(final_output, full_data, code, keywords=None, path=None):
+    path = path or f"thematic_summary_ideas_{code}.xlsx"
+    with metrics.stage("excel_write", code, rows=len(full_data)):
+        with pd.ExcelWriter(path, engine="openpyxl") as writer:
+            write_segment_sheets(writer, final_output, full_data, code, keywords)
+    return path
+
+
+
+
+def main():
+    # Settings are read when main runs, so ideas_cli.py can set them from flags or a config file
+    metrics.metrics_dir, metrics.profile_stage = metrics_dir, profile_stage
+
+    # Load data
+    with metrics.stage("load"):
+        df = load_ideas(input_file)
+    with metrics.stage("dedup", ideas=len(df)):
+        df = collapse_near_duplicates(df)
+
+    # T5-small is loaded once, on first use
+    t5_summarizer = LazyT5Summarizer(t5_model_path)
+    scheduler = make_scheduler()
+
+    segment_value, code = segment
+    df = filter_segment(df, segment_value)
+    texts = df["Ideas"].tolist()
+    print("Step 1 done. Filtered.")
 
-# with pd.ExcelWriter("thematic_summary_ideas_NA.xlsx", engine="openpyxl") as writer:
-#     final_output.to_excel(writer, sheet_name="NA Thematic Summary", index=False)
-#     full_data.to_excel(writer, sheet_name="NA Data", index=False)
+    # Step 2: Embed ideas (the model is only loaded if some ideas are not cached yet)
+    with metrics.stage("embed", code, ideas=len(texts)):
+        ids = ideas_store.idea_ids(df)
+        embeddings = encode_with_cache(texts, embed_model_name, cache_dir=embedding_cache_dir,
+                                       storage=embedding_storage, as_matrix=embedding_memmap, ids=ids)
+    print("Step 2 done. Embedded sentence transformer.")
 
-#######################
+    final_output, full_data, keywords = run_segment(df, embeddings, t5_summarizer, scheduler, code)
+    save_segment_tables(full_data, code, keywords)
+    path = save_segment_report(final_output, full_data, code, keywords)
 
-print("✅ Thematic summary saved.")
+    scheduler.cache.report()
+    metrics.report()
+    print(f"📈 Metrics saved to '{metrics.save()}'.")
+    print(f"✅ Thematic summary saved to '{path}'.")
+    return path
+
+
+
+
+if __name__ == "__main__":
+    main()
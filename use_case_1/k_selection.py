@@ -0,0 +1,127 @@
+'''
+This module picks the number of theme clusters,
+By fitting every candidate k in parallel across cores,
+Optionally on a subsample and/or with MiniBatchKMeans for the sweep,
+And scoring the candidates by the inertia knee or the silhouette score.
+=> (the winning model is reused instead of being fitted a second time; a subsampled or MiniBatchKMeans
+    sweep is refined by one full KMeans run warm-started from its centroids.)
+=> (a memory-mapped EmbeddingMatrix is swept on a sample, and the final fit runs over it in row blocks.)
+'''
+
+
+
+
+from collections import namedtuple
+
+import numpy as np
+from joblib import Parallel, delayed
+from kneed import KneeLocator
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import silhouette_score
+
+from cluster_state import nearest_centroids, cluster_means
+
+
+
+
+KSelection = namedtuple("KSelection", ["k", "model", "labels", "k_values", "inertias", "silhouettes"])
+
+# Result of the block-wise final fit, with the attributes the pipeline reads from a fitted KMeans
+BlockKMeans = namedtuple("BlockKMeans", ["cluster_centers_", "labels_", "inertia_", "n_iter_"])
+
+
+def _fit_candidate(data, k, minibatch, with_silhouette, silhouette_sample_size, random_state):
+    if minibatch:
+        model = MiniBatchKMeans(n_clusters=k, random_state=random_state, batch_size=1024, n_init=3)
+    else:
+        model = KMeans(n_clusters=k, random_state=random_state)
+    labels = model.fit_predict(data)
+
+    silhouette = None
+    if with_silhouette and 1 < k < len(data):
+        sample_size = min(silhouette_sample_size, len(data)) if silhouette_sample_size else None
+        silhouette = float(silhouette_score(data, labels, sample_size=sample_size, random_state=random_state))
+    return model, float(model.inertia_), silhouette
+
+
+def _knee(k_values, inertias):
+    if len(k_values) < 3:
+        return k_values[0]
+    knee = KneeLocator(k_values, inertias, curve="convex", direction="decreasing").knee
+    if knee is not None:
+        return int(knee)
+    # No clear knee: fall back to the sharpest bend of the curve
+    bends = np.diff(inertias, n=2)
+    return k_values[int(np.argmax(bends)) + 1]
+
+
+def block_lloyd(embeddings, centers, max_iter=20, tol=1e-4, block_size=4096):
+    # Lloyd iterations that read the data in row blocks: memory stays at one block plus the labels
+    centers = np.asarray(centers, dtype=np.float32)
+    for iteration in range(1, max_iter + 1):
+        labels, distances = nearest_centroids(embeddings, centers, block_size=block_size)
+        means, sizes = cluster_means(embeddings, labels, len(centers), block_size=block_size)
+        new_centers = np.where(sizes[:, None] > 0, means, centers).astype(np.float32)
+        shift = float(((new_centers - centers) ** 2).sum())
+        centers = new_centers
+        if shift <= tol:
+            break
+    labels, distances = nearest_centroids(embeddings, centers, block_size=block_size)
+    return BlockKMeans(centers, labels, float((distances.astype(np.float64) ** 2).sum()), iteration)
+
+
+def select_k(embeddings, k_range=range(1, 15), method="inertia", n_jobs=-1, sample_size=None,
+             minibatch=False, silhouette_sample_size=5000, random_state=42, mapped_sample_size=20000):
+    if method not in ("inertia", "silhouette"):
+        raise ValueError(f"Unknown k selection method: {method}")
+
+    # A memory-mapped matrix is never loaded whole: the sweep always runs on a sample of it
+    mapped = not isinstance(embeddings, np.ndarray)
+    if mapped:
+        sample_size = min(sample_size or mapped_sample_size, mapped_sample_size)
+    else:
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+    n_samples = len(embeddings)
+
+    # Estimate the elbow on a random subsample when the segment is large
+    if sample_size and n_samples > sample_size:
+        rng = np.random.default_rng(random_state)
+        sweep_data = embeddings[np.sort(rng.choice(n_samples, size=sample_size, replace=False))]
+    elif mapped:
+        sweep_data = embeddings = np.asarray(embeddings, dtype=np.float32)  # small enough to read in one go
+    else:
+        sweep_data = embeddings
+
+    k_values = [k for k in k_range if k <= len(sweep_data)]
+    if method == "silhouette":
+        k_values = [k for k in k_values if 1 < k < len(sweep_data)]
+    if not k_values:
+        raise ValueError(f"Not enough ideas ({n_samples}) to sweep k over {list(k_range)}")
+
+    fits = Parallel(n_jobs=n_jobs)(
+        delayed(_fit_candidate)(sweep_data, k, minibatch, method == "silhouette", silhouette_sample_size, random_state)
+        for k in k_values
+    )
+    models = [fit[0] for fit in fits]
+    inertias = [fit[1] for fit in fits]
+    silhouettes = [fit[2] for fit in fits]
+
+    if method == "silhouette":
+        optimal_k = k_values[int(np.argmax(silhouettes))]
+    else:
+        optimal_k = _knee(k_values, inertias)
+    model = models[k_values.index(optimal_k)]
+
+    if mapped and sweep_data is not embeddings:
+        # The sweep only saw a sample: warm start over the memory-mapped rows block by block
+        model = block_lloyd(embeddings, model.cluster_centers_)
+        labels = model.labels_
+    elif sweep_data is not embeddings or minibatch:
+        # The sweep only saw a subsample, or MiniBatchKMeans only approximated the centroids:
+        # warm-start a single full Lloyd run from the winning centroids
+        model = KMeans(n_clusters=optimal_k, init=model.cluster_centers_, n_init=1, random_state=random_state)
+        labels = model.fit_predict(embeddings)
+    else:
+        labels = model.labels_
+
+    return KSelection(optimal_k, model, np.asarray(labels), k_values, inertias, silhouettes)
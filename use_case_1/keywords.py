@@ -0,0 +1,101 @@
+'''
+This module extracts the top keywords of every cluster at once,
+One sparse product of a cluster-indicator matrix with the term matrix gives the scores of all clusters,
+And argpartition picks each cluster's top terms without sorting the whole vocabulary.
+=> (method = "mean" is the mean TF-IDF per cluster, "ctfidf" is class-based TF-IDF.)
+=> (the result is one keyword table, used by theme naming and by the report.)
+'''
+
+
+
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+
+
+
+
+def cluster_indicator(labels, n_clusters):
+    # (n_clusters x n_ideas) 0/1 matrix, row i marks the ideas of cluster i
+    labels = np.asarray(labels, dtype=np.int64)
+    return sparse.csr_matrix(
+        (np.ones(len(labels), dtype=np.float32), (labels, np.arange(len(labels)))),
+        shape=(n_clusters, len(labels)),
+    )
+
+
+def row_scale(matrix, factors):
+    return sparse.diags(factors.astype(np.float32)) @ matrix
+
+
+def safe_inverse(values):
+    values = np.asarray(values, dtype=np.float64).ravel()
+    return np.divide(1.0, values, out=np.zeros_like(values), where=values > 0)
+
+
+def mean_tfidf_scores(texts, labels, n_clusters, max_features=10000):
+    vectorizer = TfidfVectorizer(stop_words="english", max_features=max_features)
+    X = vectorizer.fit_transform(texts)
+    C = cluster_indicator(labels, n_clusters)
+    sizes = np.asarray(C.sum(axis=1)).ravel()
+    return row_scale(C @ X, safe_inverse(sizes)).tocsr(), vectorizer.get_feature_names_out()
+
+
+def ctfidf_scores(texts, labels, n_clusters, max_features=10000):
+    # Each cluster is one document: term frequency within the cluster x log(1 + avg words per cluster / term frequency overall)
+    vectorizer = CountVectorizer(stop_words="english", max_features=max_features)
+    counts = vectorizer.fit_transform(texts)
+    class_counts = (cluster_indicator(labels, n_clusters) @ counts).tocsr()
+
+    words_per_class = np.asarray(class_counts.sum(axis=1)).ravel()
+    term_totals = np.asarray(class_counts.sum(axis=0)).ravel()
+    idf = np.log1p(words_per_class.mean() * safe_inverse(term_totals))
+
+    tf = row_scale(class_counts, safe_inverse(words_per_class))
+    return (tf @ sparse.diags(idf.astype(np.float32))).tocsr(), vectorizer.get_feature_names_out()
+
+
+def top_terms(scores, terms, top_k=30, block_size=256):
+    # Densify a block of cluster rows at a time; argpartition, then sort only the top_k
+    rows = []
+    for start in range(0, scores.shape[0], block_size):
+        block = scores[start:start + block_size].toarray()
+        k = min(top_k, block.shape[1])
+        if k == 0:
+            continue
+        top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(block, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        for offset in range(block.shape[0]):
+            keep = top_scores[offset] > 0
+            for rank, (term, score) in enumerate(zip(top[offset][keep], top_scores[offset][keep])):
+                rows.append((start + offset, rank, terms[term], float(score)))
+
+    return pd.DataFrame(rows, columns=["cluster", "rank", "keyword", "score"])
+
+
+def keyword_table(texts, labels, n_clusters, top_k=30, method="mean", max_features=10000):
+    '''
+    One row per (cluster, rank) with the keyword and its score, for all clusters.
+    Empty clusters and terms that never occur in a cluster get no rows.
+    '''
+    texts = pd.Series(texts).fillna("").astype(str).tolist()
+    if method == "ctfidf":
+        scores, terms = ctfidf_scores(texts, labels, n_clusters, max_features=max_features)
+    elif method == "mean":
+        scores, terms = mean_tfidf_scores(texts, labels, n_clusters, max_features=max_features)
+    else:
+        raise ValueError(f"Unknown keyword method: {method!r}")
+    return top_terms(scores, terms, top_k=top_k)
+
+
+def keywords_by_cluster(table, n_clusters, top_k=None):
+    lists = [[] for _ in range(n_clusters)]
+    for cluster, keywords in table.sort_values(["cluster", "rank"]).groupby("cluster")["keyword"]:
+        lists[cluster] = keywords.tolist()[:top_k]
+    return lists
@@ -0,0 +1,109 @@
+'''
+This module keeps an on-disk cache of LLM responses in SQLite,
+Keyed by model name, prompt template version and prompt text,
+So reruns over unchanged clusters do not pay for the same generation twice.
+=> (size-bounded with least-recently-used eviction; hit/miss counts are kept per run.)
+'''
+
+
+
+
+import hashlib
+import sqlite3
+import threading
+import time
+
+
+
+
+def cache_key(model, template_version, prompt):
+    payload = f"{model}\x00{template_version}\x00{prompt}".encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+class LLMCache:
+    '''
+    bypass=True skips lookups (every prompt goes to the model)
+    but still stores the fresh answers, so it also refreshes the cache.
+    '''
+
+    def __init__(self, path="llm_cache.sqlite", max_bytes=256 * 1024 * 1024, bypass=False):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.bypass = bypass
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, model TEXT, template_version TEXT, "
+            "response TEXT, size INTEGER, last_used REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses(last_used)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, model, template_version, prompt):
+        with self._lock:
+            if self.bypass:
+                self.misses += 1
+                return None
+            key = cache_key(model, template_version, prompt)
+            row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, model, template_version, prompt, response):
+        key = cache_key(model, template_version, prompt)
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, template_version, response, size, time.time()),
+            )
+            self._total_bytes += size - (old[0] if old else 0)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM responses ORDER BY last_used LIMIT 100"
+            ).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                if self._total_bytes <= self.max_bytes:
+                    break
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._total_bytes -= size
+                self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "size_bytes": self._total_bytes,
+        }
+
+    def report(self):
+        stats = self.stats()
+        print(f"💾 LLM cache: {stats['hits']} hits, {stats['misses']} misses "
+              f"({stats['hit_rate']:.0%} hit rate), {stats['evictions']} evicted, "
+              f"{stats['size_bytes'] / 1e6:.1f} MB on disk.")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,102 @@
+'''
+This module finds near-identical resubmissions of the same idea,
+With MinHash signatures of character shingles and locality-sensitive hashing (LSH) on signature bands,
+So only ideas sharing a band bucket are compared: time grows with the corpus, not with its square.
+Every group keeps one representative; the others point at it with their estimated Jaccard similarity.
+=> (the band/row split is chosen so the LSH threshold sits close to the similarity threshold.)
+'''
+
+
+
+
+import re
+import zlib
+
+import numpy as np
+
+
+
+
+# Mersenne prime 2^31 - 1: a * x + b stays below 2^63 for 32-bit shingle hashes, so uint64 never overflows
+PRIME = np.uint64((1 << 31) - 1)
+
+
+def normalize(text):
+    return re.sub(r"\s+", " ", str(text).lower()).strip()
+
+
+def shingle_hashes(text, size=5):
+    text = normalize(text)
+    if len(text) <= size:
+        return np.array([zlib.crc32(text.encode("utf-8"))], dtype=np.uint64)
+    return np.unique(np.fromiter((zlib.crc32(text[i:i + size].encode("utf-8")) for i in range(len(text) - size + 1)),
+                                 dtype=np.uint64))
+
+
+def minhash_signatures(texts, num_perm=128, shingle_size=5, seed=42):
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, PRIME, size=num_perm, dtype=np.uint64)[:, None]
+    b = rng.integers(0, PRIME, size=num_perm, dtype=np.uint64)[:, None]
+    signatures = np.empty((len(texts), num_perm), dtype=np.uint32)
+    for row, text in enumerate(texts):
+        hashes = shingle_hashes(text, shingle_size)[None, :] % PRIME
+        signatures[row] = ((a * hashes + b) % PRIME).min(axis=1)
+    return signatures
+
+
+def band_split(num_perm, threshold):
+    # (bands, rows) with bands * rows = num_perm whose S-curve threshold (1/bands)^(1/rows) is closest
+    splits = [(num_perm // rows, rows) for rows in range(1, num_perm + 1) if num_perm % rows == 0]
+    return min(splits, key=lambda split: abs((1 / split[0]) ** (1 / split[1]) - threshold))
+
+
+def find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def similarity(signatures, rows, others):
+    # Estimated Jaccard similarity of each row to the matching row of others
+    return (signatures[rows] == signatures[others]).mean(axis=1).astype(np.float32)
+
+
+def near_duplicate_groups(texts, threshold=0.8, num_perm=128, shingle_size=5, seed=42, signatures=None):
+    '''
+    Returns (groups, scores): groups[i] is the row of the first idea of i's group (i itself when unique),
+    scores[i] the estimated Jaccard similarity of i to that first idea (1.0 for the first idea itself).
+    signatures: precomputed minhash_signatures(texts, ...) rows, so callers can reuse them to score other pairs.
+    '''
+    if signatures is None:
+        signatures = minhash_signatures(texts, num_perm, shingle_size, seed)
+    n = len(signatures)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    num_perm = signatures.shape[1]
+    bands, rows = band_split(num_perm, threshold)
+    parent = np.arange(n)
+
+    for band in range(bands):
+        keys = signatures[:, band * rows:(band + 1) * rows]
+        _, bucket = np.unique(keys, axis=0, return_inverse=True)
+        bucket = bucket.ravel()
+        # Only buckets holding two or more ideas are visited
+        order = np.argsort(bucket, kind="stable")
+        order = order[np.bincount(bucket)[bucket[order]] > 1]
+        if not len(order):
+            continue
+        starts = np.flatnonzero(np.r_[True, np.diff(bucket[order]) != 0])
+        for members in np.split(order, starts[1:]):
+            # Each bucket member is checked against the bucket's first idea only, so no bucket costs O(m^2)
+            leader = members[0]
+            scores = similarity(signatures, members[1:], np.full(len(members) - 1, leader))
+            for member, score in zip(members[1:], scores):
+                if score < threshold:
+                    continue
+                root_leader, root_member = find(parent, leader), find(parent, member)
+                if root_leader != root_member:
+                    parent[max(root_leader, root_member)] = min(root_leader, root_member)
+
+    groups = np.array([find(parent, i) for i in range(n)], dtype=np.int64)
+    return groups, similarity(signatures, np.arange(n), groups)
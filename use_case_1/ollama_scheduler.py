@@ -0,0 +1,134 @@
+'''
+This module schedules Ollama chat requests concurrently,
+With a bounded number of requests in flight, per-request timeouts and retries,
+And returns the answers in the same order as the prompts.
+=> (one background event loop is shared by every caller thread, so the in-flight limit is global.)
+=> (point host at a local stub server to test without a real Ollama.)
+=> (with an LLMCache attached, only prompts missing from the cache reach the model,
+    and every answer is stored as soon as it arrives, so a failing prompt loses no other answer.)
+=> (calls, retries and token counts reported by Ollama are kept per run, see stats().)
+'''
+
+
+
+
+import asyncio
+import threading
+import time
+
+import ollama
+
+
+
+
+class OllamaScheduler:
+    def __init__(self, model="mistral", host=None, max_in_flight=4, timeout=300, retries=2, retry_delay=2.0, cache=None,
+                 options=None):
+        self.model = model
+        self.options = options  # Ollama model options, e.g. {"num_ctx": 4096}
+        self.cache = cache
+        self.host = host
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.retries = retries
+        self.retry_delay = retry_delay
+
+        # Per-run counters, only updated on the loop thread
+        self.calls = 0
+        self.retried = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.generation_seconds = 0.0  # as reported by Ollama (eval_duration)
+        self.request_seconds = 0.0
+
+        # Semaphore and client are created lazily on the loop thread they belong to
+        self._semaphore = None
+        self._client = None
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="ollama-scheduler", daemon=True)
+        self._thread.start()
+
+    async def _chat(self, prompt):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+            self._client = ollama.AsyncClient(host=self.host)
+
+        for attempt in range(self.retries + 1):
+            try:
+                async with self._semaphore:
+                    start = time.perf_counter()
+                    response = await asyncio.wait_for(
+                        self._client.chat(model=self.model, messages=[{"role": "user", "content": prompt}], options=self.options),
+                        timeout=self.timeout,
+                    )
+                    self.request_seconds += time.perf_counter() - start
+                self.calls += 1
+                self.prompt_tokens += response.get("prompt_eval_count") or 0
+                self.output_tokens += response.get("eval_count") or 0
+                self.generation_seconds += (response.get("eval_duration") or 0) / 1e9
+                return response["message"]["content"].strip()
+            except Exception as e:
+                if attempt == self.retries:
+                    raise
+                self.retried += 1
+                delay = self.retry_delay * 2 ** attempt
+                print(f"⚠️ Ollama attempt {attempt+1} failed ({type(e).__name__}: {e}). 🔁 Retrying in {delay:.0f}s...")
+                await asyncio.sleep(delay)
+
+    async def _answer(self, prompt, template_version):
+        answer = await self._chat(prompt)
+        if self.cache:
+            self.cache.put(self.model, template_version, prompt, answer)
+        return answer
+
+    async def _gather(self, prompts, versions):
+        # Every prompt runs to the end before the first failure is raised, so all successes are cached
+        results = await asyncio.gather(*(self._answer(prompt, version) for prompt, version in zip(prompts, versions)),
+                                       return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return results
+
+    def chat_many(self, prompts, template_version=""):
+        # template_version: one for all prompts, or a list with one per prompt
+        prompts = list(prompts)
+        if not prompts:
+            return []
+        versions = list(template_version) if isinstance(template_version, (list, tuple)) else [template_version] * len(prompts)
+
+        results = [None] * len(prompts)
+        pending = {}  # prompt -> positions, so identical prompts are generated once
+        for position, prompt in enumerate(prompts):
+            cached = self.cache.get(self.model, versions[position], prompt) if self.cache else None
+            if cached is not None:
+                results[position] = cached
+            else:
+                pending.setdefault(prompt, []).append(position)
+
+        if pending:
+            unique_prompts = list(pending)
+            unique_versions = [versions[pending[prompt][0]] for prompt in unique_prompts]
+            answers = asyncio.run_coroutine_threadsafe(self._gather(unique_prompts, unique_versions), self._loop).result()
+            for prompt, answer in zip(unique_prompts, answers):
+                for position in pending[prompt]:
+                    results[position] = answer
+        return results
+
+    def chat(self, prompt, template_version=""):
+        return self.chat_many([prompt], template_version=template_version)[0]
+
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "retried": self.retried,
+            "prompt_tokens": self.prompt_tokens,
+            "output_tokens": self.output_tokens,
+            "generation_seconds": self.generation_seconds,
+            "request_seconds": self.request_seconds,
+            "tokens_per_second": self.output_tokens / self.generation_seconds if self.generation_seconds else 0.0,
+        }
+
+    def close(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
@@ -0,0 +1,156 @@
+'''
+This module records where time and memory go in a pipeline run,
+Wall time, CPU time and peak RSS for every stage, plus the LLM calls, tokens and cache hits made during it,
+And writes them as one JSON file per run, so daily runs can be compared for regressions.
+=> (profile_stage = "<stage name>" also dumps a cProfile of that stage, open it with snakeviz or pstats.)
+=> (peak RSS is reset at the start of a stage when no other stage is running; nested or parallel stages
+    report the high-water mark since the enclosing reset. On non-Linux it is the process peak.)
+'''
+
+
+
+
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+
+
+
+def reset_peak_rss():
+    # Linux: writing 5 to clear_refs resets VmHWM of this process
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb():
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def counter_delta(after, before):
+    return {key: after[key] - before.get(key, 0) for key, value in after.items()
+            if isinstance(value, (int, float)) and not key.endswith(("_rate", "_per_second", "size_bytes"))}
+
+
+class StageMetrics:
+    def __init__(self, metrics_dir="metrics", profile_stage=None):
+        self.metrics_dir = metrics_dir
+        self.profile_stage = profile_stage
+        self.run_id = time.strftime("run_%Y%m%d_%H%M%S")
+        self.started = time.time()
+        self.scheduler = None
+        self.records = []
+        self._active = 0
+        self._lock = threading.Lock()
+        self._profiling = threading.Lock()  # one cProfile at a time, profilers cannot overlap
+
+    def attach(self, scheduler):
+        self.scheduler = scheduler
+
+    def _llm_snapshot(self):
+        if self.scheduler is None:
+            return {}, {}
+        cache = self.scheduler.cache.stats() if self.scheduler.cache else {}
+        return self.scheduler.stats(), cache
+
+    @contextmanager
+    def stage(self, name, segment="", **info):
+        with self._lock:
+            if not self._active:
+                reset_peak_rss()
+            self._active += 1
+        llm_before, cache_before = self._llm_snapshot()
+        profiler = None
+        if name == self.profile_stage and self._profiling.acquire(blocking=False):
+            profiler = cProfile.Profile()
+            profiler.enable()
+        wall, cpu = time.perf_counter(), time.process_time()
+
+        try:
+            yield info
+        finally:
+            record = {
+                "stage": name,
+                "segment": segment,
+                "wall_seconds": time.perf_counter() - wall,
+                "cpu_seconds": time.process_time() - cpu,  # whole process, so parallel segments add up
+                "peak_rss_mb": peak_rss_mb(),
+            }
+            if profiler is not None:
+                profiler.disable()
+                self._profiling.release()
+                os.makedirs(self.metrics_dir, exist_ok=True)
+                path = os.path.join(self.metrics_dir, f"{self.run_id}_{name}{'_' + segment if segment else ''}.prof")
+                profiler.dump_stats(path)
+                record["profile"] = path
+
+            llm_after, cache_after = self._llm_snapshot()
+            llm = counter_delta(llm_after, llm_before)
+            if llm.get("calls") or llm.get("retried"):
+                llm["tokens_per_second"] = llm["output_tokens"] / llm["generation_seconds"] if llm["generation_seconds"] else 0.0
+                record["llm"] = llm
+            cache = counter_delta(cache_after, cache_before)
+            if cache.get("hits") or cache.get("misses"):
+                record["llm_cache"] = cache
+            record.update(info)
+
+            with self._lock:
+                self._active -= 1
+                self.records.append(record)
+
+    def totals(self):
+        totals = {}
+        for record in self.records:
+            total = totals.setdefault(record["stage"], {"runs": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0, "peak_rss_mb": 0.0})
+            total["runs"] += 1
+            total["wall_seconds"] += record["wall_seconds"]
+            total["cpu_seconds"] += record["cpu_seconds"]
+            total["peak_rss_mb"] = max(total["peak_rss_mb"], record["peak_rss_mb"] or 0.0)
+            for key, value in record.get("llm", {}).items():
+                if key != "tokens_per_second":
+                    total[f"llm_{key}"] = total.get(f"llm_{key}", 0) + value
+        return totals
+
+    def report(self):
+        print("⏱️ Stage metrics:")
+        print(f"{'stage':<18}{'runs':>5}{'wall s':>9}{'cpu s':>9}{'peak MB':>9}{'LLM calls':>10}{'tokens':>9}")
+        for name, total in self.totals().items():
+            print(f"{name:<18}{total['runs']:>5}{total['wall_seconds']:>9.1f}{total['cpu_seconds']:>9.1f}"
+                  f"{total['peak_rss_mb']:>9.0f}{total.get('llm_calls', 0):>10}{total.get('llm_output_tokens', 0):>9}")
+
+    def save(self, path=None):
+        os.makedirs(self.metrics_dir, exist_ok=True)
+        path = path or os.path.join(self.metrics_dir, f"{self.run_id}.json")
+        llm, cache = self._llm_snapshot()
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "run_id": self.run_id,
+                "started": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.started)),
+                "wall_seconds": time.time() - self.started,
+                "peak_rss_mb": max((record["peak_rss_mb"] or 0.0 for record in self.records), default=peak_rss_mb()),
+                "stages": self.records,
+                "totals": self.totals(),
+                "llm": llm,
+                "llm_cache": cache,
+            }, f, indent=2)
+        return path
@@ -0,0 +1,73 @@
+'''
+This module keeps the theme summaries of a group between runs,
+Each one stored with a fingerprint of its member idea IDs and the prompt version that wrote it.
+Themes whose members did not change reuse their summary, themes that only gained a few ideas
+Get an "update this summary" pass, and the rest are summarized from scratch.
+=> (one JSON file per group code under summary_store/.)
+'''
+
+
+
+
+import hashlib
+import json
+import os
+
+
+
+
+def fingerprint(ids):
+    return hashlib.sha1("\n".join(sorted(str(i) for i in ids)).encode("utf-8")).hexdigest()
+
+
+class SummaryStore:
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        self.by_fingerprint = {entry["fingerprint"]: entry for entry in self.entries.values()}
+        self.current = {}
+
+    def plan(self, theme, ids, version, max_update_fraction=0.5, max_updates=5):
+        '''
+        Returns (action, entry, new_ids), action being "reuse", "update" or "full".
+        A theme is found by name, or by an identical member set when it was renamed.
+        '''
+        ids = [str(i) for i in ids]
+        key = fingerprint(ids)
+        entry = self.entries.get(theme)
+        if entry is None or entry["fingerprint"] != key:
+            entry = self.by_fingerprint.get(key, entry)
+        if entry is None or entry["version"] != version:
+            return "full", None, []
+        if entry["fingerprint"] == key:
+            return "reuse", entry, []
+
+        # Only additions can be folded into an existing summary; removed ideas need a full pass
+        old_ids = set(entry["ids"])
+        if not old_ids.issubset(ids) or entry.get("updates", 0) >= max_updates:
+            return "full", None, []
+        new_ids = [i for i in ids if i not in old_ids]
+        if len(new_ids) > max(1, max_update_fraction * len(old_ids)):
+            return "full", None, []
+        return "update", entry, new_ids
+
+    def put(self, theme, ids, summary, version, updates=0, tree=None):
+        ids = [str(i) for i in ids]
+        self.current[theme] = {
+            "fingerprint": fingerprint(ids),
+            "ids": ids,
+            "summary": summary,
+            "version": version,
+            "updates": updates,
+            "tree": tree,  # depth / fan-out of the summary tree that wrote it
+        }
+
+    def save(self):
+        # Only the themes of this run are kept
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self.current, f, ensure_ascii=False, indent=1)
+        os.replace(self.path + ".tmp", self.path)
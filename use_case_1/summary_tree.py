@@ -0,0 +1,122 @@
+'''
+This module summarizes groups too big for one LLM prompt with a map-reduce tree,
+The parts of a group (ideas or T5 chunk summaries) are packed into prompts that fit the context window,
+Summarized, and the partial summaries merged level by level until one prompt holds them all.
+Every level of every group is sent in one chat_many call, so the levels run in parallel
+And latency grows with the depth of the tree (logarithmic in group size), not with the number of parts.
+=> (groups that already fit are summarized with a single prompt, exactly as before: depth 1.)
+=> (fan-out is the largest number of parts combined in one prompt of the group's tree.)
+=> (no prompt goes over the budget: parts are cut to it, and a part too big to share a prompt gets its own.)
+'''
+
+
+
+
+# Levels after which the remaining partials are merged anyway (the prompt is then cut to the budget)
+max_levels = 8
+
+
+
+
+def estimate_tokens(text, chars_per_token=4):
+    return len(text) // chars_per_token + 1
+
+
+def budget_chars(budget, chars_per_token=4):
+    # Longest text whose estimate still fits the budget
+    return max(budget - 1, 1) * chars_per_token
+
+
+def split_to_budget(text, budget, chars_per_token=4):
+    # A single part bigger than the budget is cut into budget-sized pieces on line/word boundaries
+    size = budget_chars(budget, chars_per_token)
+    pieces = []
+    while len(text) > size:
+        cut = max(text.rfind("\n", 0, size), text.rfind(" ", 0, size))
+        cut = cut if cut > size // 2 else size
+        pieces.append(text[:cut])
+        text = text[cut:].lstrip()
+    return pieces + [text] if text else pieces
+
+
+def fits(parts, budget, chars_per_token=4):
+    # Measured on the prompt text itself, parts joined by newlines
+    return estimate_tokens("\n".join(parts), chars_per_token) <= budget
+
+
+def pack(parts, budget, chars_per_token=4):
+    # Greedy packing in order; a pack never goes over the budget, a part that fills it alone gets its own pack
+    packs, current, current_chars = [], [], 0
+    size = budget_chars(budget, chars_per_token)
+    for part in parts:
+        added = len(part) + (1 if current else 0)
+        if current and current_chars + added > size:
+            packs.append(current)
+            current, current_chars, added = [], 0, len(part)
+        current.append(part)
+        current_chars += added
+    if current:
+        packs.append(current)
+    return packs
+
+
+def reduce_summaries(part_lists, scheduler, summary_prompt, merge_prompt, budget,
+                     summary_version="", merge_version="", chars_per_token=4, tag=""):
+    '''
+    part_lists: the texts of every group. summary_prompt(text) summarizes ideas,
+    merge_prompt(text) merges partial summaries. Returns (summaries, trees), trees[g] = {"depth", "fan_out", "calls"}.
+    '''
+    parts = []
+    for group_parts in part_lists:
+        pieces = []
+        for part in group_parts:
+            pieces.extend(split_to_budget(part, budget, chars_per_token))
+        parts.append(pieces)
+    trees = [{"depth": 0, "fan_out": 0, "calls": 0} for _ in parts]
+    summaries = [None] * len(parts)
+    merged = [False] * len(parts)  # False: parts are raw ideas, True: they are partial summaries
+
+    for level in range(max_levels + 1):
+        final, packs, owners = [], [], []
+        for g, group_parts in enumerate(parts):
+            if summaries[g] is not None:
+                continue
+            if fits(group_parts, budget, chars_per_token) or level == max_levels or len(group_parts) == 1:
+                final.append(g)
+                continue
+            for group_pack in pack(group_parts, budget, chars_per_token):
+                packs.append(group_pack)
+                owners.append(g)
+
+        # One call per level: the last prompt of finished groups and the map/merge prompts of the others
+        texts = ["\n".join(parts[g])[:budget_chars(budget, chars_per_token)] for g in final]
+        texts += ["\n".join(group_pack) for group_pack in packs]
+        too_long = [text for text in texts if estimate_tokens(text, chars_per_token) > budget]
+        if too_long:
+            raise ValueError(f"{len(too_long)} summary prompts exceed the budget of {budget} tokens")
+        prompts = [(merge_prompt if merged[g] else summary_prompt)(text) for g, text in zip(final + owners, texts)]
+        versions = [merge_version if merged[g] else summary_version for g in final + owners]
+        if not prompts:
+            break
+        answers = scheduler.chat_many(prompts, template_version=versions)
+
+        for g, answer in zip(final, answers):
+            summaries[g] = answer
+            trees[g]["depth"] += 1
+            trees[g]["calls"] += 1
+            trees[g]["fan_out"] = max(trees[g]["fan_out"], len(parts[g]))
+
+        next_parts = {}
+        for g, group_pack, answer in zip(owners, packs, answers[len(final):]):
+            next_parts.setdefault(g, []).append(answer)
+            trees[g]["calls"] += 1
+            trees[g]["fan_out"] = max(trees[g]["fan_out"], len(group_pack))
+        for g, partials in next_parts.items():
+            parts[g] = [piece for partial in partials for piece in split_to_budget(partial, budget, chars_per_token)]
+            merged[g] = True
+            trees[g]["depth"] += 1
+        if next_parts:
+            print(f"{tag}🌳 Summary level {level + 1}: {len(packs)} partial summaries for {len(next_parts)} big groups.")
+
+    return summaries, trees
+
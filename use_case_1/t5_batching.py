@@ -0,0 +1,75 @@
+'''
+This module packs ideas into T5-small input windows using real token counts,
+And runs the chunks of every theme through the summarization pipeline in batches.
+=> (ideas longer than one window are split on token boundaries, never truncated.)
+'''
+
+
+
+
+# Room left for tokenizer boundary effects when chunks are re-tokenized as one string
+safety_margin = 8
+
+
+
+
+def input_budget(summarizer):
+    tokenizer = summarizer.tokenizer
+    limit = tokenizer.model_max_length
+    if not limit or limit > 100_000:  # "unlimited" sentinel on some tokenizers
+        limit = 512
+
+    # The summarization pipeline prepends the model's task prefix ("summarize: " for T5)
+    prefix = getattr(summarizer.model.config, "prefix", None) or ""
+    prefix_tokens = len(tokenizer(prefix, add_special_tokens=False)["input_ids"]) if prefix else 0
+    return limit - prefix_tokens - tokenizer.num_special_tokens_to_add() - safety_margin
+
+
+def token_chunks(ideas, tokenizer, budget):
+    if not ideas:
+        return []
+    token_ids = tokenizer(list(ideas), add_special_tokens=False)["input_ids"]
+
+    # Split over-long ideas into window-sized pieces first
+    pieces = []
+    for idea, ids in zip(ideas, token_ids):
+        if len(ids) <= budget:
+            pieces.append((idea, len(ids)))
+            continue
+        for start in range(0, len(ids), budget):
+            window = ids[start:start + budget]
+            pieces.append((tokenizer.decode(window, skip_special_tokens=True), len(window)))
+
+    # Greedily fill each chunk up to the budget
+    chunks, current, current_tokens = [], [], 0
+    for text, n_tokens in pieces:
+        if current and current_tokens + n_tokens > budget:
+            chunks.append("\n".join(current))
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += n_tokens
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def summarize_chunks(summarizer, chunks, batch_size=8, max_length=120, min_length=30):
+    if not chunks:
+        return []
+    options = dict(max_length=max_length, min_length=min_length, do_sample=False, truncation=True)
+
+    try:
+        outputs = summarizer(chunks, batch_size=batch_size, **options)
+        return [output["summary_text"] for output in outputs]
+    except Exception as e:
+        print(f"⚠️ Batched T5 summarization failed ({e}). 🔁 Retrying chunk by chunk...")
+
+    summaries = []
+    for chunk in chunks:
+        try:
+            summaries.append(summarizer(chunk, **options)[0]["summary_text"])
+        except Exception as e:
+            # Keep the whole chunk: the Ollama stage still sees every idea
+            print(f"⚠️ T5 failed on one chunk ({e}); passing it on unsummarized.")
+            summaries.append(chunk)
+    return summaries
@@ -2,6 +2,8 @@
 This script uses the basic ideas data,
 And parses an internal AI API endpoint
 To find similar ideas, and saves into ideas_with_similarities.xlsx.
+=> (mode = "local" links ideas offline with MiniLM embeddings and a top-k neighbour search instead.)
+=> (ideas and similarity edges also go to the columnar ideas_store, which network_viz.py reads.)
 '''
 
 
@@ -9,153 +11,161 @@ To find similar ideas, and saves into ideas_with_similarities.xlsx.
 
 
 import pandas as pd
-import requests
 import re
-import time
 import os
-import pickle
+import sys
 
-# === 1. Load CSV ===
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import ideas_store
+
+# === 1. Config ===
 
 #################
-df = pd.read_csv("")
+input_file = ""  # csv, or a .parquet table
+url = ""
+headers = {}
+cookies = {}
+
+# "api" queries the AI endpoint per idea, "local" uses embeddings + nearest neighbours
+mode = "api"
+
+# api mode: concurrent requests over one pooled session, throttled to the endpoint quota
+api_workers = 4
+api_rate_per_second = 0.66  # requests per second allowed by the endpoint
+api_burst = 1
+api_max_retries = 4  # retries per request after the first attempt, with exponential backoff (429/5xx/connection errors)
+api_retry_rounds = 2  # extra passes over IDs that still failed
+skip_duplicates = True  # ideas folded into a near-duplicate by use_case_1 (ideas_store duplicate_edges) are not queried
+
+# local mode
+embed_model_name = "sentence-transformers/all-MiniLM-L6-v2"
+embedding_cache_dir = "embedding_cache"
+embedding_storage = "float32"  # "float16" or "int8" => smaller cache, see use_case_1/embedding_cache.py
+embedding_memmap = True  # search reads the memory-mapped cache in row blocks instead of one in-RAM matrix
+local_top_k = 5
+local_min_score = 0.6
+local_search = "auto"  # "brute", "approx" (needs hnswlib) or "auto" (approx above local_approx_threshold ideas, brute force if hnswlib is missing)
+local_approx_threshold = 20000
 #################
 
-df['ID'] = df['ID'].astype(str)
-id_to_idea = dict(zip(df['ID'], df['Idea Name']))
-df["Similar Idea IDs"] = ""  # New column for results
+output_file = "ideas_with_similarities.xlsx"
+checkpoint_db = "similarity_checkpoint.sqlite"
+legacy_results_pickle = "results_checkpoint.pkl"  # imported once into checkpoint_db if present
 
-# === 2. Auth Headers & Cookies ===
 
-##################
-url = ""
-##################
-
-processed_log = "processed_ids.txt"
-results_pickle = "results_checkpoint.pkl"
-
-# === 3. Load processed log ===
-processed_ids = set()
-if os.path.exists(processed_log):
-    with open(processed_log, 'r') as f:
-        processed_ids = set(line.strip() for line in f)
-
-# === 4. Load checkpointed results ===
-if os.path.exists(results_pickle):
-    with open(results_pickle, 'rb') as f:
-        saved_results = pickle.load(f)
-        for idea_id, similar_ids in saved_results.items():
-            df.loc[df['ID'] == idea_id, "Similar Idea IDs"] = ", ".join(similar_ids)
-else:
-    saved_results = {}
-
-# === 5. Main Loop ===
-save_every = 10
-processed_this_run = 0
-
-# for idx, row in df.iterrows():
-#     idea_id = str(row['ID'])
-#     if idea_id in processed_ids:
-#         continue
-
-#     name = row['Idea Name']
-#     desc = row['Description']
-
-#     query = f"find ideas similar to {name}. with description of {desc}"
-#     params = {"q": query, "messages": "false"}
-
-#     try:
-#         response = requests.get(url, headers=headers, cookies=cookies, params=params, verify=False)
-#         response.raise_for_status()
-#         content = response.json().get("content", "")
-
-#         # Extract valid similar idea IDs
-#         # suggested_ids = re.findall(r"Idea (\d{3,5})", content)
-#         suggested_ids = re.findall(r'idea[^\d]*(\d{3,5})', content, flags=re.IGNORECASE)
-#         valid_similar_ids = [sid for sid in suggested_ids if sid in id_to_idea]
-
-#         # Store in DataFrame and checkpoint
-#         df.at[idx, "Similar Idea IDs"] = ", ".join(valid_similar_ids)
-#         saved_results[idea_id] = valid_similar_ids
-
-#         # Update processed log
-#         with open(processed_log, 'a') as f:
-#             f.write(f"{idea_id}\n")
-#         processed_this_run += 1
-
-#         print(f"✅ Processed {idea_id}: {len(valid_similar_ids)} similar ideas")
-
-#         # Save checkpoint every N
-#         if processed_this_run % save_every == 0:
-#             with open(results_pickle, 'wb') as f:
-#                 pickle.dump(saved_results, f)
-#             print("💾 Saved checkpoint.")
-
-#     except Exception as e:
-#         print(f"❌ Failed at ID {idea_id}: {e}")
-#         break
-
-#     time.sleep(1.5)
-
-max_retries = 3
-retry_delay = 5  # seconds
-
-for idx, row in df.iterrows():
-    idea_id = str(row['ID'])
-    if idea_id in processed_ids:
-        continue
-
-    name = row['Idea Name']
-    desc = row['Description']
-
-    query = f"find ideas similar to {name}. with description of {desc}"
-    params = {"q": query, "messages": "false"}
-
-    content = ""
-    success = False  # track if request succeeds
-
-    for attempt in range(max_retries):
-        try:
-            response = requests.get(url, headers=headers, cookies=cookies, params=params, verify=False)
-            response.raise_for_status()
-            content = response.json().get("content", "")
-            success = True
-            break  # exit retry loop
-        except requests.exceptions.RequestException as e:
-            print(f"⚠️ Attempt {attempt+1} failed for ID {idea_id}: {e}")
-            if attempt < max_retries - 1:
-                print(f"🔁 Retrying in {retry_delay} seconds...")
-                time.sleep(retry_delay)
-            else:
-                print(f"❌ Failed after {max_retries} attempts at ID {idea_id}. Stopping script.")
-                break  # exit retry loop
-
-    if not success:
-        break  # ❗Stop outer loop if all retries failed
-
-    # Extract valid similar idea IDs
+
+
+# === 2. Load CSV ===
+def load_ideas(path=input_file):
+    df = pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path)
+    df['ID'] = df['ID'].astype(str)
+    df["Similar Idea IDs"] = ""  # New column for results
+    return df
+
+
+# === 3. Local mode: embeddings + top-k neighbours ===
+def link_locally(df):
+    # Reuse the content-hashed embedding store of use_case_1
+    from use_case_1.embedding_cache import encode_with_cache
+    from similarity_engine import find_similar
+
+    texts = (df['Idea Name'].astype(str) + ": " + df['Description'].astype(str)).tolist()
+    embeddings = encode_with_cache(texts, embed_model_name, cache_dir=embedding_cache_dir,
+                                   storage=embedding_storage, as_matrix=embedding_memmap, ids=df['ID'])
+
+    neighbours, scores = find_similar(
+        embeddings,
+        k=local_top_k,
+        min_score=local_min_score,
+        method=local_search,
+        approx_threshold=local_approx_threshold,
+        with_scores=True,
+    )
+    ids = df['ID'].to_numpy()
+    edges = ideas_store.edges_from_lists(ids, [ids[rows].tolist() for rows in neighbours], scores, kind="local")
+    df["Similar Idea IDs"] = ideas_store.similar_strings(ids, edges)
+    print(f"✅ Linked {len(df)} ideas locally ({len(edges)} links).")
+    return df, edges
+
+
+# === 4. API mode: concurrent requests, with checkpoints ===
+def extract_similar_ids(content, id_to_idea):
+    # suggested_ids = re.findall(r"Idea (\d{3,5})", content)
     suggested_ids = re.findall(r'idea[^\d]*(\d{3,5})', content, flags=re.IGNORECASE)
-    valid_similar_ids = [sid for sid in suggested_ids if sid in id_to_idea]
+    return [sid for sid in suggested_ids if sid in id_to_idea]
+
+
+def link_with_api(df, url=url, workers=api_workers, rate_per_second=api_rate_per_second):
+    from similarity_client import SimilarityClient
+    from checkpoint_store import CheckpointStore
+
+    id_to_idea = dict(zip(df['ID'], df['Idea Name']))
+
+    # Resume: one join of the journal back onto the DataFrame
+    store = CheckpointStore(checkpoint_db)
+    store.import_legacy(legacy_results_pickle)
+    df = store.apply(df)
+    processed_ids = store.processed_ids()
+    print(f"💾 Resumed {len(processed_ids)} processed ideas from '{checkpoint_db}'.")
+
+    todo = df[~df['ID'].isin(processed_ids)]
+    if skip_duplicates and ideas_store.has_table("duplicate_edges"):
+        duplicate_ids = ideas_store.read_table("duplicate_edges", columns=["target"])["target"].astype(str)
+        todo = todo[~todo['ID'].isin(duplicate_ids)]
+        print(f"🧹 Skipping {int(df['ID'].isin(duplicate_ids).sum())} near-duplicate ideas.")
+    queries = "find ideas similar to " + todo['Idea Name'].astype(str) + ". with description of " + todo['Description'].astype(str)
+    pending = list(zip(todo['ID'], queries))
+
+    def on_result(idea_id, content):
+        # Journal each result as it arrives; the DataFrame is filled by one join at the end
+        valid_similar_ids = extract_similar_ids(content, id_to_idea)
+        store.record(idea_id, valid_similar_ids)
+        print(f"✅ Processed {idea_id}: {len(valid_similar_ids)} similar ideas")
+
+    client = SimilarityClient(
+        url,
+        headers=headers,
+        cookies=cookies,
+        rate_per_second=rate_per_second,
+        burst=api_burst,
+        workers=workers,
+        max_retries=api_max_retries,
+    )
+    failed_ids = client.fetch_many(pending, on_result, retry_rounds=api_retry_rounds)
+    client.close()
+
+    df = store.apply(df)
+    store.close()
+
+    # The journal keeps the endpoint's answers as text; split them into typed edges once, here
+    similar_lists = df["Similar Idea IDs"].fillna("").map(lambda s: [x.strip() for x in s.split(",") if x.strip()])
+    edges = ideas_store.edges_from_lists(df['ID'], similar_lists, kind="api")
+    if failed_ids:
+        print(f"❌ {len(failed_ids)} IDs still failing; they stay unprocessed and are retried on the next run.")
+
+    return df, edges
+
+
+
+
+def main():
+    # Settings are read when main runs, so ideas_cli.py can set them from flags or a config file
+    df = load_ideas(input_file)
 
-    # Store in DataFrame and checkpoint
-    df.at[idx, "Similar Idea IDs"] = ", ".join(valid_similar_ids)
-    saved_results[idea_id] = valid_similar_ids
+    if mode == "local":
+        df, edges = link_locally(df)
+    else:
+        df, edges = link_with_api(df, url=url, workers=api_workers, rate_per_second=api_rate_per_second)
 
-    # Update processed log
-    with open(processed_log, 'a') as f:
-        f.write(f"{idea_id}\n")
-    processed_this_run += 1
+    # === 5. Final Save: columnar tables for the scripts, Excel as the export ===
+    ideas_store.write_table(df.drop(columns=["Similar Idea IDs"]), "linked_ideas")
+    ideas_store.write_table(edges, "similarity_edges")
+    df.to_excel(output_file, index=False)
+    print(f"✅ Done. File saved as '{output_file}'")
+    return df, edges
 
-    print(f"✅ Processed {idea_id}: {len(valid_similar_ids)} similar ideas")
 
-    # Save checkpoint every N
-    if processed_this_run % save_every == 0:
-        with open(results_pickle, 'wb') as f:
-            pickle.dump(saved_results, f)
-        print("💾 Saved checkpoint.")
 
-    time.sleep(1.5)
 
-# === 6. Final Save ===
-df.to_excel("ideas_with_similarities.xlsx", index=False)
-print("✅ Done. File saved as 'ideas_with_similarities.xlsx'")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+'''
+This module journals AI_parser results in SQLite as they arrive,
+One atomic, append-only write per idea (constant cost, whatever the run size),
+And resumes with a single vectorized join back onto the ideas DataFrame.
+=> (replaces processed_ids.txt + results_checkpoint.pkl; those are imported once if found.)
+'''
+
+
+
+
+import os
+import pickle
+import sqlite3
+import time
+
+import pandas as pd
+
+
+
+
+class CheckpointStore:
+    def __init__(self, path="similarity_checkpoint.sqlite"):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "id TEXT PRIMARY KEY, similar_ids TEXT NOT NULL, processed_at REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def record(self, idea_id, similar_ids):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?)",
+                (str(idea_id), ", ".join(similar_ids), time.time()),
+            )
+
+    def processed_ids(self):
+        return {row[0] for row in self.conn.execute("SELECT id FROM results")}
+
+    def load(self):
+        return pd.read_sql_query('SELECT id AS "ID", similar_ids AS "Similar Idea IDs" FROM results', self.conn)
+
+    def apply(self, df):
+        results = self.load()
+        if results.empty:
+            return df
+        found = df['ID'].map(results.set_index('ID')["Similar Idea IDs"])
+        df["Similar Idea IDs"] = found.fillna(df["Similar Idea IDs"])
+        return df
+
+    def import_legacy(self, results_pickle="results_checkpoint.pkl"):
+        # Only results that made it into the pickle are kept; IDs in processed_ids.txt after the last dump are redone
+        if len(self) or not os.path.exists(results_pickle):
+            return 0
+        with open(results_pickle, 'rb') as f:
+            saved_results = pickle.load(f)
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?)",
+                ((str(idea_id), ", ".join(similar_ids), now) for idea_id, similar_ids in saved_results.items()),
+            )
+        print(f"💾 Imported {len(saved_results)} results from legacy checkpoint '{results_pickle}'.")
+        return len(saved_results)
+
+    def close(self):
+        self.conn.close()
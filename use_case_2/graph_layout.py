@@ -0,0 +1,153 @@
+'''
+This module computes the idea network layout and persists it,
+Next to ideas_with_similarities.xlsx and keyed by the graph content.
+When the graph only gained nodes, the saved positions are pinned
+And only the new nodes are placed (spring_layout seeded with pos= and fixed=);
+New groups with no placed neighbour are laid out on their own, below the existing picture.
+=> (method = "fast" lays out each connected component on its own and packs them, for large graphs.)
+'''
+
+
+
+
+import hashlib
+import json
+import math
+import os
+
+import networkx as nx
+
+
+
+
+def graph_key(G):
+    digest = hashlib.sha1()
+    for node in sorted(G.nodes()):
+        digest.update(f"n{node}\n".encode("utf-8"))
+    for u, v in sorted(tuple(sorted(edge)) for edge in G.edges()):
+        digest.update(f"e{u}\t{v}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def layout_path(data_path):
+    return os.path.splitext(data_path)[0] + ".layout.json"
+
+
+def load_layout(path):
+    if not os.path.exists(path):
+        return None, {}
+    with open(path, "r") as f:
+        saved = json.load(f)
+    return saved["key"], {node: tuple(xy) for node, xy in saved["positions"].items()}
+
+
+def save_layout(path, key, pos):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"key": key, "positions": {node: [float(x), float(y)] for node, (x, y) in pos.items()}}, f)
+    os.replace(tmp_path, path)
+
+
+def component_layout(G, seed=42, k=0.5):
+    # Lay out every connected component separately, then shelf-pack them biggest first
+    components = sorted(nx.connected_components(G), key=len, reverse=True)
+    row_width = 1.2 * math.sqrt(max(G.number_of_nodes(), 1))
+    pos = {}
+    cursor_x, cursor_y, row_height = 0.0, 0.0, 0.0
+
+    for component in components:
+        side = math.sqrt(len(component))
+        if cursor_x and cursor_x + side > row_width:
+            cursor_x, cursor_y, row_height = 0.0, cursor_y - row_height, 0.0
+
+        if len(component) == 1:
+            local = {next(iter(component)): (0.0, 0.0)}
+        else:
+            subgraph = G.subgraph(component)
+            iterations = 50 if len(component) < 1000 else 20
+            local = nx.spring_layout(subgraph, seed=seed, k=k / math.sqrt(side), iterations=iterations)
+
+        center_x, center_y = cursor_x + side / 2, cursor_y - side / 2
+        for node, (x, y) in local.items():
+            pos[node] = (center_x + 0.45 * side * x, center_y + 0.45 * side * y)
+        cursor_x += side
+        row_height = max(row_height, side)
+
+    return {node: tuple(xy) for node, xy in nx.rescale_layout_dict(pos).items()} if pos else pos
+
+
+def full_layout(G, method="spring", seed=42, k=0.5):
+    if method == "fast":
+        return component_layout(G, seed=seed, k=k)
+    return nx.spring_layout(G, seed=seed, k=k)
+
+
+def place_new_nodes(G, saved_pos, seed=42, k=0.5):
+    new_nodes = [node for node in G.nodes() if node not in saved_pos]
+    pos = {node: saved_pos[node] for node in G.nodes() if node in saved_pos}
+    xs = [x for x, _ in pos.values()] or [0.0]
+    ys = [y for _, y in pos.values()] or [0.0]
+    width = max(xs) - min(xs) or 1.0
+
+    # Only new nodes and their already placed neighbours take part; the neighbours stay pinned
+    anchors = {nbr for node in new_nodes for nbr in G.neighbors(node) if nbr in pos}
+    linked_new = [node for node in new_nodes if G.degree(node) > 0]
+    anchored, floating = set(), []
+    for component in nx.connected_components(G.subgraph(set(linked_new) | anchors)):
+        if component & anchors:
+            anchored |= component
+        else:
+            floating.append(component)  # new ideas linked only to each other
+    if anchored:
+        placed = nx.spring_layout(
+            G.subgraph(anchored),
+            seed=seed,
+            k=k,
+            pos={node: pos[node] for node in anchors},
+            fixed=list(anchors),
+            iterations=50,
+        )
+        pos.update({node: tuple(placed[node]) for node in anchored - anchors})
+
+    # Groups with no placed neighbour get their own layout, side by side on a row below the existing picture
+    if floating:
+        cell = min(width / len(floating), width / 4)
+        top = min(ys) - 0.1
+        for i, component in enumerate(sorted(floating, key=len, reverse=True)):
+            local = nx.spring_layout(G.subgraph(component), seed=seed, k=k)
+            center_x, center_y = min(xs) + (i + 0.5) * cell, top - cell / 2
+            for node, (x, y) in local.items():
+                pos[node] = (center_x + 0.45 * cell * x, center_y + 0.45 * cell * y)
+        ys = [y for _, y in pos.values()]
+
+    # Unlinked new ideas go on a row below that
+    unlinked = [node for node in new_nodes if node not in pos]
+    if unlinked:
+        step = width / max(len(unlinked), 1)
+        for i, node in enumerate(unlinked):
+            pos[node] = (min(xs) + i * step, min(ys) - 0.1)
+
+    return pos, len(new_nodes)
+
+
+def load_or_compute_layout(G, data_path, method="auto", fast_threshold=3000, seed=42, k=0.5):
+    if method == "auto":
+        method = "fast" if G.number_of_nodes() > fast_threshold else "spring"
+
+    path = layout_path(data_path)
+    key = graph_key(G)
+    saved_key, saved_pos = load_layout(path)
+
+    if saved_key == key and len(saved_pos) == G.number_of_nodes():
+        print(f"💾 Reused saved layout from '{path}'.")
+        return saved_pos
+
+    if saved_pos and all(node in G for node in saved_pos):
+        pos, n_new = place_new_nodes(G, saved_pos, seed=seed, k=k)
+        print(f"🧭 Placed {n_new} new nodes around the saved layout.")
+    else:
+        pos = full_layout(G, method=method, seed=seed, k=k)
+        print(f"🧭 Computed a full {method} layout for {G.number_of_nodes()} nodes.")
+
+    save_layout(path, key, pos)
+    return pos
@@ -1,15 +1,30 @@
 '''
 This script enables interactive visualisation of related ideas,
 From the file ideas_with_similarities.xlsx.
+=> (hover texts, coordinates and edge arrays are built once; a click only patches the highlight.)
+=> (large graphs switch to WebGL traces with per-community aggregate nodes that expand on zoom/click.)
+=> (reads the columnar ideas_store tables written by AI_parser.py, the Excel file is the fallback.)
+=> (nothing runs on import: build_network() loads the data and precomputes, build_app() makes the Dash app.)
+=> (near-duplicate groups found by use_case_1 (ideas_store duplicate_edges) are drawn as links too.)
 '''
 
 
 
 
+import os
+import sys
+from types import SimpleNamespace
+
+import numpy as np
 import pandas as pd
 import networkx as nx
 import plotly.graph_objs as go
-from dash import Dash, dcc, html, Input, Output
+from dash import Dash, dcc, html, Input, Output, State, Patch, ctx
+
+from graph_layout import load_or_compute_layout
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import ideas_store
 
 
 
@@ -17,35 +32,40 @@ from dash import Dash, dcc, html, Input, Output
 ##################
 # Ctrl + F => https://ideas.xyz.com/idea/{idea_id}
 # and change it like you need
-##################
 
+data_file = "ideas_with_similarities.xlsx"
 
+# "spring", "fast" (per-component, for large graphs) or "auto" (fast above layout_fast_threshold nodes)
+layout_method = "auto"
+layout_fast_threshold = 3000
 
+# Large-graph mode: True, False or "auto" (above large_graph_threshold nodes)
+large_graph_mode = "auto"
+large_graph_threshold = 3000
+max_visible_nodes = 2000  # zoomed in to at most this many ideas => show them individually
+##################
 
 
-# === 1. Load Data ===
-df = pd.read_excel("ideas_with_similarities.xlsx")
-df['ID'] = df['ID'].astype(str)
 
-# Build lookup
-idea_info = df.set_index('ID')[['Idea Name', 'Description', 'Votes', 'Idea Comments']].to_dict(orient='index')
 
-# === 2. Build Graph ===
-G = nx.Graph()
-for idea_id in df['ID']:
-    G.add_node(idea_id)
 
-for _, row in df.iterrows():
-    source = row['ID']
-    if pd.isna(row['Similar Idea IDs']) or row['Similar Idea IDs'].strip() == "":
-        continue
-    similar_ids = [x.strip() for x in row['Similar Idea IDs'].split(",")]
-    for target in similar_ids:
-        if target in G.nodes and source != target:
-            G.add_edge(source, target)
+# Trace positions in the figure, used by the patches
+EDGES, HIGHLIGHT_EDGES, NODES, GROUPS = 0, 1, 2, 3
+BASE_COLOR = "LightSkyBlue"
 
-# === 3. Layout ===
-pos = nx.spring_layout(G, seed=42, k=0.5)
+info_columns = ['ID', 'Idea Name', 'Description', 'Votes', 'Idea Comments']
+
+figure_layout = go.Layout(
+    title="Idea Similarity Network",
+    title_x=0.5,
+    showlegend=False,
+    hovermode='closest',
+    margin=dict(b=20, l=5, r=5, t=40),
+    xaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
+    yaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
+    dragmode='pan',
+    uirevision='network'  # keep zoom/pan across patches
+)
 
 def wrap_text(text, width=80):
     if not isinstance(text, str):
@@ -63,116 +83,110 @@ def wrap_text(text, width=80):
         lines.append(current_line)
     return "<br>".join(lines)
 
-def generate_figure(highlight_node=None):
-    connected_nodes = set()
-    highlight_edges_x, highlight_edges_y = [], []
-    normal_edges_x, normal_edges_y = [], []
-
-    if highlight_node:
-        connected_nodes = set(G.neighbors(highlight_node))
-
-    for u, v in G.edges():
-        x0, y0 = pos[u]
-        x1, y1 = pos[v]
-        coords = [x0, x1, None], [y0, y1, None]
-        if highlight_node and (u == highlight_node or v == highlight_node):
-            highlight_edges_x.extend(coords[0])
-            highlight_edges_y.extend(coords[1])
-        else:
-            normal_edges_x.extend(coords[0])
-            normal_edges_y.extend(coords[1])
-
-    normal_edge_trace = go.Scatter(
-        x=normal_edges_x,
-        y=normal_edges_y,
-        mode='lines',
-        line=dict(width=1, color='#888'),
-        hoverinfo='none'
-    )
-
-    highlight_edge_trace = go.Scatter(
-        x=highlight_edges_x,
-        y=highlight_edges_y,
-        mode='lines',
-        line=dict(width=2, color='red'),
-        hoverinfo='none'
-    )
-
-    node_x, node_y, hover_texts, colors, customdata = [], [], [], [], []
-    for node in G.nodes():
-        x, y = pos[node]
-        node_x.append(x)
-        node_y.append(y)
-
+# === 1. Load Data ===
+def load_ideas_and_edges(data_file=data_file):
+    if ideas_store.has_table("linked_ideas") and ideas_store.has_table("similarity_edges"):
+        df = ideas_store.read_table("linked_ideas", columns=info_columns)
+        df['ID'] = df['ID'].astype(str)
+        edges = ideas_store.read_table("similarity_edges", columns=["source", "target"])
+    else:
+        # Excel export: split the comma-joined column into edges once
+        df = pd.read_excel(data_file)
+        df['ID'] = df['ID'].astype(str)
+        similar_lists = df['Similar Idea IDs'].fillna("").astype(str).map(lambda s: [x.strip() for x in s.split(",") if x.strip()])
+        edges = ideas_store.edges_from_lists(df['ID'], similar_lists)
+    if ideas_store.has_table("duplicate_edges"):
+        duplicates = ideas_store.read_table("duplicate_edges", columns=["source", "target"])
+        edges = pd.concat([edges[["source", "target"]], duplicates], ignore_index=True)
+    return df, edges
+
+
+def build_network(data_file=data_file, layout_method=layout_method, layout_fast_threshold=layout_fast_threshold,
+                  large_graph_mode=large_graph_mode, large_graph_threshold=large_graph_threshold,
+                  max_visible_nodes=max_visible_nodes):
+    df, edges = load_ideas_and_edges(data_file)
+
+    # Build lookup
+    idea_info = df.set_index('ID')[info_columns[1:]].to_dict(orient='index')
+    similar_by_id = dict(zip(df['ID'], ideas_store.similar_strings(df['ID'], edges)))
+
+    # === 2. Build Graph ===
+    G = nx.Graph()
+    G.add_nodes_from(df['ID'])
+
+    known = edges['source'].isin(df['ID']) & edges['target'].isin(df['ID']) & (edges['source'] != edges['target'])
+    G.add_edges_from(zip(edges.loc[known, 'source'].astype(str), edges.loc[known, 'target'].astype(str)))
+
+    # === 3. Layout (saved next to the data file; only new nodes are placed when the graph grows) ===
+    pos = load_or_compute_layout(G, data_file, method=layout_method, fast_threshold=layout_fast_threshold, seed=42, k=0.5)
+
+    # === 4. Precompute node and edge arrays (once, O(N + E)) ===
+    nodes = list(G.nodes())
+    node_index = {node: i for i, node in enumerate(nodes)}
+    node_x = np.array([pos[node][0] for node in nodes], dtype=float)
+    node_y = np.array([pos[node][1] for node in nodes], dtype=float)
+
+    def hover_text(node):
         info = idea_info.get(node, {})
         idea = wrap_text(info.get("Idea Name", ""), 80)
         desc = wrap_text(info.get("Description", ""), 80)
-        similar = df.loc[df["ID"] == node, "Similar Idea IDs"].values
-        similar_str = similar[0] if len(similar) > 0 and isinstance(similar[0], str) else "None"
-
-        hover_texts.append(
-            f"<b>ID:</b> {node}<br><b>Idea:</b> {idea}<br><b>Description:</b> {desc}<br><b>Similar Idea IDs:</b> {similar_str}"
+        similar = similar_by_id.get(node)
+        similar_str = similar if similar else "None"
+        return f"<b>ID:</b> {node}<br><b>Idea:</b> {idea}<br><b>Description:</b> {desc}<br><b>Similar Idea IDs:</b> {similar_str}"
+
+    hover_texts = [hover_text(node) for node in nodes]
+
+    def segment_arrays(sources, targets, xs=None, ys=None):
+        # x0, x1, gap for every edge; NaN breaks the line between segments
+        xs = node_x if xs is None else xs
+        ys = node_y if ys is None else ys
+        gap = np.full(len(sources), np.nan)
+        seg_x = np.column_stack([xs[sources], xs[targets], gap]).ravel()
+        seg_y = np.column_stack([ys[sources], ys[targets], gap]).ravel()
+        return seg_x, seg_y
+
+    edge_u = np.array([node_index[u] for u, v in G.edges()], dtype=np.int64)
+    edge_v = np.array([node_index[v] for u, v in G.edges()], dtype=np.int64)
+    edge_x, edge_y = segment_arrays(edge_u, edge_v)
+
+    def neighbour_indices(idea_id):
+        return np.array([node_index[n] for n in G.neighbors(idea_id)], dtype=np.int64)
+
+    def generate_figure():
+        normal_edge_trace = go.Scatter(
+            x=edge_x,
+            y=edge_y,
+            mode='lines',
+            line=dict(width=1, color='#888'),
+            hoverinfo='none'
         )
-        customdata.append(node)
 
-        if node == highlight_node:
-            colors.append("red")
-        elif node in connected_nodes:
-            colors.append("yellow")
-        else:
-            colors.append("LightSkyBlue")
-
-    node_trace = go.Scatter(
-        x=node_x, y=node_y,
-        mode='markers',
-        hoverinfo='text',
-        hovertext=hover_texts,
-        customdata=customdata,
-        marker=dict(
-            size=20,
-            color=colors,
-            line=dict(width=2, color='DarkSlateGrey')
+        highlight_edge_trace = go.Scatter(
+            x=[],
+            y=[],
+            mode='lines',
+            line=dict(width=2, color='red'),
+            hoverinfo='none'
         )
-    )
 
-    fig = go.Figure(
-        data=[normal_edge_trace, highlight_edge_trace, node_trace],
-        layout=go.Layout(
-            title="Idea Similarity Network",
-            title_x=0.5,
-            showlegend=False,
-            hovermode='closest',
-            margin=dict(b=20, l=5, r=5, t=40),
-            xaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
-            yaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
-            dragmode='pan'
+        node_trace = go.Scatter(
+            x=node_x, y=node_y,
+            mode='markers',
+            hoverinfo='text',
+            hovertext=hover_texts,
+            customdata=nodes,
+            marker=dict(
+                size=20,
+                color=[BASE_COLOR] * len(nodes),
+                line=dict(width=2, color='DarkSlateGrey')
+            )
         )
-    )
-    return fig
 
+        return go.Figure(data=[normal_edge_trace, highlight_edge_trace, node_trace], layout=figure_layout)
 
-# === Dash App ===
-app = Dash(__name__)
-
-app.layout = html.Div([
-    html.Div(id='selected-idea-card', style={
-        'position': 'absolute', 'top': '10px', 'left': '10px', 'zIndex': 10,
-        'backgroundColor': '#f9f9f9', 'padding': '10px', 'border': '1px solid #ccc',
-        'borderRadius': '5px', 'boxShadow': '2px 2px 8px rgba(0,0,0,0.1)', 'maxWidth': '320px'
-    }),
-    dcc.Graph(id='network-graph', figure=generate_figure(), style={'height': '90vh'}),
-])
-
-@app.callback(
-    Output('network-graph', 'figure'),
-    Output('selected-idea-card', 'children'),
-    Input('network-graph', 'clickData')
-)
-def update_on_click(clickData):
-    if clickData and clickData['points']:
-        idea_id = clickData['points'][0]['customdata']
+    def idea_card(idea_id):
         info = idea_info.get(idea_id, {})
-        card = html.Div([
+        return html.Div([
             html.H4(f"Idea ID: {idea_id}"),
             html.P(info.get("Idea Name", ""), style={'whiteSpace': 'pre-wrap', 'maxWidth': '300px'}),
             html.P(f"Votes: {info.get('Votes', 'N/A')}"),
@@ -182,8 +196,213 @@ def update_on_click(clickData):
                           'backgroundColor': '#007bff', 'color': 'white', 'padding': '5px 10px',
                           'borderRadius': '5px'})
         ])
-        return generate_figure(highlight_node=idea_id), card
-    return generate_figure(), None
+
+    def click_patch(idea_id, previous):
+        # Only the highlight trace and the colours of the touched nodes are sent to the browser
+        patched = Patch()
+        for i in previous or []:
+            patched["data"][NODES]["marker"]["color"][i] = BASE_COLOR
+
+        if idea_id in node_index:
+            center = node_index[idea_id]
+            neighbours = neighbour_indices(idea_id)
+
+            xs, ys = segment_arrays(np.full(len(neighbours), center), neighbours)
+            patched["data"][HIGHLIGHT_EDGES]["x"] = xs.tolist()
+            patched["data"][HIGHLIGHT_EDGES]["y"] = ys.tolist()
+            for i in neighbours.tolist():
+                patched["data"][NODES]["marker"]["color"][i] = "yellow"
+            patched["data"][NODES]["marker"]["color"][center] = "red"
+            return patched, idea_card(idea_id), [center] + neighbours.tolist()
+
+        patched["data"][HIGHLIGHT_EDGES]["x"] = []
+        patched["data"][HIGHLIGHT_EDGES]["y"] = []
+        return patched, None, []
+
+    network = SimpleNamespace(
+        df=df, G=G, nodes=nodes, node_index=node_index, large_mode=False, full_range=None,
+        segment_arrays=segment_arrays, neighbour_indices=neighbour_indices,
+        generate_figure=generate_figure, idea_card=idea_card, click_patch=click_patch,
+    )
+
+    # === 5. Large-graph mode: communities as aggregate nodes, WebGL traces, only what is visible ===
+    network.large_mode = len(nodes) > large_graph_threshold if large_graph_mode == "auto" else bool(large_graph_mode)
+    if not network.large_mode:
+        return network
+
+    communities = nx.community.louvain_communities(G, seed=42)
+    community_of = np.empty(len(nodes), dtype=np.int64)
+    for c, members in enumerate(communities):
+        community_of[[node_index[n] for n in members]] = c
+    community_size = np.bincount(community_of, minlength=len(communities))
+    community_x = np.bincount(community_of, weights=node_x, minlength=len(communities)) / community_size
+    community_y = np.bincount(community_of, weights=node_y, minlength=len(communities)) / community_size
+
+    # One aggregate edge per linked pair of communities
+    pairs = np.sort(np.column_stack([community_of[edge_u], community_of[edge_v]]), axis=1)
+    pairs = np.unique(pairs[pairs[:, 0] != pairs[:, 1]], axis=0).reshape(-1, 2)
+    community_edge_u, community_edge_v = pairs[:, 0], pairs[:, 1]
+
+    community_hover = []
+    for c, members in enumerate(communities):
+        names = [wrap_text(str(idea_info.get(n, {}).get("Idea Name", "")), 80) for n in list(members)[:3]]
+        community_hover.append(f"<b>Group {c}</b> ({len(members)} ideas)<br>" + "<br>".join(names) + "<br><i>Click or zoom in to expand</i>")
+    community_hover = np.array(community_hover, dtype=object)
+    hover_array = np.array(hover_texts, dtype=object)
+    node_array = np.array(nodes, dtype=object)
+    full_range = [
+        [float(node_x.min()) - 0.05, float(node_x.max()) + 0.05],
+        [float(node_y.min()) - 0.05, float(node_y.max()) + 0.05],
+    ]
+
+    def render_view(x_range, y_range, expanded, selected):
+        (x0, x1), (y0, y1) = sorted(x_range), sorted(y_range)
+        in_view = (node_x >= x0) & (node_x <= x1) & (node_y >= y0) & (node_y <= y1)
+        detail = int(in_view.sum()) <= max_visible_nodes
+
+        # Individual ideas: everything in view when zoomed in, otherwise only expanded communities
+        if detail:
+            show = in_view.copy()
+            show_groups = np.zeros(len(communities), dtype=bool)
+        else:
+            is_expanded = np.zeros(len(communities), dtype=bool)
+            is_expanded[expanded] = True
+            show = in_view & is_expanded[community_of]
+            show_groups = ~is_expanded & (community_x >= x0) & (community_x <= x1) & (community_y >= y0) & (community_y <= y1)
+
+        colors = {}
+        highlight_x, highlight_y = np.array([]), np.array([])
+        if selected in node_index:
+            center, neighbours = node_index[selected], neighbour_indices(selected)
+            show[center] = True
+            show[neighbours] = True
+            colors.update({int(i): "yellow" for i in neighbours})
+            colors[center] = "red"
+            highlight_x, highlight_y = segment_arrays(np.full(len(neighbours), center), neighbours)
+
+        shown = np.flatnonzero(show)
+        edge_mask = show[edge_u] & show[edge_v] if not detail else show[edge_u] | show[edge_v]
+        lines_x, lines_y = segment_arrays(edge_u[edge_mask], edge_v[edge_mask])
+        group_edge_mask = show_groups[community_edge_u] & show_groups[community_edge_v]
+        group_x, group_y = segment_arrays(community_edge_u[group_edge_mask], community_edge_v[group_edge_mask],
+                                          community_x, community_y)
+        groups = np.flatnonzero(show_groups)
+
+        return {
+            EDGES: dict(x=np.concatenate([lines_x, group_x]).tolist(), y=np.concatenate([lines_y, group_y]).tolist()),
+            HIGHLIGHT_EDGES: dict(x=highlight_x.tolist(), y=highlight_y.tolist()),
+            NODES: dict(
+                x=node_x[shown].tolist(), y=node_y[shown].tolist(),
+                hovertext=hover_array[shown].tolist(), customdata=node_array[shown].tolist(),
+                marker=dict(size=12, color=[colors.get(int(i), BASE_COLOR) for i in shown],
+                            line=dict(width=1, color='DarkSlateGrey')),
+            ),
+            GROUPS: dict(
+                x=community_x[groups].tolist(), y=community_y[groups].tolist(),
+                hovertext=community_hover[groups].tolist(), customdata=[f"group:{c}" for c in groups],
+                marker=dict(size=(8 + 4 * np.sqrt(community_size[groups])).tolist(), color='MediumPurple',
+                            line=dict(width=1, color='DarkSlateGrey')),
+            ),
+        }
+
+    def generate_large_figure():
+        view = render_view(full_range[0], full_range[1], [], None)
+        edge_trace = go.Scattergl(mode='lines', line=dict(width=1, color='#888'), hoverinfo='none', **view[EDGES])
+        highlight_edge_trace = go.Scattergl(mode='lines', line=dict(width=2, color='red'), hoverinfo='none', **view[HIGHLIGHT_EDGES])
+        node_trace = go.Scattergl(mode='markers', hoverinfo='text', **view[NODES])
+        group_trace = go.Scattergl(mode='markers', hoverinfo='text', **view[GROUPS])
+        fig = go.Figure(data=[edge_trace, highlight_edge_trace, node_trace, group_trace], layout=figure_layout)
+        fig.update_layout(xaxis_range=full_range[0], yaxis_range=full_range[1])
+        return fig
+
+    def view_ranges(relayout, state):
+        x_range, y_range = state["x_range"], state["y_range"]
+        if relayout.get("xaxis.autorange") or relayout.get("autosize"):
+            return full_range[0], full_range[1]
+        if "xaxis.range[0]" in relayout:
+            x_range = [relayout["xaxis.range[0]"], relayout["xaxis.range[1]"]]
+        if "yaxis.range[0]" in relayout:
+            y_range = [relayout["yaxis.range[0]"], relayout["yaxis.range[1]"]]
+        return x_range, y_range
+
+    network.full_range = full_range
+    network.render_view = render_view
+    network.generate_large_figure = generate_large_figure
+    network.view_ranges = view_ranges
+    return network
+
+
+# === Dash App ===
+def build_app(network=None):
+    # Module settings are read here, at call time, so ideas_cli.py can override them
+    if network is None:
+        network = build_network(data_file, layout_method, layout_fast_threshold,
+                                large_graph_mode, large_graph_threshold, max_visible_nodes)
+    large_mode = network.large_mode
+    app = Dash(__name__)
+
+    app.layout = html.Div([
+        html.Div(id='selected-idea-card', style={
+            'position': 'absolute', 'top': '10px', 'left': '10px', 'zIndex': 10,
+            'backgroundColor': '#f9f9f9', 'padding': '10px', 'border': '1px solid #ccc',
+            'borderRadius': '5px', 'boxShadow': '2px 2px 8px rgba(0,0,0,0.1)', 'maxWidth': '320px'
+        }),
+        dcc.Graph(id='network-graph', figure=network.generate_large_figure() if large_mode else network.generate_figure(),
+                  config={'scrollZoom': True}, style={'height': '90vh'}),
+        dcc.Store(id='highlighted-nodes', data=[]),
+        dcc.Store(id='view-state', data={
+            "x_range": network.full_range[0] if large_mode else None,
+            "y_range": network.full_range[1] if large_mode else None,
+            "expanded": [],
+            "selected": None,
+        }),
+    ])
+
+    if not large_mode:
+        @app.callback(
+            Output('network-graph', 'figure'),
+            Output('selected-idea-card', 'children'),
+            Output('highlighted-nodes', 'data'),
+            Input('network-graph', 'clickData'),
+            State('highlighted-nodes', 'data'),
+            prevent_initial_call=True
+        )
+        def update_on_click(clickData, previous):
+            idea_id = clickData['points'][0].get('customdata') if clickData and clickData['points'] else None
+            return network.click_patch(idea_id, previous)
+
+    else:
+        @app.callback(
+            Output('network-graph', 'figure'),
+            Output('selected-idea-card', 'children'),
+            Output('view-state', 'data'),
+            Input('network-graph', 'relayoutData'),
+            Input('network-graph', 'clickData'),
+            State('view-state', 'data'),
+            State('selected-idea-card', 'children'),
+            prevent_initial_call=True
+        )
+        def update_view(relayoutData, clickData, state, card):
+            # Every update re-sends only the traces of what is visible at the current zoom level
+            state = dict(state)
+            if ctx.triggered[0]['prop_id'].endswith('relayoutData'):
+                state["x_range"], state["y_range"] = network.view_ranges(relayoutData or {}, state)
+            elif clickData and clickData['points']:
+                clicked = clickData['points'][0].get('customdata')
+                if isinstance(clicked, str) and clicked.startswith("group:"):
+                    state["expanded"] = sorted(set(state["expanded"]) | {int(clicked.split(":", 1)[1])})
+                elif clicked in network.node_index:
+                    state["selected"] = clicked
+                    card = network.idea_card(clicked)
+
+            view = network.render_view(state["x_range"], state["y_range"], state["expanded"], state["selected"])
+            patched = Patch()
+            for trace, update in view.items():
+                for key, value in update.items():
+                    patched["data"][trace][key] = value
+            return patched, card, state
+
+    return app
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    build_app().run(debug=True)
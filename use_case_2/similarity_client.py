@@ -0,0 +1,137 @@
+'''
+This module queries the AI similarity endpoint concurrently,
+Through one pooled keep-alive session, a token-bucket rate limiter matching the endpoint quota,
+And exponential backoff per request (only 429, 5xx and connection errors are retried; other 4xx answers never pass).
+=> (IDs that keep failing, or whose answer cannot be handled, are queued for later retry rounds instead of stopping the run.)
+=> (point url at a local mock HTTP server to test without the real endpoint.)
+'''
+
+
+
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+
+
+class TokenBucket:
+    def __init__(self, rate_per_second, burst=1):
+        self.rate = rate_per_second
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def is_retryable(error):
+    # 429 and 5xx answers and connection-level failures can pass on a later try; other 4xx answers never will
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        return status == 429 or status >= 500
+    return isinstance(error, requests.exceptions.RequestException)
+
+
+class SimilarityClient:
+    def __init__(self, url, headers=None, cookies=None, rate_per_second=1.0, burst=1, workers=4,
+                 max_retries=4, backoff=2.0, max_backoff=60.0, timeout=120, verify=False):
+        self.url = url
+        self.workers = workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.verify = verify
+        self.bucket = TokenBucket(rate_per_second, burst)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update(headers or {})
+        self.session.cookies.update(cookies or {})
+
+    def _delay(self, attempt, response=None):
+        # Honour the server's Retry-After on 429/503, otherwise back off exponentially with jitter
+        if response is not None and response.headers.get("Retry-After", "").isdigit():
+            return float(response.headers["Retry-After"])
+        return min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+    def fetch(self, query):
+        # Returns the answer text, or raises: a body that is not {"content": "..."} raises ValueError
+        # max_retries retries after the first attempt, only for errors is_retryable() accepts
+        params = {"q": query, "messages": "false"}
+        attempts = max(self.max_retries, 0) + 1
+        for attempt in range(attempts):
+            self.bucket.acquire()
+            response = None
+            try:
+                response = self.session.get(self.url, params=params, timeout=self.timeout, verify=self.verify)
+                response.raise_for_status()
+                payload = response.json()
+                content = payload.get("content", "") if isinstance(payload, dict) else None
+                if not isinstance(content, str):
+                    raise ValueError(f"unexpected response body: {str(payload)[:200]}")
+                return content
+            except requests.exceptions.RequestException as e:
+                if attempt == attempts - 1 or not is_retryable(e):
+                    raise
+                delay = self._delay(attempt, response)
+                print(f"⚠️ Attempt {attempt+1} failed: {e}. 🔁 Retrying in {delay:.1f} seconds...")
+                time.sleep(delay)
+
+    def fetch_many(self, items, on_result, retry_rounds=2, round_cooldown=30):
+        '''
+        items: (idea_id, query) pairs. on_result(idea_id, content) runs on the calling thread
+        as answers arrive. Returns the IDs that still failed after every retry round,
+        and the IDs the endpoint rejected (4xx other than 429), which are not retried.
+        '''
+        queue = list(items)
+        rejected = []
+        for round_number in range(retry_rounds + 1):
+            if not queue:
+                break
+            if round_number:
+                print(f"🔁 Retry round {round_number}: {len(queue)} failed IDs, after {round_cooldown}s cooldown...")
+                time.sleep(round_cooldown)
+
+            failed = []
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                futures = {executor.submit(self.fetch, query): (idea_id, query) for idea_id, query in queue}
+                for future in as_completed(futures):
+                    idea_id, query = futures[future]
+                    try:
+                        on_result(idea_id, future.result())
+                    except requests.exceptions.RequestException as e:
+                        if is_retryable(e):
+                            print(f"❌ ID {idea_id} failed ({type(e).__name__}: {e}). Queued for retry.")
+                            failed.append((idea_id, query))
+                        else:
+                            print(f"❌ ID {idea_id} rejected ({e}). Not retried.")
+                            rejected.append(idea_id)
+                    except Exception as e:
+                        print(f"❌ ID {idea_id} failed ({type(e).__name__}: {e}). Queued for retry.")
+                        failed.append((idea_id, query))
+            queue = failed
+
+        return rejected + [idea_id for idea_id, _ in queue]
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,121 @@
+'''
+This module finds similar ideas locally from their sentence embeddings,
+With a top-k nearest-neighbour search on cosine similarity,
+Either brute force (vectorized, in row blocks) or with an approximate HNSW index (optional, needs hnswlib).
+=> (no network calls, so the whole corpus links offline.)
+=> (the embeddings are only read in row blocks, so a memory-mapped EmbeddingMatrix is never loaded whole.)
+'''
+
+
+
+
+import numpy as np
+
+
+
+
+def normalize_rows(embeddings):
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return embeddings / norms
+
+
+def row_blocks(embeddings, block_size):
+    # Normalized float32 row blocks of an array or a memory-mapped matrix (dequantized on the fly)
+    for start in range(0, len(embeddings), block_size):
+        yield start, normalize_rows(embeddings[start:start + block_size])
+
+
+def brute_force_neighbors(embeddings, k=5, block_size=2048):
+    n = len(embeddings)
+    k = min(k, n - 1)
+    indices = np.zeros((n, max(k, 0)), dtype=np.int64)
+    scores = np.zeros((n, max(k, 0)), dtype=np.float32)
+    if k <= 0:
+        return indices, scores
+
+    # Running top-k per query block, merged over candidate blocks: memory is two blocks, not the corpus
+    for start, queries in row_blocks(embeddings, block_size):
+        rows = np.arange(len(queries))
+        best_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        best = np.zeros((len(queries), k), dtype=np.int64)
+        for candidate_start, candidates in row_blocks(embeddings, block_size):
+            block = queries @ candidates.T
+            own = start + rows - candidate_start
+            inside = (own >= 0) & (own < len(candidates))
+            block[rows[inside], own[inside]] = -np.inf  # never match an idea to itself
+
+            candidate_rows = np.broadcast_to(np.arange(candidate_start, candidate_start + len(candidates)), block.shape)
+            merged_scores = np.concatenate([best_scores, block], axis=1)
+            merged = np.concatenate([best, candidate_rows], axis=1)
+            top = np.argpartition(-merged_scores, k - 1, axis=1)[:, :k]
+            best_scores = np.take_along_axis(merged_scores, top, axis=1)
+            best = np.take_along_axis(merged, top, axis=1)
+
+        order = np.argsort(-best_scores, axis=1)
+        indices[start:start + len(queries)] = np.take_along_axis(best, order, axis=1)
+        scores[start:start + len(queries)] = np.take_along_axis(best_scores, order, axis=1)
+    return indices, scores
+
+
+def approximate_neighbors(embeddings, k=5, ef=100, m=16, block_size=8192):
+    try:
+        import hnswlib
+    except ImportError:
+        raise ImportError("Approximate similarity search needs hnswlib (pip install hnswlib).")
+
+    n, dim = embeddings.shape
+    k = min(k, n - 1)
+    if k <= 0:
+        return np.zeros((n, 0), dtype=np.int64), np.zeros((n, 0), dtype=np.float32)
+
+    index = hnswlib.Index(space="cosine", dim=dim)
+    index.init_index(max_elements=n, ef_construction=max(ef, 2 * k), M=m)
+    for start, vectors in row_blocks(embeddings, block_size):
+        index.add_items(vectors, np.arange(start, start + len(vectors)))
+    index.set_ef(max(ef, 2 * k))
+
+    # Ask for one extra neighbour, then drop the idea itself
+    labels = np.zeros((n, k + 1), dtype=np.int64)
+    distances = np.zeros((n, k + 1), dtype=np.float32)
+    for start, vectors in row_blocks(embeddings, block_size):
+        labels[start:start + len(vectors)], distances[start:start + len(vectors)] = index.knn_query(vectors, k=k + 1)
+    scores = 1.0 - distances
+    is_self = labels == np.arange(n)[:, None]
+    keep = ~is_self
+    keep[~is_self.any(axis=1), k] = False  # self not returned: drop the weakest extra hit instead
+    indices = labels[keep].reshape(n, k)
+    scores = scores[keep].reshape(n, k).astype(np.float32)
+    return indices, scores
+
+
+def has_hnswlib():
+    try:
+        import hnswlib
+    except ImportError:
+        return False
+    return True
+
+
+def find_similar(embeddings, k=5, min_score=0.6, method="auto", approx_threshold=20000, with_scores=False):
+    # method="approx" needs hnswlib; "auto" falls back to the blockwise brute force when it is missing
+    n = len(embeddings)
+    if method == "auto":
+        method = "approx" if n > approx_threshold else "brute"
+        if method == "approx" and not has_hnswlib():
+            print(f"⚠️ hnswlib is not installed: searching {n} ideas by brute force (pip install hnswlib for the faster index).")
+            method = "brute"
+    if method == "approx":
+        indices, scores = approximate_neighbors(embeddings, k=k)
+    elif method == "brute":
+        indices, scores = brute_force_neighbors(embeddings, k=k)
+    else:
+        raise ValueError(f"Unknown similarity search method: {method}")
+
+    # One list of neighbour row numbers per idea, best first, above the score threshold
+    keep = scores >= min_score
+    neighbours = [row_indices[row_keep].tolist() for row_indices, row_keep in zip(indices, keep)]
+    if with_scores:
+        return neighbours, [row_scores[row_keep].tolist() for row_scores, row_keep in zip(scores, keep)]
+    return neighbours